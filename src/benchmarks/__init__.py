@@ -0,0 +1,36 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import django
+
+
+def setup_django() -> None:
+    """
+    Sets django up with the development settings, so the benchmarks can be run as scripts from the src directory.
+    :return:
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'github_scraper.settings.development')
+    django.setup()
+
+
+@contextmanager
+def benchmark_database() -> Iterator[None]:
+    """
+    Context manager that creates a throwaway database like the test database of the configured `default` connection,
+    and destroys it on exit. SQLite writes to a file instead of the usual in-memory test database, so every commit
+    syncs it to disk like a real database would.
+    """
+    from django.db import connection
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+        database_name: str = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0)
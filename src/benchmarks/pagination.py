@@ -0,0 +1,113 @@
+"""
+Benchmark of the GitHub API calls per user made to fetch repositories, with the factor based paging the
+Scraper used before and with the pagination planner.
+
+Usage, from the src directory:
+python -m benchmarks.pagination [--users 1000] [--seed 0]
+"""
+import argparse
+import itertools
+import logging
+import math
+import random
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from benchmarks import setup_django
+
+setup_django()
+
+from fastcore.foundation import L as fastlist  # noqa: E402
+from fastcore.xtras import dict2obj  # noqa: E402
+
+from github_data.scraper_tool import Scraper  # noqa: E402
+
+# the repositories page size the Scraper used by default before the planner.
+LEGACY_PAGE_SIZE: int = 30
+# the number of repositories requested per user in each scenario, 0 means all repositories.
+SCENARIOS: List[int] = [0, 1, 5, 30, 97]
+
+
+class CountingRepositoriesApi:
+    """
+    In-memory stand-in for the GitHub repositories endpoint that counts the requests it gets.
+    """
+    def __init__(self, repositories_per_user: Dict[str, int]):
+        self.repositories_per_user: Dict[str, int] = repositories_per_user
+        self.requests: int = 0
+        self.repos = SimpleNamespace(list_for_user=self.list_for_user)
+
+    def list_for_user(self, username: str, page: int = 1, per_page: int = 30) -> fastlist:
+        self.requests += 1
+        repository_ids: List[int] = list(range(self.repositories_per_user[username]))
+        page_ids: List[int] = repository_ids[(page - 1) * per_page:page * per_page]
+        return dict2obj([{'id': repository_id} for repository_id in page_ids])
+
+
+def legacy_repository_paging(number_of_repositories: int, page_size: int) -> Tuple[int, int]:
+    """
+    The factor based paging of the Scraper before the planner, which picks the factor of the number of repositories
+    closest to the page size so no page has extra repositories.
+    """
+    if number_of_repositories <= 0:
+        return 0, page_size
+    factors: List[int] = [n for n in range(1, number_of_repositories + 1) if number_of_repositories % n == 0]
+    page_size = min(factors, key=lambda factor: abs(factor - page_size))
+    return math.ceil(number_of_repositories / page_size), page_size
+
+
+def legacy_fetch(api: CountingRepositoriesApi, username: str, number_of_repositories: int) -> None:
+    pages, page_size = legacy_repository_paging(number_of_repositories, LEGACY_PAGE_SIZE)
+    for page in itertools.count(1):
+        repository_list: fastlist = api.repos.list_for_user(username, page=page, per_page=page_size)
+        if pages and page >= pages or len(repository_list) < page_size:
+            break
+
+
+def calls_per_user(repositories_per_user: Dict[str, int], number_of_repositories: int) -> Tuple[float, float, float]:
+    """
+    Fetches the repositories of every user with the legacy paging, with the planner, and with the planner
+    knowing the number of repositories of each user (like when scraping individual users).
+    :return: The average API calls per user of each of them
+    """
+    scraper: Scraper = Scraper()
+    legacy_api: CountingRepositoriesApi = CountingRepositoriesApi(repositories_per_user)
+    planner_api: CountingRepositoriesApi = CountingRepositoriesApi(repositories_per_user)
+    known_count_api: CountingRepositoriesApi = CountingRepositoriesApi(repositories_per_user)
+
+    for username, public_repositories in repositories_per_user.items():
+        legacy_fetch(legacy_api, username, number_of_repositories)
+        scraper.api = planner_api
+        scraper.fetch_user_repositories(username, number_of_repositories=number_of_repositories)
+        scraper.api = known_count_api
+        scraper.fetch_user_repositories(
+            username, number_of_repositories=number_of_repositories, public_repositories=public_repositories
+        )
+
+    users: int = len(repositories_per_user)
+    return legacy_api.requests / users, planner_api.requests / users, known_count_api.requests / users
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000, help='The number of users to simulate.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the random number of repositories.')
+    arguments: argparse.Namespace = parser.parse_args()
+    # the scraper logs every page at debug level with the development settings.
+    logging.getLogger('github_data').setLevel(logging.WARNING)
+
+    # most users have a few repositories and a few have hundreds, like on GitHub.
+    generator: random.Random = random.Random(arguments.seed)
+    repositories_per_user: Dict[str, int] = {
+        f'user-{user_id}': min(int(generator.paretovariate(1.2)) - 1, 1000) for user_id in range(arguments.users)
+    }
+
+    print(f'API calls per user to fetch repositories, {arguments.users} users')
+    print(f'{"repositories":>12} {"before":>8} {"planner":>8} {"planner + public_repos":>22}')
+    for number_of_repositories in SCENARIOS:
+        legacy, planner, known_count = calls_per_user(repositories_per_user, number_of_repositories)
+        print(f'{number_of_repositories or "all":>12} {legacy:>8.2f} {planner:>8.2f} {known_count:>22.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+End-to-end benchmark of the Scraper against a local fake GitHub REST API, so its throughput is measured offline.
+
+The fake API serves generated users and repositories with the fields and sizes of the real ones, pagination and
+rate limit headers, and waits `--latency` seconds before answering each request like a remote server would.
+It runs in its own process, so it doesn't take CPU time or memory from the scraper. Each configuration scrapes
+the same users into empty tables of a throwaway database, and reports the requests sent, the wall time, the rows
+written per second and the peak memory allocated by the scraper process (traced with tracemalloc, which slows
+every configuration down alike).
+
+Usage, from the src directory:
+python -m benchmarks.scrape [--mode {range,users}] [--users 500] [--repositories 0] [--latency 0.05]
+                            [--workers 1 4 16] [--seed 0]
+"""
+import argparse
+import logging
+import multiprocessing
+import random
+import time
+import tracemalloc
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Tuple
+
+from benchmarks import benchmark_database, setup_django
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from github_data.models import GithubRepository, GithubUser  # noqa: E402
+from github_data.scraper_tool import Scraper  # noqa: E402
+from github_data.tests.github_stub import GithubStubServer  # noqa: E402
+
+RANGE_MODE: str = 'range'
+USERS_MODE: str = 'users'
+# the most repositories a generated user has.
+MAX_REPOSITORIES: int = 300
+# the url fields of the users and repositories of the GitHub REST API, which make up most of their size.
+USER_URL_FIELDS: List[str] = [
+    'avatar_url', 'html_url', 'followers_url', 'following_url', 'gists_url', 'starred_url', 'subscriptions_url',
+    'organizations_url', 'repos_url', 'events_url', 'received_events_url'
+]
+REPOSITORY_URL_FIELDS: List[str] = [
+    'html_url', 'forks_url', 'keys_url', 'collaborators_url', 'teams_url', 'hooks_url', 'issue_events_url',
+    'events_url', 'assignees_url', 'branches_url', 'tags_url', 'blobs_url', 'git_tags_url', 'git_refs_url',
+    'trees_url', 'statuses_url', 'languages_url', 'stargazers_url', 'contributors_url', 'subscribers_url',
+    'subscription_url', 'commits_url', 'git_commits_url', 'comments_url', 'issue_comment_url', 'contents_url',
+    'compare_url', 'merges_url', 'archive_url', 'downloads_url', 'issues_url', 'pulls_url', 'milestones_url',
+    'notifications_url', 'labels_url', 'releases_url', 'deployments_url', 'git_url', 'ssh_url', 'clone_url',
+    'svn_url', 'mirror_url'
+]
+
+
+class FakeGithubServer(GithubStubServer):
+    """
+    GitHub stub that answers with full size users and repositories, after waiting `latency` seconds.
+    """
+    def __init__(self, repositories_per_user: Dict[int, int], *, latency: float) -> None:
+        super().__init__(repositories_per_user)
+        self.latency: float = latency
+
+    def user_summary(self, user_id: int) -> Dict:
+        user: Dict = super().user_data(user_id)
+        summary: Dict = {
+            'id': user['id'], 'login': user['login'], 'node_id': f'MDQ6VXNlcj{user_id}', 'url': user['url']
+        }
+        summary.update({field: f'{user["url"]}/{field[:-4]}' for field in USER_URL_FIELDS})
+        summary.update({'gravatar_id': '', 'type': 'User', 'site_admin': False})
+        return summary
+
+    def user_data(self, user_id: int) -> Dict:
+        user: Dict = super().user_data(user_id)
+        user.update(self.user_summary(user_id))
+        user.update({
+            'name': f'User {user_id}', 'company': None, 'blog': '', 'location': None, 'email': None, 'bio': None,
+            'public_gists': 0, 'followers': 0, 'following': 0, 'created_at': '2020-01-01T00:00:00Z'
+        })
+        return user
+
+    def repository_data(self, owner: Dict, repository_id: int) -> Dict:
+        repository: Dict = super().repository_data(owner, repository_id)
+        # repositories are listed with the summary of their owner.
+        repository['owner'] = self.user_summary(owner['id'])
+        repository.update({field: f'{repository["url"]}/{field[:-4]}' for field in REPOSITORY_URL_FIELDS})
+        repository.update({
+            'node_id': f'MDEwOlJlcG9zaXRvcnk{repository["id"]}', 'private': False, 'fork': False,
+            'homepage': None, 'size': 128, 'stargazers_count': 0, 'watchers_count': 0, 'language': 'Python',
+            'has_issues': True, 'has_projects': True, 'has_downloads': True, 'has_wiki': True, 'has_pages': False,
+            'forks_count': 0, 'archived': False, 'disabled': False, 'open_issues_count': 0, 'license': None,
+            'forks': 0, 'open_issues': 0, 'watchers': 0, 'default_branch': 'main', 'created_at': '2020-01-01T00:00:00Z'
+        })
+        return repository
+
+    def route(self, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        time.sleep(self.latency)
+        status, payload = super().route(path, query)
+        if path == '/users':
+            payload = [self.user_summary(user['id']) for user in payload]
+        return status, payload
+
+
+def serve(repositories_per_user: Dict[int, int], latency: float, pipe: Connection) -> None:
+    """
+    Runs the fake GitHub API in a child process, until the parent sends anything through the pipe.
+    """
+    with FakeGithubServer(repositories_per_user, latency=latency) as server:
+        pipe.send(server.api_host)
+        pipe.recv()
+
+
+def scrape(api_host: str, arguments: argparse.Namespace, workers: int) -> Dict[str, float]:
+    """
+    Scrapes the users of the fake GitHub API into empty tables and measures it.
+    :return: The requests sent, the wall time, the rows written per second and the peak memory in MB
+    """
+    GithubRepository.objects.all().delete()
+    GithubUser.objects.all().delete()
+    scraper: Scraper = Scraper(users_page_size=100, repositories_page_size=100, concurrency=workers, api_host=api_host)
+
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    if arguments.mode == RANGE_MODE:
+        scraper.scrape_users(since=0, number_of_users=arguments.users, number_of_repositories=arguments.repositories)
+    else:
+        scraper.scrape_individual_users(
+            [f'user-{user_id}' for user_id in range(1, arguments.users + 1)],
+            number_of_repositories=arguments.repositories
+        )
+    elapsed: float = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    snapshot: Dict[str, Any] = scraper.metrics.snapshot()
+    return {
+        'requests': sum(histogram['count'] for histogram in snapshot['requests'].values()),
+        'seconds': elapsed,
+        'rows_per_second': snapshot['rows_written'] / elapsed,
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=[RANGE_MODE, USERS_MODE], default=RANGE_MODE,
+                        help='Scrape a range of users with scrape_users, or each user by username.')
+    parser.add_argument('--users', type=int, default=500, help='The number of users to scrape.')
+    parser.add_argument('--repositories', type=int, default=0,
+                        help='The number of repositories to scrape for each user, 0 means all of them.')
+    parser.add_argument('--latency', type=float, default=0.05, help='The seconds the fake API takes per request.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16],
+                        help='The concurrencies to benchmark the scraper with.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the number of repositories of each user.')
+    arguments: argparse.Namespace = parser.parse_args()
+    # the scraper logs every user at info level.
+    logging.getLogger('github_data').setLevel(logging.WARNING)
+
+    # most users have a few repositories, and some have a lot.
+    generator: random.Random = random.Random(arguments.seed)
+    repositories_per_user: Dict[int, int] = {
+        user_id: min(int(generator.paretovariate(1.2)) - 1, MAX_REPOSITORIES)
+        for user_id in range(1, arguments.users + 1)
+    }
+    parent_pipe, child_pipe = multiprocessing.Pipe()
+    server: multiprocessing.Process = multiprocessing.Process(
+        target=serve, args=(repositories_per_user, arguments.latency, child_pipe), daemon=True
+    )
+    server.start()
+    try:
+        api_host: str = parent_pipe.recv()
+        with benchmark_database():
+            repositories: int = sum(repositories_per_user.values())
+            print(f'Scraping {arguments.users} users ({arguments.mode} mode) with {repositories} repositories, '
+                  f'{arguments.latency}s of latency, on {connection.vendor}')
+            print(f'{"workers":>8} {"requests":>9} {"seconds":>9} {"rows/s":>9} {"peak MB":>9}')
+            for workers in arguments.workers:
+                result: Dict[str, float] = scrape(api_host, arguments, workers)
+                print(f'{workers:>8} {result["requests"]:>9} {result["seconds"]:>9.2f} '
+                      f'{result["rows_per_second"]:>9.0f} {result["peak_mb"]:>9.1f}')
+    finally:
+        parent_pipe.send(None)
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark of the rows per second written to the database, saving every row on its own with its serializer and
+committing a whole page of users and their repositories in a single transaction.
+
+It writes to a throwaway database created like the test database of the configured `default` connection, so it
+compares SQLite and PostgreSQL by running it with a `config.json` for each of them.
+
+Usage, from the src directory:
+python -m benchmarks.writes [--users 1000] [--repositories 5] [--batch-sizes 100 500]
+"""
+import argparse
+import logging
+import time
+from typing import Callable, Dict, List
+
+from benchmarks import benchmark_database, setup_django
+
+setup_django()
+
+from django.db import connection, transaction  # noqa: E402
+
+from github_data.ingest import ingest_repositories, ingest_users  # noqa: E402
+from github_data.models import GithubRepository, GithubUser  # noqa: E402
+from github_data.serializers import GithubRepositorySerializer, GithubUserSerializer  # noqa: E402
+
+USERS_PAGE_SIZE: int = 100
+
+
+def user_data(user_id: int) -> Dict:
+    return {'id': user_id, 'login': f'user-{user_id}', 'url': f'https://api.github.com/users/user-{user_id}'}
+
+
+def repository_data(owner: Dict, repository_id: int) -> Dict:
+    name: str = f'repo-{repository_id}'
+    return {
+        'id': owner['id'] * 1000 + repository_id, 'owner': owner, 'name': name,
+        'full_name': f'{owner["login"]}/{name}', 'description': 'benchmark repository',
+        'url': f'https://api.github.com/repos/{owner["login"]}/{name}',
+        'updated_at': '2021-01-01T00:00:00Z', 'pushed_at': '2021-01-01T00:00:00Z'
+    }
+
+
+def save_row(serializer_class: type, data: Dict) -> None:
+    """
+    Validates and saves a single row with its model serializer, the way the scraper wrote every user and repository
+    before ingesting pages in bulk.
+    """
+    serializer = serializer_class(data=data)
+    if serializer.is_valid():
+        serializer.save()
+
+
+def write_row_by_row(pages: List[List[Dict]], repositories_per_user: int) -> None:
+    """
+    Writes every user and repository with `serializer.save()` in autocommit mode, so each row runs its own validation
+    queries and statements and is committed on its own.
+    """
+    for page in pages:
+        for user in page:
+            save_row(GithubUserSerializer, user)
+            for repository_id in range(repositories_per_user):
+                save_row(GithubRepositorySerializer, repository_data(user, repository_id))
+
+
+def page_transactions(batch_size: int) -> Callable[[List[List[Dict]], int], None]:
+    """
+    Builds a writer that commits a page of users and their repositories in a single transaction, like the scraper,
+    with bulk statements of `batch_size` rows.
+    """
+    def write_pages(pages: List[List[Dict]], repositories_per_user: int) -> None:
+        for page in pages:
+            repositories: List[Dict] = [
+                repository_data(user, repository_id) for user in page for repository_id in range(repositories_per_user)
+            ]
+            with transaction.atomic():
+                ingest_users(page, batch_size=batch_size)
+                ingest_repositories(repositories, batch_size=batch_size)
+    return write_pages
+
+
+def rows_per_second(writer: Callable[[List[List[Dict]], int], None], pages: List[List[Dict]],
+                    repositories_per_user: int) -> float:
+    """
+    Writes the pages to empty tables and measures the rows written per second.
+    """
+    GithubRepository.objects.all().delete()
+    GithubUser.objects.all().delete()
+    start: float = time.perf_counter()
+    writer(pages, repositories_per_user)
+    elapsed: float = time.perf_counter() - start
+    return (GithubUser.objects.count() + GithubRepository.objects.count()) / elapsed
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000, help='The number of users to write.')
+    parser.add_argument('--repositories', type=int, default=5, help='The number of repositories of each user.')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500],
+                        help='The rows per bulk statement to benchmark the page transactions with.')
+    arguments: argparse.Namespace = parser.parse_args()
+    # the ingest logs every batch at debug level with the development settings.
+    logging.getLogger('github_data').setLevel(logging.WARNING)
+
+    users: List[Dict] = [user_data(user_id) for user_id in range(1, arguments.users + 1)]
+    pages: List[List[Dict]] = [users[start:start + USERS_PAGE_SIZE] for start in range(0, len(users), USERS_PAGE_SIZE)]
+    writers: Dict[str, Callable[[List[List[Dict]], int], None]] = {'row by row': write_row_by_row}
+    writers.update({f'page transaction, batches of {size}': page_transactions(size) for size in arguments.batch_sizes})
+
+    with benchmark_database():
+        rows: int = arguments.users * (arguments.repositories + 1)
+        print(f'Rows per second writing {rows} rows on {connection.vendor}')
+        for name, writer in writers.items():
+            print(f'{name:>36} {rows_per_second(writer, pages, arguments.repositories):>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+from logging import Logger
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Union
+
+from github_data.pipeline import Prefetcher
+
+logger: Logger = logging.getLogger(__name__)
+
+ARCHIVE_PATTERN: str = 'responses-*.jsonl.gz'
+# the number of records read from an archive file at a time.
+CHUNK_SIZE: int = 100
+# the number of chunks of each archive file decompressed ahead of the reader.
+CHUNKS_AHEAD: int = 4
+DEFAULT_READERS: int = 4
+
+
+class ResponseArchive:
+    """
+    Append-only archive of the raw GitHub API responses, so the database can be rebuilt without fetching them again.
+    Every response is a JSON line in gzip files of a directory, which are rotated when they reach `max_file_size`
+    compressed bytes. The compressed stream is flushed after every response, so the responses archived by a process
+    that was killed can still be read. File names start with their creation time, so they sort in the order they
+    were written, and end with the id of the process, so the shards of a run can share the directory.
+    """
+    DEFAULT_MAX_FILE_SIZE: int = 64 * 2 ** 20
+
+    def __init__(self, directory: Union[str, Path], *, max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+        """
+        :param directory: The directory of the archive files, created if it doesn't exist
+        :param max_file_size: The compressed size in bytes after which a new archive file is started
+        """
+        self.directory: Path = Path(directory)
+        self.max_file_size: int = max_file_size
+        self.file: Optional[gzip.GzipFile] = None
+        self.path: Optional[Path] = None
+        self.responses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def append(self, endpoint: str, host: str, route: Optional[Dict[str, Any]], query: Optional[Dict[str, Any]],
+               response: Any) -> None:
+        """
+        Appends a response to the current archive file, starting a new one if it reached its maximum size.
+        :param endpoint: The method and the path template of the request, like `GET /users/{username}/repos`
+        :param host: The base url of the GitHub API
+        :param route: The values of the parameters in the path
+        :param query: The query string parameters of the request
+        :param response: The decoded JSON response
+        :return:
+        """
+        line: bytes = json.dumps({
+            'endpoint': endpoint, 'host': host, 'route': route, 'query': query,
+            'fetched_at': datetime.now(timezone.utc).isoformat(), 'response': response
+        }).encode() + b'\n'
+        with self.lock:
+            if self.file is None:
+                self.open()
+            self.file.write(line)
+            self.file.flush(zlib.Z_SYNC_FLUSH)
+            self.responses += 1
+            if self.file.fileobj.tell() >= self.max_file_size:
+                self.close_file()
+
+    def open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name: str = f'responses-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{os.getpid()}.jsonl.gz'
+        self.path = self.directory / name
+        self.file = gzip.GzipFile(self.path, 'xb')
+        logger.debug(f'-- archiving responses in {self.path}')
+
+    def close_file(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def close(self) -> None:
+        with self.lock:
+            self.close_file()
+
+
+def archive_files(paths: Iterable[Union[str, Path]]) -> List[Path]:
+    """
+    Lists the archive files to read, in the order they were written.
+    :param paths: Archive files, and directories whose archive files are all read
+    :return: The paths of the archive files
+    """
+    files: List[Path] = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob(ARCHIVE_PATTERN)) if path.is_dir() else [path])
+    return files
+
+
+def read_chunks(path: Path) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Reads the records of an archive file in chunks of CHUNK_SIZE records.
+    A file that was not closed, because the process that wrote it was killed, is read up to its last complete record.
+    """
+    chunk: List[Dict[str, Any]] = []
+    with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+        try:
+            for line in archive_file:
+                chunk.append(json.loads(line))
+                if len(chunk) >= CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+        except (EOFError, zlib.error, json.JSONDecodeError):
+            logger.warning(f'-- archive {path.name} was not closed, reading it up to its last complete response.')
+    if chunk:
+        yield chunk
+
+
+def read_archive(paths: Iterable[Path], *, readers: int = DEFAULT_READERS) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Streams the records of archive files in chunks, in order.
+    Up to `readers` files are decompressed at the same time in their own threads, each one a few chunks ahead of the
+    caller, so the memory used doesn't depend on the size of the archive.
+    :param paths: The paths of the archive files, in the order they are read
+    :param readers: The number of files decompressed in parallel. min: 1
+    :return: An iterator with the chunks of records
+    """
+    files: Iterator[Path] = iter(paths)
+    pending: Deque[Prefetcher] = deque()
+    try:
+        while True:
+            for path in files:
+                pending.append(Prefetcher(read_chunks(path), max_size=CHUNKS_AHEAD, name=f'archive-reader-{path.name}'))
+                if len(pending) >= readers:
+                    break
+            if not pending:
+                return
+            reader: Prefetcher = pending.popleft()
+            try:
+                yield from reader
+            finally:
+                reader.close()
+    finally:
+        for reader in pending:
+            reader.close()
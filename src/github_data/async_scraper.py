@@ -0,0 +1,340 @@
+import asyncio
+import itertools
+import logging
+import time
+from logging import Logger
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import aiohttp
+from asgiref.sync import async_to_sync, sync_to_async
+from fastcore.foundation import L as fastlist
+from fastcore.xtras import dict2obj
+from ghapi.core import GH_HOST
+
+from github_data.archive import ResponseArchive
+from github_data.exceptions import RateLimitExceededError
+from github_data.github_api import TokenPool, is_rate_limited, is_secondary_rate_limited
+from github_data.ingest import DEFAULT_BATCH_SIZE
+from github_data.models import ScrapeRun
+from github_data.scraper_tool import MISSING_USER_STATUSES, Scraper, trim_repositories, trim_users
+
+logger: Logger = logging.getLogger(__name__)
+
+
+class AsyncScraper(Scraper):
+    """
+    GitHub Scraper that fetches data with asyncio and aiohttp instead of threads.
+    The paging and the database writes are the same as in the synchronous Scraper, but the number of
+    requests in flight is only bounded by a semaphore, so a single process can keep hundreds of them open.
+    """
+    DEFAULT_CONCURRENCY: int = 50
+
+    def __init__(self, *, token: Optional[str] = None,
+                 tokens: Optional[List[str]] = None,
+                 users_page_size: int = Scraper.DEFAULT_USER_PAGE_SIZE,
+                 repositories_page_size: int = Scraper.DEFAULT_REPOSITORY_PAGE_SIZE,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 api_host: Optional[str] = None,
+                 scrape_run: Optional[ScrapeRun] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 response_archive: Optional[ResponseArchive] = None):
+        """
+        Initializes an asynchronous GitHub Scraper with a determined page size for users and repositories.
+        :param token: Github OAuth token to get a better rate limit
+        :param tokens: Github OAuth tokens to rotate across, routing each request to the one with most budget left
+        :param users_page_size: The amount of users each github users api call will fetch. max: 100
+        :param repositories_page_size: The amount of repositories each github repositories api call will fetch. max: 100
+        :param concurrency: The maximum number of requests in flight at the same time. min: 1
+        :param api_host: The base url of the GitHub API, defaults to https://api.github.com
+        :param scrape_run: The run whose checkpoint is saved with every batch of users written
+        :param batch_size: The number of rows written by each bulk statement of a page transaction. min: 1
+        :param response_archive: The archive every raw response of the GitHub API is appended to
+        """
+        super().__init__(token=token, tokens=tokens, users_page_size=users_page_size,
+                         repositories_page_size=repositories_page_size, concurrency=concurrency,
+                         api_host=api_host, scrape_run=scrape_run, batch_size=batch_size,
+                         response_archive=response_archive)
+        self.api_host: str = api_host or GH_HOST
+        # the credentials of each request are set by the token pool.
+        self.headers: Dict[str, str] = {'Accept': 'application/vnd.github.v3+json'}
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    def scrape_individual_users(self, usernames: List[str], *,
+                                number_of_repositories: int = Scraper.DEFAULT_NUMBER_OF_REPOSITORIES) -> None:
+        """
+        Scrapes a list of users and their repositories from the GitHub API on an event loop.
+        :param usernames: The list of usernames to scrape
+        :param number_of_repositories: The number of repositories to be scraped for each user, 0 means all repositories
+        :return:
+        """
+        async_to_sync(self.async_scrape_individual_users)(usernames, number_of_repositories=number_of_repositories)
+
+    def scrape_users(self, *, since: int = 0,
+                     number_of_users: int = Scraper.DEFAULT_NUMBER_OF_USERS,
+                     number_of_repositories: int = Scraper.DEFAULT_NUMBER_OF_REPOSITORIES,
+                     until: Optional[int] = None) -> None:
+        """
+        Scrapes a determined quantity of users and their repositories from the GitHub API on an event loop.
+        :param since: The starting ID from where the number of users specified will be fetched
+        :param number_of_users: The number of users to be scraped from the GitHub API, 0 means all users. min: 0
+        :param number_of_repositories: The number of repositories to be scraped for each User,
+        0 means all repositories. min: 0
+        :param until: The last user ID to be scraped, `None` means no limit
+        :return:
+        """
+        async_to_sync(self.async_scrape_users)(
+            since=since, number_of_users=number_of_users, number_of_repositories=number_of_repositories, until=until
+        )
+
+    async def async_scrape_individual_users(self, usernames: List[str], *,
+                                            number_of_repositories: int) -> None:
+        """
+        Coroutine that fetches a list of users and their repositories a batch of `users_page_size` users at a time.
+        The users of a batch are fetched concurrently and written in order before the next batch is fetched, so
+        only one batch is held in memory and a long list of users is checkpointed as it goes.
+        Users that don't exist are skipped.
+        :param usernames: The list of usernames to scrape
+        :param number_of_repositories: The number of repositories to be scraped for each user, 0 means all repositories
+        :return:
+        """
+        number_of_repositories = max(number_of_repositories, self.DEFAULT_NUMBER_OF_REPOSITORIES)
+
+        async def fetch_user(username: str) -> Optional[Tuple[fastlist, List[fastlist]]]:
+            logger.info(f'- scraping user {username}')
+            try:
+                user_data: fastlist = await self.get('/users/{username}', route={'username': username})
+            except aiohttp.ClientResponseError as error:
+                if error.status not in MISSING_USER_STATUSES:
+                    raise
+                logger.warning(f'-- user {username} was not found.')
+                return None
+            repositories: List[fastlist] = await self.async_fetch_user_repositories(
+                username, number_of_repositories=number_of_repositories,
+                public_repositories=user_data.get('public_repos')
+            )
+            return user_data, repositories
+
+        async with self.open_session():
+            for start in range(0, len(usernames), self.users_page_size):
+                results, error = await gather_until_error(
+                    [fetch_user(username) for username in usernames[start:start + self.users_page_size]]
+                )
+                # write every user completely fetched, even if the rate limit was reached.
+                users: List[fastlist] = [user_data for user_data, _ in filter(None, results)]
+                repositories: List[fastlist] = [
+                    repository for _, user_repositories in filter(None, results) for repository in user_repositories
+                ]
+                await sync_to_async(self.write_users)(users, repositories, missing=len(results) - len(users))
+                if error is not None:
+                    raise error
+
+    async def async_scrape_users(self, *, since: int, number_of_users: int, number_of_repositories: int,
+                                 until: Optional[int] = None) -> None:
+        """
+        Coroutine that scrapes a range of users page by page, fetching the repositories of each page concurrently.
+        :param since: The starting ID from where the number of users specified will be fetched
+        :param number_of_users: The number of users to be scraped from the GitHub API, 0 means all users. min: 0
+        :param number_of_repositories: The number of repositories to be scraped for each User, 0 means all
+        :param until: The last user ID to be scraped, `None` means no limit
+        :return:
+        """
+        number_of_users = max(number_of_users, self.DEFAULT_NUMBER_OF_USERS)
+        number_of_repositories = max(number_of_repositories, self.DEFAULT_NUMBER_OF_REPOSITORIES)
+        logger.info(f'- scraping {number_of_users} user(s) and {number_of_repositories} repo(s) starting at id {since}')
+
+        pages, remaining_count, page_size = self.calculate_user_paging(number_of_users)
+        logger.debug(f'- scraping {pages} page(s) of {page_size} user(s) and one page of {remaining_count} user(s)')
+        parse_remaining: bool = True
+
+        async with self.open_session():
+            try:
+                for page_count in itertools.count(1):
+                    try:
+                        user_list: fastlist = await self.get('/users', since=since, per_page=page_size)
+                    except RateLimitExceededError as error:  # pragma: no cover
+                        error.last_id = since
+                        raise
+                    logger.debug(f'- fetched {len(user_list)} user(s) in page #{page_count}')
+                    users_in_range: fastlist = trim_users(user_list, until)
+                    since = await self.async_parse_users_list(users_in_range, number_of_repositories)
+
+                    # stop if reached page limit, the end of the range, or if there are no more users to get
+                    if pages and page_count >= pages or len(users_in_range) < page_size or since == until:
+                        parse_remaining = len(users_in_range) == page_size and since != until
+                        break
+
+                if remaining_count and parse_remaining and since is not None:
+                    try:
+                        remaining_users: fastlist = await self.get('/users', since=since, per_page=remaining_count)
+                    except RateLimitExceededError as error:  # pragma: no cover
+                        error.last_id = since
+                        raise
+                    await self.async_parse_users_list(trim_users(remaining_users, until), number_of_repositories)
+            except RateLimitExceededError as error:
+                # no user of the page was written, so the page starts again.
+                if error.last_id is None:
+                    error.last_id = since
+                raise
+
+    async def async_parse_users_list(self, users: fastlist, number_of_repositories: int) -> Optional[int]:
+        """
+        Coroutine that fetches the repositories of every user in a list concurrently and writes them in order.
+        :param users: The list containing user data
+        :param number_of_repositories: The number of repositories to scrape for each User
+        :return: The ID of the last user parsed. Returns `None` if the list is empty
+        """
+        results, error = await gather_until_error([
+            self.async_fetch_user_repositories(
+                user.login, number_of_repositories=number_of_repositories, public_repositories=user.get('public_repos')
+            )
+            for user in users
+        ])
+
+        fetched_users: List[fastlist] = list(users[:len(results)])
+        for user in fetched_users:
+            logger.info(f'- scraping user {user.login}')
+        await sync_to_async(self.write_users)(
+            fetched_users, [repository for user_repositories in results for repository in user_repositories]
+        )
+        if error is not None:
+            if isinstance(error, RateLimitExceededError):
+                # resume from the last user whose repositories were completely written.
+                error.last_id = fetched_users[-1].id if fetched_users else None
+            raise error
+        return fetched_users[-1].id if fetched_users else None
+
+    async def async_fetch_user_repositories(self, username: str, *, number_of_repositories: int,
+                                            public_repositories: Optional[int] = None) -> List[fastlist]:
+        """
+        Coroutine that fetches a determined quantity of User Repositories from the GitHub Api.
+        :param username: The username of the GitHub User to fetch Repositories from
+        :param number_of_repositories: The number of repositories to be fetched, 0 means all repositories
+        :param public_repositories: The number of public repositories of the user, if known
+        :return: The list of repository data for the user
+        """
+        pages, page_size = self.calculate_repository_paging(number_of_repositories, public_repositories)
+        logger.debug(f'-- scraping {pages} page(s) of {page_size} repositories for user {username}')
+
+        repositories: List[fastlist] = []
+        for page in itertools.count(1):
+            if pages is not None and page > pages:
+                break
+            repository_list: fastlist = await self.get(
+                '/users/{username}/repos', route={'username': username}, page=page, per_page=page_size
+            )
+            logger.debug(f'-- fetched {len(repository_list)} repositories in page {page}')
+            repositories.extend(repository_list)
+
+            # stop if there are no more repositories to get
+            if len(repository_list) < page_size:
+                break
+        return trim_repositories(repositories, number_of_repositories)
+
+    def open_session(self) -> 'AsyncScraperSession':
+        """
+        Creates the context manager that holds the HTTP session and the semaphore while scraping.
+        :return: The session context manager
+        """
+        return AsyncScraperSession(self)
+
+    async def get(self, path: str, route: Optional[Dict[str, Any]] = None, **query: Any) -> Any:
+        """
+        Sends a GET request to the GitHub API, waiting for the semaphore if too many requests are in flight.
+        The request is paced by the rate limit governor and routed to the token with the most budget left, and sent
+        again with a backoff if it's rejected by a secondary rate limit, like ScraperApi.send does.
+        :param path: The GitHub API path to request, a template like `/users/{username}` filled in with `route`
+        :param route: The values of the parameters in the path
+        :param query: The query string parameters of the request
+        :return: The decoded JSON response
+        :raises RateLimitExceededError: If every token in the pool ran out of budget, or the request was rejected by
+        a secondary rate limit too many times
+        :raises aiohttp.ClientResponseError: If the request failed for any other reason
+        """
+        template: str = f'{self.api_host}{path}'
+        url: str = template.format(**{key: quote(str(value)) for key, value in (route or {}).items()})
+        token_pool: TokenPool = self.api.token_pool
+        secondary_limit_retries: int = 0
+        async with self.semaphore:
+            while True:
+                delay: float = self.api.governor.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                    self.metrics.record_sleep('pacing', delay)
+                headers: Dict[str, str] = {}
+                token: Optional[str] = token_pool.acquire(url)
+                if token:
+                    headers['Authorization'] = f'token {token}'
+
+                start: float = time.perf_counter()
+                async with self.session.get(url, params=query, headers=headers) as response:
+                    self.api.record_response(token, template, 'GET', time.perf_counter() - start, response.headers)
+                    # the token ran out of budget, the request is sent again with the next one.
+                    if is_rate_limited(response.status, response.headers):
+                        continue
+                    secondary_limited: bool = response.status in (403, 429) and is_secondary_rate_limited(
+                        response.status, response.headers, await response.text(errors='replace')
+                    )
+                    if secondary_limited:
+                        delay = self.api.secondary_limit_delay(
+                            str(response.url), response.status, response.headers, secondary_limit_retries
+                        )
+                    else:
+                        response.raise_for_status()
+                        payload: Any = await response.json()
+                if secondary_limited:
+                    await asyncio.sleep(delay)
+                    self.metrics.record_sleep('secondary_rate_limit', delay)
+                    secondary_limit_retries += 1
+                    continue
+                self.api.archive_response(template, 'GET', route, query, payload)
+                return dict2obj(payload)
+
+
+async def gather_until_error(coroutines: List[Awaitable[Any]]) -> Tuple[List[Any], Optional[BaseException]]:
+    """
+    Runs coroutines concurrently, like `asyncio.gather`, but cancels the pending ones as soon as one of them fails,
+    the way `Scraper.map_concurrently` cancels the pending calls of its workers.
+    :param coroutines: The coroutines to run
+    :return: The results of the coroutines in order, and `None`. If one of them failed, only the results of the
+    coroutines before it, and its error
+    """
+    tasks: List[asyncio.Future] = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    if not tasks:
+        return [], None
+    await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    pending: List[asyncio.Future] = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    failed: List[asyncio.Future] = [task for task in tasks if not task.cancelled() and task.exception() is not None]
+    if not failed:
+        return [task.result() for task in tasks], None
+    results: List[Any] = []
+    for task in tasks:
+        if task.cancelled() or task.exception() is not None:
+            break
+        results.append(task.result())
+    return results, failed[0].exception()
+
+
+class AsyncScraperSession:
+    """
+    Async context manager that opens the aiohttp session and semaphore used by an AsyncScraper.
+    Both have to be created inside the running event loop.
+    """
+    def __init__(self, scraper: AsyncScraper):
+        self.scraper: AsyncScraper = scraper
+
+    async def __aenter__(self) -> aiohttp.ClientSession:
+        connector: aiohttp.TCPConnector = aiohttp.TCPConnector(limit=self.scraper.concurrency)
+        self.scraper.semaphore = asyncio.Semaphore(self.scraper.concurrency)
+        self.scraper.session = aiohttp.ClientSession(headers=self.scraper.headers, connector=connector)
+        return self.scraper.session
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.scraper.session.close()
+        self.scraper.session = None
+        self.scraper.semaphore = None
@@ -0,0 +1,136 @@
+import io
+from datetime import datetime
+from typing import Any, Collection, Iterable, List, Optional, Sequence, Tuple, Type
+
+from django.db import connection, transaction
+from django.db.models import Field, Model
+from django.utils import timezone
+
+# the databases that can merge rows with INSERT ... ON CONFLICT.
+BULK_LOAD_VENDORS: Tuple[str, ...] = ('postgresql', 'sqlite')
+STAGING_TABLE_PREFIX: str = 'staging_'
+
+
+def supports_bulk_load() -> bool:
+    """
+    :return: Whether or not the database of the default connection can be written by bulk_load
+    """
+    return connection.vendor in BULK_LOAD_VENDORS
+
+
+def bulk_load(model: Type[Model], objects: Sequence[Model], fields: List[str], *,
+              keep_stored_fields: Collection[str] = (), timestamp_field: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Inserts the objects that are not in the database and updates the ones that changed with raw bulk statements,
+    without loading the existing rows into the ORM. On PostgreSQL the rows are streamed with COPY into a temporary
+    staging table and merged into the table with a single INSERT ... ON CONFLICT statement, on SQLite the same merge
+    runs once per row with executemany. Everything runs in a single savepoint.
+    New objects that conflict with existing rows on a unique field other than the primary key are rejected.
+    :param model: The model of the objects
+    :param objects: The objects to load, with unique primary keys
+    :param fields: The names of the fields to update in existing rows
+    :param keep_stored_fields: Fields that keep their stored value when the object has none
+    :param timestamp_field: A field set to the time the rows are written, only on the rows inserted or updated
+    :return: The number of rows inserted and updated
+    :raises IntegrityError: If the database rejects one of the rows
+    """
+    if not objects:
+        return 0, 0
+
+    columns: List[Field] = [model._meta.pk] + [model._meta.get_field(field) for field in fields]
+    if timestamp_field is not None:
+        columns.append(model._meta.get_field(timestamp_field))
+        written_at: datetime = timezone.now()
+        for instance in objects:
+            setattr(instance, timestamp_field, written_at)
+    rows: List[List[Any]] = [
+        [column.get_db_prep_save(getattr(instance, column.attname), connection) for column in columns]
+        for instance in objects
+    ]
+    keep_stored: List[str] = [model._meta.get_field(field).column for field in keep_stored_fields]
+    compared: List[Field] = columns[1:-1] if timestamp_field is not None else columns[1:]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            return copy_rows(cursor, model, columns, compared, keep_stored, rows)
+        return insert_rows(cursor, model, columns, compared, keep_stored, rows)
+
+
+def copy_rows(cursor: Any, model: Type[Model], columns: List[Field], compared: List[Field], keep_stored: List[str],
+              rows: List[List[Any]]) -> Tuple[int, int]:
+    """
+    Streams rows with COPY into a temporary staging table, emptied at the end of the transaction, and merges them into
+    the table of the model. The merge returns whether each row it wrote was inserted, from the xmax system column.
+    :return: The number of rows inserted and updated
+    """
+    table: str = connection.ops.quote_name(model._meta.db_table)
+    staging: str = connection.ops.quote_name(STAGING_TABLE_PREFIX + model._meta.db_table)
+    names: str = ', '.join(connection.ops.quote_name(column.column) for column in columns)
+    cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) '
+                   f'ON COMMIT DELETE ROWS')
+    cursor.execute(f'TRUNCATE {staging}')
+    cursor.copy_expert(f'COPY {staging} ({names}) FROM STDIN WITH (FORMAT csv)', csv_rows(rows))
+
+    source: str = f'SELECT {names} FROM {staging}'
+    cursor.execute(merge_statement(model, columns, compared, keep_stored, source=source, vendor='postgresql') +
+                   ' RETURNING (xmax = 0)')
+    written: List[Tuple[bool]] = cursor.fetchall()
+    added: int = sum(1 for inserted, in written if inserted)
+    return added, len(written) - added
+
+
+def insert_rows(cursor: Any, model: Type[Model], columns: List[Field], compared: List[Field], keep_stored: List[str],
+                rows: List[List[Any]]) -> Tuple[int, int]:
+    """
+    Merges rows into the table of the model with executemany. The rows that already exist are queried first,
+    since SQLite only counts the rows each statement wrote.
+    :return: The number of rows inserted and updated
+    """
+    primary_keys: List[Any] = [row[0] for row in rows]
+    existing: int = model.objects.filter(pk__in=primary_keys).count()
+    source: str = f'VALUES ({", ".join(["%s"] * len(columns))})'
+    cursor.executemany(merge_statement(model, columns, compared, keep_stored, source=source, vendor=connection.vendor),
+                       rows)
+    added: int = len(rows) - existing
+    return added, cursor.rowcount - added
+
+
+def merge_statement(model: Type[Model], columns: List[Field], compared: List[Field], keep_stored: List[str], *,
+                    source: str, vendor: str) -> str:
+    """
+    Builds the INSERT ... ON CONFLICT statement that inserts new rows and updates the existing rows only if one of the
+    compared columns changed.
+    :param model: The model of the rows
+    :param columns: The columns of the rows, starting with the primary key
+    :param compared: The columns that are compared to decide if an existing row changed
+    :param keep_stored: The columns that keep their stored value when the new one is NULL
+    :param source: The VALUES clause or the SELECT query of the new rows
+    :param vendor: The database vendor, PostgreSQL and SQLite spell the null-safe comparison differently
+    :return: The SQL statement
+    """
+    quote = connection.ops.quote_name
+    table: str = quote(model._meta.db_table)
+    distinct: str = 'IS DISTINCT FROM' if vendor == 'postgresql' else 'IS NOT'
+
+    def new_value(column: Field) -> str:
+        name: str = quote(column.column)
+        return f'COALESCE(EXCLUDED.{name}, {table}.{name})' if column.column in keep_stored else f'EXCLUDED.{name}'
+
+    names: str = ', '.join(quote(column.column) for column in columns)
+    updates: str = ', '.join(f'{quote(column.column)} = {new_value(column)}' for column in columns[1:])
+    changes: str = ' OR '.join(f'{table}.{quote(column.column)} {distinct} {new_value(column)}' for column in compared)
+    return (f'INSERT INTO {table} ({names}) {source} ON CONFLICT ({quote(columns[0].column)}) '
+            f'DO UPDATE SET {updates} WHERE {changes}')
+
+
+def csv_rows(rows: Iterable[List[Any]]) -> io.StringIO:
+    """
+    Writes rows in the CSV format of COPY, where an unquoted empty value is NULL and every other value is quoted,
+    so empty strings are kept.
+    """
+    buffer: io.StringIO = io.StringIO()
+    for row in rows:
+        buffer.write(','.join('' if value is None else '"' + str(value).replace('"', '""') + '"' for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
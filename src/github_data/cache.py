@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.http import HttpRequest, HttpResponse
+
+from github_data.models import DatasetVersion
+
+# the headers of a response that are cached with its content.
+CACHED_HEADERS: Tuple[str, ...] = ('Content-Type', 'Link', 'Vary', 'Allow')
+CACHE_STATUS_HEADER: str = 'X-Cache'
+
+CachedResponse = Tuple[bytes, Dict[str, str]]
+
+
+class CacheStats:
+    """
+    Thread safe hit and miss counters of the API response cache of this process.
+    """
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def record(self, hit: bool) -> None:
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+api_cache_stats: CacheStats = CacheStats()
+
+
+def response_cache_key(request: HttpRequest, version: int) -> str:
+    """
+    Builds the cache key of a response from the dataset version, the absolute url of the request, which has the host
+    of the links in the response, and the Accept header that picks the renderer.
+    """
+    url_hash: str = hashlib.md5(
+        f'{request.build_absolute_uri()}|{request.META.get("HTTP_ACCEPT", "")}'.encode()
+    ).hexdigest()
+    return f'api-response:{version}:{url_hash}'
+
+
+def cache_response(view: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
+    """
+    Caches the successful GET responses of a view in the API_CACHE_ALIAS cache, keyed on the dataset version.
+    The scrapers bump the version after every transaction that writes users or repositories, so a response is only
+    served while the data it was rendered from is current, and the responses of older versions are left to the
+    eviction of the cache backend. The version itself is kept in the same cache for a few seconds, so a cache HIT
+    doesn't query the database. Every response says if it was a cache HIT or MISS in its X-Cache header.
+    :param view: The view function to cache
+    :return: The cached view function
+    """
+    @wraps(view)
+    def cached_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        cache: BaseCache = caches[settings.API_CACHE_ALIAS]
+        key: str = response_cache_key(request, DatasetVersion.cached())
+        cached: Optional[CachedResponse] = cache.get(key)
+        api_cache_stats.record(cached is not None)
+        if cached is not None:
+            content, headers = cached
+            response: HttpResponse = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            response[CACHE_STATUS_HEADER] = 'HIT'
+            return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render'):
+                response.render()
+            cache.set(key, (response.content, {
+                header: response[header] for header in CACHED_HEADERS if response.has_header(header)
+            }))
+        response[CACHE_STATUS_HEADER] = 'MISS'
+        return response
+
+    return cached_view
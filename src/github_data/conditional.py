@@ -0,0 +1,100 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from django.db.models import Count, Max
+from django.http import HttpRequest
+from django.views.decorators.http import condition
+
+from github_data.models import GithubUser, GithubRepository
+
+# the attribute of a request where the validators of its view are memoized.
+VALIDATORS_ATTRIBUTE: str = '_github_data_validators'
+
+
+class Validators(NamedTuple):
+    """
+    The ETag and the Last-Modified time of the data a response is rendered from.
+    """
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def memoized_validators(query: Callable[..., Optional[Validators]]) -> Callable[..., Optional[Validators]]:
+    """
+    Memoizes the validators of a request, since `condition` asks for the ETag and the Last-Modified time separately
+    and both come from the same query.
+    :param query: A function that queries the validators of the data of a request, or `None` if there is no data
+    :return: The memoized function
+    """
+    @wraps(query)
+    def memoized(request: HttpRequest, *args: Any, **kwargs: Any) -> Optional[Validators]:
+        validators: Dict[str, Optional[Validators]] = request.__dict__.setdefault(VALIDATORS_ATTRIBUTE, {})
+        if query.__name__ not in validators:
+            validators[query.__name__] = query(request, *args, **kwargs)
+        return validators[query.__name__]
+
+    return memoized
+
+
+def build_validators(request: HttpRequest, state: Any, *timestamps: Optional[datetime]) -> Validators:
+    """
+    Builds the validators of a response from the state of the rows it's rendered from.
+    The ETag also hashes the url and the Accept header, since every page and renderer has its own body.
+    :param request: The request of the response
+    :param state: Values that change when the rows change
+    :param timestamps: The times the rows were last written, `None` for the ones never written by the scraper
+    :return: The validators of the response
+    """
+    fingerprint: str = f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT", "")}|{state}'
+    known_timestamps: List[datetime] = [timestamp for timestamp in timestamps if timestamp is not None]
+    return Validators(hashlib.md5(fingerprint.encode()).hexdigest(), max(known_timestamps, default=None))
+
+
+@memoized_validators
+def user_repositories_validators(request: HttpRequest, login: str, **kwargs: Any) -> Optional[Validators]:
+    """
+    Queries the validators of the repositories of a user, with a single aggregate query over the index of the owner.
+    The number of repositories and their last id catch deleted and inserted rows, and the last time they were
+    written catches updated ones.
+    """
+    state: Optional[Dict[str, Any]] = GithubUser.objects.filter(login=login).annotate(
+        repositories_count=Count('repositories'), last_repository_id=Max('repositories__id'),
+        repositories_scraped_at=Max('repositories__scraped_at')
+    ).values('id', 'scraped_at', 'repositories_count', 'last_repository_id', 'repositories_scraped_at').first()
+    if state is None:
+        return None
+    return build_validators(request, sorted(state.items()), state['scraped_at'], state['repositories_scraped_at'])
+
+
+@memoized_validators
+def repository_validators(request: HttpRequest, owner: str, name: str, **kwargs: Any) -> Optional[Validators]:
+    """
+    Queries the validators of a repository and its owner, which is rendered with it.
+    """
+    state: Optional[Dict[str, Any]] = GithubRepository.objects.filter(full_name=f'{owner}/{name}').values(
+        'id', 'scraped_at', 'owner_id', 'owner__scraped_at'
+    ).first()
+    if state is None:
+        return None
+    return build_validators(request, sorted(state.items()), state['scraped_at'], state['owner__scraped_at'])
+
+
+def conditional(validators: Callable[..., Optional[Validators]]) -> Callable[[Callable], Callable]:
+    """
+    Answers the conditional GET requests of a view with 304 Not Modified when its data didn't change, from
+    `If-None-Match` or `If-Modified-Since`, without rendering the response. Responses of data never written by the
+    scraper only have an ETag.
+    :param validators: The memoized function that queries the validators of the data of a request
+    :return: The decorator of the view
+    """
+    def etag(request: HttpRequest, *args: Any, **kwargs: Any) -> Optional[str]:
+        result: Optional[Validators] = validators(request, *args, **kwargs)
+        return result.etag if result is not None else None
+
+    def last_modified(request: HttpRequest, *args: Any, **kwargs: Any) -> Optional[datetime]:
+        result: Optional[Validators] = validators(request, *args, **kwargs)
+        return result.last_modified if result is not None else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -12,3 +12,11 @@ class RateLimitExceededError(HTTPError):
         limit_reset_header: int = int(hdrs.get('X-RateLimit-Reset'))
         reset_difference: timedelta = datetime.utcfromtimestamp(limit_reset_header) - datetime.utcnow()
         self.limit_reset_seconds: int = math.ceil(reset_difference.total_seconds())
+
+
+class InvalidRecordError(ValueError):
+    """ GitHub data does not have the shape or the length limits required to be stored in the database. """
+
+
+class GraphQLQueryError(RuntimeError):
+    """ A GitHub GraphQL query failed with errors other than missing users, so its users were not fetched. """
@@ -0,0 +1,87 @@
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from github_data.models import GithubUser, GithubRepository
+
+# the number of rows fetched from the server-side cursor, and encoded into a single chunk of the output, at a time.
+EXPORT_CHUNK_SIZE: int = 2000
+# wbits of zlib for a gzip container instead of a raw zlib stream.
+GZIP_WBITS: int = 16 + zlib.MAX_WBITS
+
+USER_EXPORT_FIELDS: List[str] = ['id', 'login', 'url', 'updated_at']
+REPOSITORY_EXPORT_FIELDS: List[str] = ['id', 'full_name', 'name', 'description', 'url', 'updated_at', 'pushed_at']
+OWNER_EXPORT_FIELDS: List[str] = ['id', 'login', 'url']
+
+
+def export_users() -> Iterator[Dict[str, Any]]:
+    """
+    Streams every GitHub User in order of id, in the shape of the GitHub API data.
+    """
+    return GithubUser.objects.order_by('pk').values(*USER_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_repositories() -> Iterator[Dict[str, Any]]:
+    """
+    Streams every GitHub Repository in order of id with its owner, in the shape of the GitHub API data.
+    The owners are joined in the same query.
+    """
+    owner_fields: List[str] = [f'owner__{field}' for field in OWNER_EXPORT_FIELDS]
+    rows: Iterator[Dict[str, Any]] = GithubRepository.objects.order_by('pk').values(
+        *REPOSITORY_EXPORT_FIELDS, *owner_fields
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        row['owner'] = {field: row.pop(f'owner__{field}') for field in OWNER_EXPORT_FIELDS}
+        yield row
+
+
+EXPORTERS: Dict[str, Callable[[], Iterator[Dict[str, Any]]]] = {
+    'users': export_users,
+    'repositories': export_repositories,
+}
+
+
+def ndjson_chunks(rows: Iterable[Dict[str, Any]], *, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encodes rows as newline-delimited JSON, joining `chunk_size` rows into each chunk so the output isn't written
+    one small line at a time.
+    :param rows: The rows to encode
+    :param chunk_size: The number of rows in each chunk
+    :return: An iterator with the encoded chunks
+    """
+    lines: List[str] = []
+    for row in rows:
+        lines.append(json.dumps(row, cls=DjangoJSONEncoder))
+        if len(lines) >= chunk_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks into a single gzip stream, without holding more than a chunk in memory.
+    :param chunks: The chunks to compress
+    :return: An iterator with the compressed chunks
+    """
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    for chunk in chunks:
+        compressed: bytes = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_ndjson(model: str, *, compress: bool = False) -> Iterator[bytes]:
+    """
+    Streams the users or the repositories as newline-delimited JSON, in constant memory regardless of the size of the
+    table: rows are read from a server-side cursor (on PostgreSQL) in chunks and encoded as they are read.
+    :param model: `users` or `repositories`
+    :param compress: Whether or not to gzip the stream
+    :return: An iterator with the chunks of the stream
+    """
+    chunks: Iterator[bytes] = ndjson_chunks(EXPORTERS[model]())
+    return gzip_chunks(chunks) if compress else chunks
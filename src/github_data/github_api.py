@@ -0,0 +1,689 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging import Logger
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode
+
+from fastcore.basics import AttrDict
+from fastcore.foundation import L as fastlist
+from fastcore.xtras import dict2obj
+from ghapi.core import GhApi
+
+from github_data.archive import ResponseArchive
+from github_data.exceptions import RateLimitExceededError
+from github_data.metrics import ScraperMetrics
+from github_data.transport import DEFAULT_POOL_SIZE, ConnectionPool, send_json
+
+logger: Logger = logging.getLogger(__name__)
+
+# the length in seconds of a GitHub API rate limit window.
+RATE_LIMIT_WINDOW: int = 3600
+# the rate limit resources of the REST API and of the GraphQL API, which have separate budgets.
+CORE_RESOURCE: str = 'core'
+GRAPHQL_RESOURCE: str = 'graphql'
+# the number of times a request rejected by a secondary rate limit is sent again before giving up.
+SECONDARY_LIMIT_RETRIES: int = 5
+# the seconds waited before retrying a request rejected by a secondary rate limit without a Retry-After header,
+# doubled on every retry.
+SECONDARY_LIMIT_BACKOFF: float = 60
+
+# the messages in the body of a 403 that tell a secondary rate limit from any other forbidden request.
+SECONDARY_LIMIT_MESSAGES: Tuple[str, ...] = ('secondary rate limit', 'abuse detection')
+
+# the fields of each item kept in the response cache, enough to keep paginating over a page that did not change.
+CACHED_ITEM_FIELDS: List[str] = ['id', 'login']
+
+# entries of the response cache, by url.
+CacheEntries = Dict[str, Dict[str, Any]]
+
+
+class NotModifiedPage(fastlist):
+    """
+    List returned instead of a GitHub API page that did not change since it was cached (304 Not Modified).
+    It only has the cached ids (and logins) of the items, so they can be paginated but not written again.
+    """
+
+
+class NotModifiedItem(AttrDict):
+    """
+    Object returned instead of a GitHub API object that did not change since it was cached (304 Not Modified).
+    It only has the cached id (and login) of the object.
+    """
+
+
+def is_not_modified(response: Any) -> bool:
+    """
+    Checks if a GitHub API response was answered from the response cache.
+    :param response: The value returned by a GitHub API call
+    :return: Whether or not the response did not change since it was cached
+    """
+    return isinstance(response, (NotModifiedPage, NotModifiedItem))
+
+
+def get_header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    """
+    Gets the value of a header from a dictionary of response headers, ignoring the case of the name.
+    :param headers: The response headers
+    :param name: The name of the header
+    :return: The value of the header, or `None` if it's not in the response
+    """
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+class ResponseCache:
+    """
+    Persistent store of the ETag and Last-Modified validators of GitHub API responses, by url.
+    The cache is kept in memory, and its updates are appended to a file of JSON lines every `flush_interval` updates,
+    so saving it only writes what changed. When the file is loaded, the last line of a url replaces the earlier ones,
+    and `close` compacts the file to a single line per url at the end of a run.
+    A file is only written by one process. The processes of a sharded run each write their own file, which starts
+    from the entries of the shared one, and their files are merged into the shared one once every shard ended.
+    """
+    DEFAULT_FLUSH_INTERVAL: int = 1000
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, *, flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+                 shared_path: Optional[Union[str, Path]] = None):
+        """
+        Loads the response cache from a file.
+        :param path: The path of the JSON lines file where the cache is stored, `None` keeps it only in memory
+        :param flush_interval: The number of updates after which they are appended to the file
+        :param shared_path: The path of a cache file of other processes whose entries are loaded first, but which is
+        never written, like the cache of a sharded run for the file of one of its shards
+        """
+        self.path: Optional[Path] = Path(path) if path else None
+        self.flush_interval: int = flush_interval
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        # the updates not appended to the file yet, and the number of lines of the file replaced by later ones.
+        self.pending: List[str] = []
+        self.obsolete_lines: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+        if shared_path and Path(shared_path).exists():
+            self.entries.update(read_cache_file(Path(shared_path))[0])
+        if self.path and self.path.exists():
+            self.load()
+        logger.debug(f'response cache loaded with {len(self.entries)} entries.')
+
+    def load(self) -> None:
+        """
+        Reads the entries of the cache file. A line that can't be decoded, like the last line of a run that was
+        killed while writing it, is skipped, and the file is compacted right away so new lines are not appended to it.
+        :return:
+        """
+        entries, obsolete_lines, corrupt = read_cache_file(self.path)
+        self.obsolete_lines += obsolete_lines
+        self.entries.update(entries)
+        if corrupt:
+            self.compact()
+
+    def merge(self, path: Union[str, Path]) -> None:
+        """
+        Sets the entries of the cache file of another process, like one of the shards of a run, and deletes it.
+        :param path: The path of the cache file to merge
+        :return:
+        """
+        path = Path(path)
+        if not path.exists():
+            return
+        self.update(read_cache_file(path)[0])
+        path.unlink()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.obsolete_lines += 1
+            self.entries[key] = entry
+            if self.path:
+                self.pending.append(json.dumps([key, entry]))
+            flush: bool = len(self.pending) >= self.flush_interval
+        if flush:
+            self.flush()
+
+    def update(self, entries: CacheEntries) -> None:
+        """
+        Sets the entries of the responses a batch of users was written from, once the batch was committed.
+        :param entries: The entries to set, by url
+        :return:
+        """
+        for key, entry in entries.items():
+            self.set(key, entry)
+
+    def record(self, hit: bool) -> None:
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def flush(self) -> None:
+        """
+        Appends the pending updates to the cache file.
+        :return:
+        """
+        with self.lock:
+            if not self.path or not self.pending:
+                return
+            with open(self.path, 'a') as cache_file:
+                cache_file.write('\n'.join(self.pending) + '\n')
+            self.pending = []
+
+    def compact(self) -> None:
+        """
+        Rewrites the cache file with a line per url, replacing the previous one atomically.
+        :return:
+        """
+        with self.lock:
+            if not self.path:
+                return
+            temporary_path: Path = self.path.with_suffix(f'{self.path.suffix}.tmp')
+            with open(temporary_path, 'w') as cache_file:
+                for key, entry in self.entries.items():
+                    cache_file.write(json.dumps([key, entry]) + '\n')
+            os.replace(temporary_path, self.path)
+            self.pending = []
+            self.obsolete_lines = 0
+
+    def close(self) -> None:
+        """
+        Saves the pending updates at the end of a run, compacting the file if any of its lines were replaced.
+        :return:
+        """
+        if self.obsolete_lines:
+            self.compact()
+        else:
+            self.flush()
+
+
+def read_cache_file(path: Path) -> Tuple[CacheEntries, int, bool]:
+    """
+    Reads the entries of a response cache file, where the last line of a url replaces the earlier ones.
+    A line that can't be decoded is skipped.
+    :param path: The path of the cache file
+    :return: The entries by url, the number of lines replaced by later ones, and whether or not a line was skipped
+    """
+    entries: CacheEntries = {}
+    obsolete_lines: int = 0
+    corrupt: bool = False
+    with open(path) as cache_file:
+        for line in cache_file:
+            try:
+                record: Any = json.loads(line)
+            except ValueError:
+                logger.warning(f'- skipping a line of the response cache {path} that can not be decoded.')
+                corrupt = True
+                continue
+            # caches saved before the file was appended to are a single JSON object.
+            record_entries: CacheEntries = record if isinstance(record, dict) else dict([record])
+            obsolete_lines += 1 if isinstance(record, dict) else len(record_entries.keys() & entries.keys())
+            entries.update(record_entries)
+    return entries, obsolete_lines, corrupt
+
+
+def shard_cache_path(path: Union[str, Path], shard_id: int) -> Path:
+    """
+    :return: The path of the response cache file of a shard of a run, next to the cache file of the run
+    """
+    return Path(f'{path}.shard-{shard_id}')
+
+
+def is_rate_limited(status: int, headers: Mapping[str, str], resource: str = CORE_RESOURCE) -> bool:
+    """
+    Checks if a GitHub API response was rejected because the rate limit of its token was exhausted.
+    :param status: The status code of the response
+    :param headers: The response headers
+    :param resource: The rate limit resource the request spends
+    :return: Whether or not the token used for the request ran out of budget
+    """
+    if get_header(headers, 'X-RateLimit-Resource') not in (None, resource):
+        return False
+    return status in (403, 429) and get_header(headers, 'X-RateLimit-Remaining') == '0'
+
+
+def is_secondary_rate_limited(status: int, headers: Mapping[str, str], body: str = '') -> bool:
+    """
+    Checks if a GitHub API response was rejected by a secondary rate limit, which GitHub enforces on bursts of requests
+    even while the token has budget left: a 429 with budget left, or a 403 with budget left that has a Retry-After
+    header or says so in its message. Every response has the rate limit headers, so any other 403 is an ordinary
+    forbidden request.
+    :param status: The status code of the response
+    :param headers: The response headers
+    :param body: The body of the response
+    :return: Whether or not the request has to be sent again later with the same budget
+    """
+    remaining: Optional[str] = get_header(headers, 'X-RateLimit-Remaining')
+    if status == 429:
+        return remaining != '0'
+    if status != 403 or remaining == '0':
+        return False
+    message: str = body.lower()
+    return get_header(headers, 'Retry-After') is not None or any(text in message for text in SECONDARY_LIMIT_MESSAGES)
+
+
+def error_body(error: HTTPError) -> str:
+    """
+    Reads the body of an HTTPError raised by send_json without consuming it, so it can still be raised.
+    :param error: The error of the request
+    :return: The decoded body, empty if it can't be read
+    """
+    getvalue = getattr(error.fp, 'getvalue', None)
+    return getvalue().decode(errors='replace') if getvalue is not None else ''
+
+
+class TokenState:
+    """
+    The rate limit budget of a GitHub OAuth token, as reported by the last response that used it.
+    """
+    __slots__ = ('token', 'limit', 'remaining', 'reset')
+
+    DEFAULT_LIMIT: int = 5000
+
+    def __init__(self, token: str):
+        self.token: str = token
+        self.limit: int = self.DEFAULT_LIMIT
+        self.remaining: int = self.DEFAULT_LIMIT
+        self.reset: float = 0
+
+    def available(self, now: float) -> int:
+        """
+        :param now: The current unix time
+        :return: The number of requests the token can still do in the current rate limit window
+        """
+        return self.limit if now >= self.reset else self.remaining
+
+
+class TokenPool:
+    """
+    Pool of GitHub OAuth tokens that routes every request to the token with the most rate limit budget left.
+    The budget of each token is tracked for each rate limit resource, like `core` for the REST API and `graphql` for
+    the points of the GraphQL API, from the X-RateLimit headers of its responses.
+    """
+    def __init__(self, tokens: List[str]):
+        """
+        :param tokens: The GitHub OAuth tokens of the pool, duplicates are ignored. `None` sends anonymous requests
+        """
+        self.tokens: List[str] = list(dict.fromkeys(tokens))
+        self.resources: Dict[str, Dict[str, TokenState]] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def states(self, resource: str) -> Dict[str, TokenState]:
+        """
+        Gets the budget of every token for a rate limit resource, it has to be called with the lock held.
+        :param resource: The rate limit resource
+        :return: The state of each token
+        """
+        if resource not in self.resources:
+            self.resources[resource] = {token: TokenState(token) for token in self.tokens}
+        return self.resources[resource]
+
+    def budget(self, now: float, resource: str = CORE_RESOURCE) -> Tuple[int, int, float]:
+        """
+        Sums up the rate limit budget of every token in the pool.
+        :param now: The current unix time
+        :param resource: The rate limit resource of the budget
+        :return: The number of requests left, the total limit, and the number of requests per second
+        that spends the budget left of each token evenly until its reset time
+        """
+        with self.lock:
+            remaining: int = 0
+            limit: int = 0
+            rate: float = 0
+            for state in self.states(resource).values():
+                available: int = state.available(now)
+                remaining += available
+                limit += state.limit
+                window: float = state.reset - now if now < state.reset else RATE_LIMIT_WINDOW
+                rate += available / max(window, 1)
+            return remaining, limit, rate
+
+    def acquire(self, url: str, resource: str = CORE_RESOURCE) -> str:
+        """
+        Picks the token with the most budget left and reserves one request from it.
+        :param url: The url of the request, used in the error if the pool is exhausted
+        :param resource: The rate limit resource the request spends
+        :return: The token to use for the request
+        :raises RateLimitExceededError: If every token in the pool ran out of budget
+        """
+        with self.lock:
+            now: float = time.time()
+            states: Dict[str, TokenState] = self.states(resource)
+            state: TokenState = max(states.values(), key=lambda token_state: token_state.available(now))
+            if not state.available(now):
+                reset: float = min(token_state.reset for token_state in states.values())
+                raise RateLimitExceededError(
+                    url, 403, 'Rate Limit Exceeded', {'X-RateLimit-Reset': str(int(reset))}, None
+                )
+            if now >= state.reset:
+                state.remaining = state.limit
+            state.remaining -= 1
+            return state.token
+
+    def update(self, token: str, headers: Mapping[str, str]) -> None:
+        """
+        Updates the budget of a token with the X-RateLimit headers of a response, for the resource of the response.
+        :param token: The token used for the request
+        :param headers: The response headers
+        :return:
+        """
+        remaining: Optional[str] = get_header(headers, 'X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        resource: str = get_header(headers, 'X-RateLimit-Resource') or CORE_RESOURCE
+        with self.lock:
+            state: TokenState = self.states(resource)[token]
+            state.remaining = int(remaining)
+            state.limit = int(get_header(headers, 'X-RateLimit-Limit') or state.limit)
+            state.reset = float(get_header(headers, 'X-RateLimit-Reset') or state.reset)
+
+
+class RateLimitGovernor:
+    """
+    Paces the requests sent with a token pool so its rate limit budget lasts until the reset time.
+    Requests are sent right away while more than `threshold` of the budget is left. Below it, they are spaced
+    evenly so the budget left is spread over the rest of the rate limit window, instead of running out of it.
+    """
+    DEFAULT_THRESHOLD: float = 0.1
+
+    def __init__(self, token_pool: TokenPool, *, threshold: float = DEFAULT_THRESHOLD):
+        """
+        :param token_pool: The token pool whose budget is paced
+        :param threshold: The fraction of the budget left below which the requests are paced, 0 disables pacing
+        """
+        self.token_pool: TokenPool = token_pool
+        self.threshold: float = threshold
+        self.next_request: float = 0
+        self.waited: float = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserves the next request slot of the pool.
+        :return: The number of seconds to wait before sending the request
+        """
+        with self.lock:
+            now: float = time.time()
+            remaining, limit, rate = self.token_pool.budget(now)
+            # with no budget left there's nothing to pace, the pool raises until the reset time.
+            if not remaining or remaining > limit * self.threshold:
+                self.next_request = now
+                return 0
+
+            start: float = max(self.next_request, now)
+            self.next_request = start + 1 / rate
+            self.waited += start - now
+            return start - now
+
+
+class ScraperApi(GhApi):
+    """
+    GhApi client used by the Scraper.
+    GET requests send the validators of the cached response, so pages that did not change are answered with
+    a 304 (which doesn't count against the rate limit) and returned as NotModifiedPage/NotModifiedItem.
+    With a list of tokens, each request is routed to the token with the most rate limit budget left.
+    The budget left is read from the headers of every response, and requests are paced when it runs low.
+    Requests rejected by a secondary rate limit are sent again after its Retry-After time, or an exponential backoff.
+    """
+    def __init__(self, *, token: Optional[str] = None, tokens: Optional[List[str]] = None,
+                 gh_host: Optional[str] = None, response_cache: Optional[ResponseCache] = None,
+                 pacing_threshold: float = RateLimitGovernor.DEFAULT_THRESHOLD,
+                 metrics: Optional[ScraperMetrics] = None, pool_size: int = DEFAULT_POOL_SIZE,
+                 response_archive: Optional[ResponseArchive] = None,
+                 secondary_limit_retries: int = SECONDARY_LIMIT_RETRIES,
+                 secondary_limit_backoff: float = SECONDARY_LIMIT_BACKOFF):
+        """
+        Initializes the GitHub API client.
+        :param token: Github OAuth token to get a better rate limit
+        :param tokens: Github OAuth tokens to rotate across, they take precedence over `token`
+        :param gh_host: The base url of the GitHub API, defaults to https://api.github.com
+        :param response_cache: The cache of response validators, `None` disables conditional requests
+        :param pacing_threshold: The fraction of the rate limit budget left below which requests are paced
+        :param metrics: The metrics the latency of the requests, the pacing and the budget left are recorded in
+        :param pool_size: The number of idle keep-alive connections kept for the requests to the GitHub API
+        :param response_archive: The archive every successful response is appended to, `None` disables it
+        :param secondary_limit_retries: The number of times a request rejected by a secondary rate limit is retried
+        :param secondary_limit_backoff: The seconds waited before the first retry of a request rejected by a secondary
+        rate limit without a Retry-After header, doubled on every retry
+        """
+        super().__init__(token=token, gh_host=gh_host)
+        # a single token (or none) is a pool of one, so its budget is tracked and paced the same way.
+        self.token_pool: TokenPool = TokenPool(tokens or [token])
+        self.governor: RateLimitGovernor = RateLimitGovernor(self.token_pool, threshold=pacing_threshold)
+        self.response_cache: Optional[ResponseCache] = response_cache
+        self.metrics: ScraperMetrics = metrics or ScraperMetrics()
+        self.connection_pool: ConnectionPool = ConnectionPool(pool_size)
+        self.response_archive: Optional[ResponseArchive] = response_archive
+        self.secondary_limit_retries: int = max(secondary_limit_retries, 0)
+        self.secondary_limit_backoff: float = secondary_limit_backoff
+        # the cache entries staged by each thread, see `staging_responses`.
+        self.staged_responses: threading.local = threading.local()
+
+    @contextmanager
+    def staging_responses(self) -> Iterator[CacheEntries]:
+        """
+        Context manager that stages the cache entries of the responses received by this thread instead of setting
+        them, so the scraper only caches a page once the rows written from it were committed. A page cached before
+        that would be answered with a 304, and never written, by a run resuming after a failed write.
+        :return: The staged entries, by url
+        """
+        previous: Optional[CacheEntries] = getattr(self.staged_responses, 'entries', None)
+        entries: CacheEntries = {}
+        self.staged_responses.entries = entries
+        try:
+            yield entries
+        finally:
+            self.staged_responses.entries = previous
+
+    def __call__(self, path: str, verb: str = None, headers: dict = None,
+                 route: dict = None, query: dict = None, data=None) -> Any:
+        """
+        Calls a fully specified GitHub API `path` using the HTTP `verb`, like GhApi does, but keeping the response
+        headers of each call separate so the client can be shared between threads.
+        """
+        verb = (verb or ('POST' if data else 'GET')).upper()
+        headers = {**self.headers, **(headers or {})}
+        if not path.startswith(('http://', 'https://')):
+            path = self.gh_host + path
+        route = {key: quote(str(value)) for key, value in route.items()} if route else None
+        query = {key: value for key, value in query.items() if value is not None} if query else None
+
+        if self.response_cache is None or verb != 'GET':
+            response, self.recv_hdrs = self.send(path, verb, headers, route, query, data)
+            return dict2obj(response)
+
+        key: str = self.cache_key(path, route, query)
+        entry: Optional[Dict[str, Any]] = self.response_cache.get(key)
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response, response_headers = self.send(path, verb, headers, route, query, data)
+        except HTTPError as error:
+            if error.code != 304 or not entry:
+                raise
+            logger.debug(f'--- not modified: {key}')
+            self.response_cache.record(hit=True)
+            if entry.get('is_list'):
+                return NotModifiedPage(NotModifiedItem(item) for item in entry['items'])
+            return NotModifiedItem(entry['items'][0])
+
+        self.recv_hdrs = response_headers
+        self.response_cache.record(hit=False)
+        etag: Optional[str] = get_header(response_headers, 'ETag')
+        last_modified: Optional[str] = get_header(response_headers, 'Last-Modified')
+        if etag or last_modified:
+            items: List[Any] = response if isinstance(response, list) else [response]
+            entry = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'is_list': isinstance(response, list),
+                'items': [
+                    {field: item[field] for field in CACHED_ITEM_FIELDS if field in item}
+                    for item in items if isinstance(item, dict)
+                ],
+            }
+            staged: Optional[CacheEntries] = getattr(self.staged_responses, 'entries', None)
+            if staged is not None:
+                staged[key] = entry
+            else:
+                self.response_cache.set(key, entry)
+        return dict2obj(response)
+
+    def send(self, url: str, verb: str, headers: Dict[str, str], route: Optional[dict],
+             query: Optional[dict], data: Any, *, resource: str = CORE_RESOURCE) -> Tuple[Any, Dict[str, str]]:
+        """
+        Sends a request to the GitHub API with a token from the pool, waiting first if the governor paces it.
+        Requests rejected because their token ran out of budget are retried with the next token, and requests
+        rejected by a secondary rate limit are retried with a backoff.
+        Only the requests of the core resource are paced, the governor paces the budget of the REST API.
+        :param resource: The rate limit resource the request spends
+        :return: The decoded JSON response and the response headers
+        :raises RateLimitExceededError: If every token in the pool ran out of budget, or the request was rejected by
+        a secondary rate limit too many times
+        """
+        secondary_limit_retries: int = 0
+        while True:
+            delay: float = self.governor.reserve() if resource == CORE_RESOURCE else 0
+            if delay:
+                logger.debug(f'--- pacing requests, waiting {delay:.2f} seconds.')
+                time.sleep(delay)
+                self.metrics.record_sleep('pacing', delay)
+            token: Optional[str] = self.token_pool.acquire(url, resource)
+            request_headers: Dict[str, str] = {**headers, 'Authorization': f'token {token}'} if token else headers
+            start: float = time.perf_counter()
+            try:
+                response, response_headers = self.request(url, verb, request_headers, route, query, data)
+            except HTTPError as error:
+                self.record_response(token, url, verb, time.perf_counter() - start, error.headers)
+                if is_rate_limited(error.code, error.headers, resource):
+                    logger.debug(f'--- token ...{(token or "")[-4:]} ran out of rate limit budget.')
+                    continue
+                if is_secondary_rate_limited(error.code, error.headers, error_body(error)):
+                    delay = self.secondary_limit_delay(url, error.code, error.headers, secondary_limit_retries)
+                    logger.debug(f'--- secondary rate limit reached, waiting {delay:.2f} seconds.')
+                    time.sleep(delay)
+                    self.metrics.record_sleep('secondary_rate_limit', delay)
+                    secondary_limit_retries += 1
+                    continue
+                raise
+            self.record_response(token, url, verb, time.perf_counter() - start, response_headers)
+            self.archive_response(url, verb, route, query, response)
+            return response, response_headers
+
+    def graphql(self, query: str, variables: Dict[str, Any]) -> Tuple[Any, Dict[str, str]]:
+        """
+        Sends a query to the GitHub GraphQL API, spending the budget of the graphql resource of the token pool.
+        :param query: The GraphQL query
+        :param variables: The variables of the query
+        :return: The decoded JSON response, and the headers of this response. `recv_hdrs` is shared by every thread
+        using the client, so it may have the headers of another request
+        """
+        response, headers = self.send(
+            f'{self.gh_host}/graphql', 'POST', dict(self.headers), None, None,
+            {'query': query, 'variables': variables}, resource=GRAPHQL_RESOURCE
+        )
+        return dict2obj(response), headers
+
+    def secondary_limit_delay(self, url: str, status: int, headers: Mapping[str, str], retries: int) -> float:
+        """
+        Calculates how long to wait before sending again a request rejected by a secondary rate limit: the seconds of
+        its Retry-After header, or an exponential backoff if it doesn't have one.
+        :param url: The url of the request
+        :param status: The status code of the response
+        :param headers: The response headers
+        :param retries: The number of times the request was already retried
+        :return: The number of seconds to wait
+        :raises RateLimitExceededError: If the request was already retried `secondary_limit_retries` times, with the
+        time to wait before trying again as its reset time
+        """
+        try:
+            delay: float = max(float(get_header(headers, 'Retry-After')), 0)
+        except (TypeError, ValueError):
+            delay = self.secondary_limit_backoff * 2 ** retries
+        if retries >= self.secondary_limit_retries:
+            reset: str = str(math.ceil(time.time() + delay))
+            raise RateLimitExceededError(
+                url, status, 'Secondary Rate Limit Exceeded', {'X-RateLimit-Reset': reset}, None
+            )
+        return delay
+
+    def endpoint(self, verb: str, url: str) -> str:
+        """
+        Labels the requests to a url template, like `GET /users/{username}/repos`, so all its pages share the label.
+        """
+        path: str = url[len(self.gh_host):] if url.startswith(self.gh_host) else url
+        return f'{verb} {path}'
+
+    def record_response(self, token: Optional[str], url: str, verb: str, seconds: float,
+                        headers: Mapping[str, str]) -> None:
+        """
+        Updates the budget of the token with the headers of a response and records it in the metrics.
+        :param token: The token used for the request
+        :param url: The url template of the request, its path labels the latency so pages of an endpoint add up
+        :param verb: The HTTP method of the request
+        :param seconds: The time the request took
+        :param headers: The response headers
+        :return:
+        """
+        self.token_pool.update(token, headers)
+        self.metrics.observe_request(self.endpoint(verb, url), seconds)
+        remaining, limit, _ = self.token_pool.budget(time.time())
+        self.metrics.record_rate_limit(remaining, limit)
+
+    def archive_response(self, url: str, verb: str, route: Optional[dict], query: Optional[dict],
+                         response: Any) -> None:
+        """
+        Appends a successful response to the response archive, if there is one.
+        :param url: The url template of the request
+        :param verb: The HTTP method of the request
+        :param route: The values of the parameters in the url template
+        :param query: The query string parameters of the request
+        :param response: The decoded JSON response
+        :return:
+        """
+        if self.response_archive is not None:
+            self.response_archive.append(self.endpoint(verb, url), self.gh_host, route, query, response)
+
+    def request(self, url: str, verb: str, headers: Dict[str, str], route: Optional[dict],
+                query: Optional[dict], data: Any) -> Tuple[Any, Dict[str, str]]:
+        """
+        Sends a single HTTP request to the GitHub API through a keep-alive connection of the pool, shared by every
+        thread of the scraper.
+        :return: The decoded JSON response and the response headers
+        """
+        if route:
+            url = url.format(**route)
+        if query:
+            url += '?' + urlencode(query)
+        # GhApi operations send an empty dict as the data of requests without a body.
+        data = data or None
+        body: Optional[bytes] = json.dumps(data).encode() if isinstance(data, dict) else data
+        return send_json(self.connection_pool, url, verb, headers, body)
+
+    def cache_key(self, url: str, route: Optional[dict], query: Optional[dict]) -> str:
+        """
+        Builds the response cache key of a request from its url, route and query parameters.
+        :return: The url of the request, with the query parameters sorted
+        """
+        if route:
+            url = url.format(**route)
+        if query:
+            url += '?' + urlencode(sorted(query.items()))
+        return url
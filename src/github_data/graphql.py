@@ -0,0 +1,151 @@
+import logging
+import time
+from logging import Logger
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from fastcore.basics import AttrDict
+from fastcore.foundation import L as fastlist
+
+from github_data.exceptions import GraphQLQueryError, RateLimitExceededError
+from github_data.github_api import RATE_LIMIT_WINDOW, ScraperApi, get_header
+
+logger: Logger = logging.getLogger(__name__)
+
+# the repositories of a user that the REST API lists: the public repositories the user owns, by name.
+USER_REPOSITORIES_QUERY: str = '''
+    user{index}: user(login: $login{index}) {{
+        databaseId
+        login
+        repositories(first: $first, after: $after{index}, ownerAffiliations: OWNER, privacy: PUBLIC,
+                     orderBy: {{field: NAME, direction: ASC}}) {{
+            pageInfo {{ hasNextPage endCursor }}
+            nodes {{ databaseId name nameWithOwner description }}
+        }}
+    }}'''
+
+
+def build_users_query(number_of_users: int) -> str:
+    """
+    Builds a GraphQL query that fetches a page of repositories of several users, using an alias per user.
+    The query variables are `first`, and `login{index}` and `after{index}` for each user.
+    :param number_of_users: The number of users in the query
+    :return: The GraphQL query
+    """
+    parameters: str = ', '.join(
+        f'$login{index}: String!, $after{index}: String' for index in range(number_of_users)
+    )
+    users: str = ''.join(USER_REPOSITORIES_QUERY.format(index=index) for index in range(number_of_users))
+    return f'query($first: Int!, {parameters}) {{{users}\n}}'
+
+
+def user_data(node: Mapping, api_host: str) -> AttrDict:
+    """
+    Converts a GraphQL User node into the shape of the GitHub REST API user data.
+    :param node: The GraphQL User node
+    :param api_host: The base url of the GitHub REST API
+    :return: The user data
+    """
+    return AttrDict(id=node['databaseId'], login=node['login'], url=f'{api_host}/users/{node["login"]}')
+
+
+def repository_data(node: Mapping, owner: AttrDict, api_host: str) -> AttrDict:
+    """
+    Converts a GraphQL Repository node into the shape of the GitHub REST API repository data.
+    :param node: The GraphQL Repository node
+    :param owner: The user data of the owner of the repository
+    :param api_host: The base url of the GitHub REST API
+    :return: The repository data
+    """
+    return AttrDict(
+        id=node['databaseId'], owner=owner, name=node['name'], full_name=node['nameWithOwner'],
+        description=node['description'], url=f'{api_host}/repos/{node["nameWithOwner"]}'
+    )
+
+
+class GraphQLFetcher:
+    """
+    Fetches users and their repositories from the GitHub GraphQL API in batches, one query for a whole batch of
+    users and their first page of repositories. The data is converted to the shape of the REST API data, so it's
+    written to the database like the data of the REST API.
+    """
+    def __init__(self, api: ScraperApi, *, repositories_page_size: int):
+        """
+        :param api: The GitHub API client used to send the queries
+        :param repositories_page_size: The number of repositories fetched for each user in a query. max: 100
+        """
+        self.api: ScraperApi = api
+        self.repositories_page_size: int = repositories_page_size
+
+    def fetch_users(self, logins: List[str], *,
+                    number_of_repositories: int) -> List[Optional[Tuple[AttrDict, List[AttrDict]]]]:
+        """
+        Fetches a batch of users and their repositories. Users with more repositories than fit in the first query
+        are paginated together in the next queries.
+        :param logins: The usernames of the users
+        :param number_of_repositories: The number of repositories to be fetched for each user, 0 means all
+        :return: The user data and the list of repository data of each user, in order.
+        `None` for the users that don't exist
+        """
+        first: int = min(number_of_repositories or self.repositories_page_size, self.repositories_page_size)
+        results: List[Optional[Tuple[AttrDict, List[AttrDict]]]] = [None] * len(logins)
+        cursors: Dict[int, Optional[str]] = {index: None for index in range(len(logins))}
+
+        while cursors:
+            pending: List[int] = list(cursors)
+            nodes: List[Optional[Mapping]] = self.query_repositories(
+                [logins[index] for index in pending], [cursors[index] for index in pending], first
+            )
+            cursors = {}
+            for index, node in zip(pending, nodes):
+                if node is None:
+                    logger.warning(f'-- user {logins[index]} was not found.')
+                    continue
+                if results[index] is None:
+                    results[index] = (user_data(node, self.api.gh_host), [])
+                owner, repositories = results[index]
+                repositories.extend(
+                    repository_data(repository, owner, self.api.gh_host) for repository in node['repositories']['nodes']
+                )
+
+                # keep paginating the users that have more repositories than the ones fetched so far.
+                page_info: Mapping = node['repositories']['pageInfo']
+                wants_more: bool = not number_of_repositories or len(repositories) < number_of_repositories
+                if page_info['hasNextPage'] and wants_more:
+                    cursors[index] = page_info['endCursor']
+
+        for result in results:
+            if result is not None and number_of_repositories:
+                del result[1][number_of_repositories:]
+        return results
+
+    def query_repositories(self, logins: List[str], cursors: List[Optional[str]],
+                           first: int) -> List[Optional[Mapping]]:
+        """
+        Sends a single GraphQL query for a page of repositories of each user.
+        :param logins: The usernames of the users
+        :param cursors: The cursor after which the repositories of each user continue, `None` for the first page
+        :param first: The number of repositories in the page
+        :return: The User node of each user, in order. `None` for the users that don't exist
+        :raises RateLimitExceededError: If the GraphQL rate limit was exceeded
+        :raises GraphQLQueryError: If the query failed with errors other than missing users
+        """
+        variables: Dict[str, Any] = {'first': first}
+        for index, (login, cursor) in enumerate(zip(logins, cursors)):
+            variables[f'login{index}'] = login
+            variables[f'after{index}'] = cursor
+
+        logger.debug(f'-- querying {first} repositories for {len(logins)} user(s)')
+        response, headers = self.api.graphql(build_users_query(len(logins)), variables)
+        errors: fastlist = response.get('errors') or fastlist()
+        if any(error.get('type') == 'RATE_LIMITED' for error in errors):
+            reset: str = get_header(headers, 'X-RateLimit-Reset') or str(int(time.time()) + RATE_LIMIT_WINDOW)
+            raise RateLimitExceededError(
+                f'{self.api.gh_host}/graphql', 403, 'Rate Limit Exceeded', {'X-RateLimit-Reset': reset}, None
+            )
+        # the users of the query are not written, so the scrape run retries them when it's resumed.
+        failures: List[str] = [error.get('message', '') for error in errors if error.get('type') != 'NOT_FOUND']
+        if failures:
+            raise GraphQLQueryError(f'graphql query for {", ".join(logins)} failed: {"; ".join(failures)}')
+
+        data: Mapping = response.get('data') or {}
+        return [data.get(f'user{index}') for index in range(len(logins))]
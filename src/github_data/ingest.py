@@ -0,0 +1,314 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from logging import Logger
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Type
+
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Model
+from django.utils import timezone
+
+from github_data.bulk_load import bulk_load, supports_bulk_load
+from github_data.exceptions import InvalidRecordError
+from github_data.models import DatasetVersion, GithubUser, GithubRepository
+from github_data.records import UserRecord, RepositoryRecord
+
+logger: Logger = logging.getLogger(__name__)
+
+USER_FIELDS: List[str] = ['login', 'url', 'updated_at']
+REPOSITORY_FIELDS: List[str] = ['owner', 'full_name', 'name', 'description', 'url', 'updated_at', 'pushed_at']
+# fields missing from summaries, like the users list or the owner of a repository, which keep their stored value.
+SUMMARY_MISSING_FIELDS: Set[str] = {'updated_at', 'pushed_at'}
+SCRAPED_AT_FIELD: str = 'scraped_at'
+# the number of rows written by each bulk statement, and rolled back together if one of them fails.
+DEFAULT_BATCH_SIZE: int = 500
+
+
+class IngestResult(NamedTuple):
+    """
+    The number of rows inserted and updated by an ingest call.
+    """
+    added: int = 0
+    updated: int = 0
+
+
+class OwnerCache:
+    """
+    Bounded set of GithubUser ids known to be in the database, evicting the least recently used ids.
+    A scraper keeps one per run so repository ingestion doesn't query for owners it already wrote or saw.
+    The ids written by a transaction are staged until it's committed: the rest of the transaction knows them right away,
+    but they are only added to the cache on commit, so a rollback can't leave the ids of rows that don't exist.
+    """
+    DEFAULT_MAX_SIZE: int = 100000
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size: int = max(max_size, 1)
+        self.ids: OrderedDict = OrderedDict()
+        self.staged: Set[int] = set()
+
+    def __contains__(self, user_id: int) -> bool:
+        if user_id in self.staged:
+            return True
+        if user_id not in self.ids:
+            return False
+        self.ids.move_to_end(user_id)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def update(self, user_ids: Iterable[int]) -> None:
+        """
+        Adds user ids to the cache, evicting the least recently used ones if it's full.
+        :param user_ids: The ids of users that are in the database
+        :return:
+        """
+        for user_id in user_ids:
+            self.ids[user_id] = None
+            self.ids.move_to_end(user_id)
+        while len(self.ids) > self.max_size:
+            self.ids.popitem(last=False)
+
+    def stage(self, user_ids: Iterable[int]) -> None:
+        """
+        Stages the ids of users written by the current transaction, which are added to the cache when it's committed,
+        or right away outside of a transaction.
+        :param user_ids: The ids of users written to the database
+        :return:
+        """
+        register: bool = not self.staged
+        self.staged.update(user_ids)
+        if register and self.staged:
+            transaction.on_commit(self.commit)
+
+    def commit(self) -> None:
+        """
+        Adds the staged ids to the cache, once the transaction that wrote them was committed.
+        :return:
+        """
+        staged, self.staged = self.staged, set()
+        self.update(staged)
+
+    def discard(self) -> None:
+        """
+        Drops the staged ids of a transaction that was rolled back.
+        :return:
+        """
+        self.staged.clear()
+
+
+def ingest_users(users_data: Iterable[Mapping], *, owner_cache: Optional[OwnerCache] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> IngestResult:
+    """
+    Validates a page of GitHub User data and upserts it into the database with bulk statements.
+    Invalid users are skipped.
+    :param users_data: The list containing user data
+    :param owner_cache: The cache where the ids of the users stored in the database are added, once committed
+    :param batch_size: The number of users written by each bulk statement
+    :return: The number of users inserted and updated
+    """
+    users: Dict[int, GithubUser] = {}
+    for user_data in users_data:
+        user: Optional[GithubUser] = build_user(user_data)
+        if user is not None:
+            users[user.id] = user
+    stored_users: Set[int] = set()
+    result: IngestResult = upsert(GithubUser, users, USER_FIELDS, stored_ids_cache=stored_users, batch_size=batch_size)
+    if owner_cache is not None:
+        owner_cache.stage(stored_users)
+    return result
+
+
+def ingest_repositories(repositories_data: Iterable[Mapping], *, owner_cache: Optional[OwnerCache] = None,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> IngestResult:
+    """
+    Validates a page of GitHub Repository data and upserts it into the database with bulk statements.
+    The owners of the repositories are upserted first, unless they are in the owner cache.
+    Invalid repositories are skipped.
+    :param repositories_data: The list containing repository data
+    :param owner_cache: The ids of the users known to be in the database
+    :param batch_size: The number of repositories written by each bulk statement
+    :return: The number of repositories inserted and updated
+    """
+    owners: Dict[int, GithubUser] = {}
+    repositories: Dict[int, GithubRepository] = {}
+    for repository_data in repositories_data:
+        record: Optional[RepositoryRecord] = build_record(RepositoryRecord, repository_data)
+        if record is not None:
+            repositories[record.id] = record.to_model()
+            if owner_cache is None or record.owner.id not in owner_cache:
+                owners[record.owner.id] = record.owner.to_model()
+
+    stored_owners: Set[int] = set()
+    with transaction.atomic():
+        upsert(GithubUser, owners, USER_FIELDS, stored_ids_cache=stored_owners, batch_size=batch_size)
+        result: IngestResult = upsert(GithubRepository, repositories, REPOSITORY_FIELDS, batch_size=batch_size)
+
+    # the owners are only remembered by the cache once the outer transaction, if any, is committed.
+    if owner_cache is not None:
+        owner_cache.stage(stored_owners)
+    return result
+
+
+def build_user(user_data: Mapping) -> Optional[GithubUser]:
+    """
+    Builds and validates a GithubUser object from GitHub User data without querying the database.
+    :param user_data: Github User data
+    :return: The GithubUser object, or `None` if the data is not valid
+    """
+    record: Optional[UserRecord] = build_record(UserRecord, user_data)
+    return record.to_model() if record is not None else None
+
+
+def build_record(record_class: Type, data: Mapping) -> Optional[Any]:
+    """
+    Validates GitHub data into a record, logging and skipping it if it's not valid.
+    :param record_class: The record class used to validate the data (UserRecord or RepositoryRecord)
+    :param data: Github User or Repository data
+    :return: The validated record, or `None` if the data is not valid
+    """
+    try:
+        return record_class.from_data(data)
+    except InvalidRecordError as error:
+        logger.debug(f'- skipping invalid {record_class.__name__} {data.get("id")}: {error}')
+        return None
+
+
+def upsert(model: Type[Model], objects: Dict[int, Model], fields: List[str], *,
+           stored_ids_cache: Optional[Set[int]] = None,
+           batch_size: int = DEFAULT_BATCH_SIZE) -> IngestResult:
+    """
+    Inserts the objects that are not in the database and updates the ones that changed, in batches of bulk
+    statements. Batches are merged with raw statements by load_batch on the databases bulk_load supports, and with
+    the ORM by upsert_batch on the rest. Each batch runs in a savepoint, so if the database rejects one of its rows,
+    the batch is rolled back and written again one row at a time, skipping the rows that are rejected.
+    If any row was written, the dataset version is bumped when the transaction is committed.
+    :param model: The model of the objects
+    :param objects: The objects to upsert, by primary key
+    :param fields: The names of the fields to update in existing rows
+    :param stored_ids_cache: A set where the primary keys of the rows in the database after the upsert are added
+    :param batch_size: The number of objects written by each bulk statement. min: 1
+    :return: The number of rows inserted and updated
+    """
+    primary_keys: List[int] = list(objects)
+    batch_size = max(batch_size, 1)
+    write_batch: Callable[..., IngestResult] = load_batch if supports_bulk_load() else upsert_batch
+    added: int = 0
+    updated: int = 0
+    for start in range(0, len(primary_keys), batch_size):
+        batch: Dict[int, Model] = {pk: objects[pk] for pk in primary_keys[start:start + batch_size]}
+        try:
+            result: IngestResult = write_batch(model, batch, fields, stored_ids_cache=stored_ids_cache)
+        except (DataError, IntegrityError) as error:
+            logger.warning(f'-- {model.__name__} batch rejected by the database, writing it row by row: {error}')
+            result = upsert_rows(model, batch, fields, stored_ids_cache=stored_ids_cache)
+        added += result.added
+        updated += result.updated
+    if added or updated:
+        # the cached API responses are invalidated once the rows written are visible to them.
+        bump_dataset_version_on_commit()
+    return IngestResult(added=added, updated=updated)
+
+
+def bump_dataset_version_on_commit() -> None:
+    """
+    Bumps the dataset version when the current transaction is committed, or right away outside of a transaction.
+    The version is bumped once per transaction, no matter how many upserts it runs, so the writes of a page of the
+    scraper or a batch of import_data invalidate the cached API responses once.
+    :return:
+    """
+    pending: List = transaction.get_connection().run_on_commit
+    if not any(callback == DatasetVersion.bump for _, callback, *_ in pending):
+        transaction.on_commit(DatasetVersion.bump)
+
+
+def upsert_rows(model: Type[Model], objects: Dict[int, Model], fields: List[str], *,
+                stored_ids_cache: Optional[Set[int]] = None) -> IngestResult:
+    """
+    Upserts objects one at a time, each in its own savepoint, skipping the ones the database rejects.
+    :param model: The model of the objects
+    :param objects: The objects to upsert, by primary key
+    :param fields: The names of the fields to update in existing rows
+    :param stored_ids_cache: A set where the primary keys of the rows in the database after the upsert are added
+    :return: The number of rows inserted and updated
+    """
+    added: int = 0
+    updated: int = 0
+    for pk, instance in objects.items():
+        try:
+            result: IngestResult = upsert_batch(model, {pk: instance}, fields, stored_ids_cache=stored_ids_cache)
+        except (DataError, IntegrityError) as error:
+            logger.debug(f'- skipping {model.__name__} {pk} rejected by the database: {error}')
+            continue
+        added += result.added
+        updated += result.updated
+    return IngestResult(added=added, updated=updated)
+
+
+def load_batch(model: Type[Model], objects: Dict[int, Model], fields: List[str], *,
+               stored_ids_cache: Optional[Set[int]] = None) -> IngestResult:
+    """
+    Inserts the objects that are not in the database and updates the ones that changed with the raw bulk statements
+    of bulk_load, like upsert_batch does with the ORM. Summary fields missing from the objects keep their stored value,
+    and the rows inserted or updated get the time they were written in `scraped_at`.
+    New objects that conflict with existing rows on a unique field reject the whole batch.
+    :param model: The model of the objects
+    :param objects: The objects to upsert, by primary key
+    :param fields: The names of the fields to update in existing rows
+    :param stored_ids_cache: A set where the primary keys of the rows in the database after the upsert are added
+    :return: The number of rows inserted and updated
+    """
+    added, updated = bulk_load(
+        model, list(objects.values()), fields,
+        keep_stored_fields=SUMMARY_MISSING_FIELDS.intersection(fields), timestamp_field=SCRAPED_AT_FIELD
+    )
+    if stored_ids_cache is not None:
+        stored_ids_cache.update(objects)
+    return IngestResult(added=added, updated=updated)
+
+
+def upsert_batch(model: Type[Model], objects: Dict[int, Model], fields: List[str], *,
+                 stored_ids_cache: Optional[Set[int]] = None) -> IngestResult:
+    """
+    Inserts the objects that are not in the database and updates the ones that changed, using bulk statements
+    in a single savepoint.
+    New objects that conflict with existing rows on a unique field are ignored and not counted as added.
+    The rows inserted or updated get the time they were written in `scraped_at`.
+    :param model: The model of the objects
+    :param objects: The objects to upsert, by primary key
+    :param fields: The names of the fields to update in existing rows
+    :param stored_ids_cache: A set where the primary keys of the rows in the database after the upsert are added
+    :return: The number of rows inserted and updated
+    """
+    if not objects:
+        return IngestResult()
+
+    attributes: List[str] = [model._meta.get_field(field).attname for field in fields]
+    with transaction.atomic():
+        existing: Dict[int, Model] = model.objects.in_bulk(list(objects))
+        for pk in existing.keys() & objects.keys():
+            for attribute in SUMMARY_MISSING_FIELDS.intersection(attributes):
+                if getattr(objects[pk], attribute) is None:
+                    setattr(objects[pk], attribute, getattr(existing[pk], attribute))
+        new: List[Model] = [instance for pk, instance in objects.items() if pk not in existing]
+        changed: List[Model] = [
+            instance for pk, instance in objects.items() if pk in existing and any(
+                getattr(instance, attribute) != getattr(existing[pk], attribute) for attribute in attributes
+            )
+        ]
+
+        scraped_at: datetime = timezone.now()
+        for instance in new + changed:
+            setattr(instance, SCRAPED_AT_FIELD, scraped_at)
+
+        inserted: Set[int] = set()
+        if new:
+            model.objects.bulk_create(new, ignore_conflicts=True)
+            inserted = set(model.objects.filter(pk__in=[instance.pk for instance in new]).values_list('pk', flat=True))
+        if changed:
+            model.objects.bulk_update(changed, fields + [SCRAPED_AT_FIELD])
+
+    if stored_ids_cache is not None:
+        stored_ids_cache.update(existing)
+        stored_ids_cache.update(inserted)
+    return IngestResult(added=len(inserted), updated=len(changed))
@@ -0,0 +1,46 @@
+import logging
+import sys
+import time
+from logging import Logger
+from typing import BinaryIO, Optional
+
+from django.core.management import BaseCommand, CommandError
+
+from github_data.export import EXPORTERS, export_ndjson
+
+logger: Logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help: str = 'Exports every GitHub User or Repository as newline-delimited JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(EXPORTERS),
+                            help='The kind of records to export.')
+        parser.add_argument('--output', nargs='?', type=str, metavar='path',
+                            help='The file to write, gzip compressed if its name ends with .gz. '
+                                 'Defaults to the standard output.')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the output with gzip.')
+
+    def handle(self, *args, **options):
+        model: str = options.get('model')
+        path: Optional[str] = options.get('output')
+        compress: bool = options.get('gzip') or bool(path and path.endswith('.gz'))
+
+        start: float = time.perf_counter()
+        written: int = 0
+        try:
+            output: BinaryIO = open(path, 'wb') if path else sys.stdout.buffer
+        except OSError as error:
+            raise CommandError(f'unable to open the output file: {error}')
+        try:
+            for chunk in export_ndjson(model, compress=compress):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if path:
+                output.close()
+            else:
+                output.flush()
+        logger.info(f'- exported {model} in {time.perf_counter() - start:.1f} seconds, {written} bytes written')
@@ -0,0 +1,88 @@
+import gzip
+import json
+import logging
+import time
+from logging import Logger
+from typing import IO, Callable, Dict, Iterator, List, Mapping
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from github_data.bulk_load import supports_bulk_load
+from github_data.ingest import IngestResult, OwnerCache, ingest_repositories, ingest_users
+
+logger: Logger = logging.getLogger(__name__)
+
+INGESTERS: Dict[str, Callable[..., IngestResult]] = {
+    'users': ingest_users,
+    'repositories': ingest_repositories,
+}
+# the number of rows read from the files and written by each bulk statement.
+IMPORT_BATCH_SIZE: int = 10000
+
+
+def open_data_file(path: str) -> IO[str]:
+    """
+    Opens a newline-delimited JSON file, decompressing it if its name ends with .gz.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def read_batches(paths: List[str], batch_size: int) -> Iterator[List[Mapping]]:
+    """
+    Streams the records of newline-delimited JSON files in batches, skipping blank lines.
+    :param paths: The paths of the files, read in order
+    :param batch_size: The number of records in each batch
+    :return: An iterator with the batches of records
+    """
+    batch: List[Mapping] = []
+    for path in paths:
+        with open_data_file(path) as data_file:
+            for line in data_file:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help: str = 'Loads GitHub Users or Repositories from newline-delimited JSON files into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(INGESTERS),
+                            help='The kind of records in the files.')
+        parser.add_argument('path', nargs='+', type=str,
+                            help='Newline-delimited JSON files with one GitHub API user or repository per line, '
+                                 'gzip compressed if their name ends with .gz.')
+        parser.add_argument('--batch-size', nargs='?', type=int, default=IMPORT_BATCH_SIZE, metavar='number of rows',
+                            help='The number of rows written by each bulk statement.')
+
+    def handle(self, *args, **options):
+        ingest: Callable[..., IngestResult] = INGESTERS[options.get('model')]
+        batch_size: int = max(options.get('batch_size') or IMPORT_BATCH_SIZE, 1)
+        if not supports_bulk_load():
+            logger.warning('- the database does not support bulk loads, the rows are written with the ORM.')
+
+        owner_cache: OwnerCache = OwnerCache()
+        added: int = 0
+        updated: int = 0
+        start: float = time.perf_counter()
+        try:
+            for batch in read_batches(options.get('path'), batch_size):
+                # a transaction per batch, so the dataset version is bumped once for each of them.
+                with transaction.atomic():
+                    result: IngestResult = ingest(batch, owner_cache=owner_cache, batch_size=batch_size)
+                added += result.added
+                updated += result.updated
+                logger.debug(f'-- {options.get("model")} added: {added}, updated: {updated}')
+        except (OSError, ValueError) as error:
+            raise CommandError(f'unable to read the data files: {error}')
+
+        seconds: float = time.perf_counter() - start
+        logger.info(f'- imported {options.get("model")} in {seconds:.1f} seconds')
+        logger.info(f'-- added: {added}, updated: {updated}')
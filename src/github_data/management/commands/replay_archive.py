@@ -0,0 +1,47 @@
+import logging
+import time
+from logging import Logger
+from pathlib import Path
+from typing import List
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from github_data.archive import DEFAULT_READERS, archive_files
+from github_data.ingest import DEFAULT_BATCH_SIZE
+from github_data.replay import ReplayResult, replay_archive
+
+logger: Logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help: str = 'Writes the users and repositories of archived GitHub API responses to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='*', type=str,
+                            help='Archive files or directories to replay, in order. '
+                                 'Defaults to the directory of the github_response_archive setting.')
+        parser.add_argument('--readers', nargs='?', type=int, default=DEFAULT_READERS, metavar='number of readers',
+                            help='The number of archive files decompressed in parallel.')
+        parser.add_argument('--batch-size', nargs='?', type=int, metavar='number of rows',
+                            help='The number of rows written by each bulk statement.')
+
+    def handle(self, *args, **options):
+        paths: List[str] = options.get('path') or ([settings.GITHUB_RESPONSE_ARCHIVE]
+                                                   if settings.GITHUB_RESPONSE_ARCHIVE else [])
+        if not paths:
+            raise CommandError('no archive to replay, give its path or set github_response_archive.')
+        files: List[Path] = archive_files(paths)
+        missing: List[Path] = [path for path in files if not path.is_file()]
+        if missing:
+            raise CommandError(f'archive file {missing[0]} does not exist.')
+
+        logger.info(f'- replaying {len(files)} archive files')
+        start: float = time.perf_counter()
+        result: ReplayResult = replay_archive(
+            files, readers=max(options.get('readers') or DEFAULT_READERS, 1),
+            batch_size=options.get('batch_size') or DEFAULT_BATCH_SIZE
+        )
+        logger.info(f'- replayed {result.responses} responses in {time.perf_counter() - start:.1f} seconds')
+        logger.info(f'-- users written: {result.users}')
+        logger.info(f'-- repositories written: {result.repositories}')
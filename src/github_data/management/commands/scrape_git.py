@@ -1,23 +1,47 @@
 import logging
 import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
 
 from logging import Logger
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Type
 
-from django.core.management import BaseCommand
+import django
+from django.core.management import BaseCommand, CommandError, call_command
 from django.conf import settings
+from django.db import connection, connections
 
+from github_data.archive import ResponseArchive
+from github_data.async_scraper import AsyncScraper
 from github_data.exceptions import RateLimitExceededError
+from github_data.github_api import ResponseCache, shard_cache_path
+from github_data.metrics import ScraperMetrics, summary_lines
+from github_data.models import ScrapeRun
 from github_data.scraper_tool import Scraper
+from github_data.sharding import distribute_tokens, split_id_range
+from github_data.transport import ConnectionPool
 
 logger: Logger = logging.getLogger(__name__)
 
+ENGINES: Dict[str, Type[Scraper]] = {
+    'sync': Scraper,
+    'async': AsyncScraper,
+}
+
 
 class Command(BaseCommand):
     help: str = 'Scrapes GitHub User and Repository Data.'
     number_of_repositories: Optional[int] = None
     number_of_users: Optional[int] = None
     since: Optional[int] = None
+    until: Optional[int] = None
+    shards: int = 1
+    workers: Optional[int] = None
+    engine: Type[Scraper] = Scraper
+    engine_name: str = 'sync'
+    backend: str = Scraper.REST_BACKEND
+    refresh: bool = False
+    batch_size: Optional[int] = None
+    tokens: Optional[List[str]] = None
     retry: bool = False
 
     def add_arguments(self, parser):
@@ -25,75 +49,326 @@ class Command(BaseCommand):
                             help='One or more usernames to scrape from the GitHub API.')
         parser.add_argument('--since', nargs='?', type=int, metavar='id',
                             help='A starting ID to scrape a range consecutive of users,')
+        parser.add_argument('--until', nargs='?', type=int, metavar='id',
+                            help='The last ID of the range of users to scrape.')
+        parser.add_argument('--shards', nargs='?', type=int, default=1, metavar='number of shards',
+                            help='Split the range of users between --since and --until into shards '
+                                 'scraped by parallel processes.')
         parser.add_argument('--users', nargs='?', type=int, metavar='number of users',
                             help='The number of users to scrape.')
         parser.add_argument('--repositories', nargs='?', type=int, metavar='number of repositories',
                             help='The number of repositories per users to scrape.')
+        parser.add_argument('--workers', nargs='?', type=int, metavar='number of workers',
+                            help='The number of users to fetch from the GitHub API in parallel.')
+        parser.add_argument('--batch-size', nargs='?', type=int, metavar='number of rows',
+                            help='The number of rows written by each bulk statement. Every page of users and '
+                                 'their repositories is written in a single transaction.')
+        parser.add_argument('--engine', choices=list(ENGINES), default='sync',
+                            help='Scrape with worker threads (sync) or with an asyncio event loop (async).')
+        parser.add_argument('--backend', choices=[Scraper.REST_BACKEND, Scraper.GRAPHQL_BACKEND],
+                            default=Scraper.REST_BACKEND,
+                            help='Fetch users and repositories with the REST API (rest), or with a GraphQL query '
+                                 'per page of users (graphql). Only for the sync engine.')
+        parser.add_argument('--refresh', action='store_true',
+                            help='Only fetch and write the repositories that changed since they were scraped. '
+                                 'Only for the sync engine and the rest backend.')
         parser.add_argument('--retry', action='store_true',
-                            help='If rate limit is reached, wait and continue scraping after the reset time has passed.')
+                            help='If rate limit is reached, wait and continue scraping from the last user written '
+                                 'after the reset time has passed.')
+        parser.add_argument('--resume', nargs='?', type=int, metavar='run id',
+                            help='Continue a scrape run that was stopped or killed from its last checkpoint.')
 
     def handle(self, *args, **options):
         # get all arguments to pass on to the scraper
         self.retry = options.get('retry')
         self.since = options.get('since')
+        self.until = options.get('until')
+        self.shards = max(options.get('shards') or 1, 1)
         self.number_of_users = options.get('users')
         self.number_of_repositories = options.get('repositories')
+        self.workers = options.get('workers')
+        self.engine_name = options.get('engine') or 'sync'
+        self.engine = ENGINES[self.engine_name]
+        self.backend = options.get('backend') or Scraper.REST_BACKEND
+        self.refresh = options.get('refresh') or False
+        self.batch_size = options.get('batch_size')
 
-        # if there are individual users, get em.
-        if len(options.get('user')):
-            logger.info('- scraping individual users')
-            self.handle_individual_users(options.get('user'))
-            return
+        if self.backend == Scraper.GRAPHQL_BACKEND and self.engine is not Scraper:
+            raise CommandError('--backend graphql can only be used with the sync engine.')
+        if self.backend == Scraper.GRAPHQL_BACKEND and not (settings.GITHUB_TOKEN or settings.GITHUB_TOKENS):
+            raise CommandError('--backend graphql needs a GitHub OAuth token.')
+        if self.refresh and (self.engine is not Scraper or self.backend != Scraper.REST_BACKEND):
+            raise CommandError('--refresh can only be used with the sync engine and the rest backend.')
 
-        logger.info('- scraping a range of users')
-        self.handle_users_range()
+        if self.shards > 1 and (self.until is None or self.number_of_users or len(options.get('user'))):
+            raise CommandError('--shards needs a range of users with --until, and can not be used with --users.')
+        resumes_shards: bool = (
+            options.get('resume') is not None and ScrapeRun.objects.filter(parent_id=options.get('resume')).exists()
+        )
+        if (self.shards > 1 or resumes_shards) and connection.vendor == 'sqlite':
+            raise CommandError('--shards needs a database server, sqlite can only be written by one process at a time.')
 
-    def handle_individual_users(self, user_list: List[str], scraper: Scraper = None) -> None:
-        kwargs: Dict[str, Any] = {}
-        if self.number_of_repositories is not None:
-            kwargs['number_of_repositories'] = self.number_of_repositories
+        if options.get('resume') is not None:
+            if len(options.get('user')):
+                raise CommandError('usernames can not be given when resuming a scrape run.')
+            scrape_run: ScrapeRun = self.resume_run(options.get('resume'))
+        else:
+            scrape_run = self.start_run(options.get('user'))
 
-        scraper = scraper or Scraper(token=settings.GITHUB_TOKEN)
+        status: str = ScrapeRun.FAILED
         try:
-            scraper.scrape_individual_users(user_list, **kwargs)
-        except RateLimitExceededError as limit_error:  # pragma: no cover
-            if self.retry:
-                logger.warning(f'--- github rate limit exceeded! '
-                               f'retrying automatically in {limit_error.limit_reset_seconds} seconds')
-
-                time.sleep(limit_error.limit_reset_seconds)
-                self.handle_individual_users(user_list, scraper=scraper)
-                return
+            if self.shards > 1 or scrape_run.shards.exists():
+                logger.info(f'- scraping a range of users in shards of run {scrape_run.id}')
+                finished: bool = self.handle_shards(scrape_run)
+            # if there are individual users, get em.
+            elif scrape_run.mode == ScrapeRun.INDIVIDUAL_USERS:
+                logger.info(f'- scraping individual users in run {scrape_run.id}')
+                finished = self.handle_individual_users(scrape_run.remaining_usernames, scrape_run)
             else:
-                logger.error('--- github rate limit was exceeded! scraping stopped.')
-        logger.info(f'- users added: {scraper.users_added}, repositories added: {scraper.repositories_added}')
+                logger.info(f'- scraping a range of users in run {scrape_run.id}')
+                finished = self.handle_users_range(scrape_run)
+            status = ScrapeRun.FINISHED if finished else ScrapeRun.STOPPED
+        finally:
+            scrape_run.finish(status)
+
+    def start_run(self, usernames: List[str]) -> ScrapeRun:
+        """
+        Creates the scrape run that keeps the checkpoint of this command.
+        :param usernames: The individual usernames to scrape, if any
+        :return: The new scrape run
+        """
+        return ScrapeRun.objects.create(
+            mode=ScrapeRun.INDIVIDUAL_USERS if usernames else ScrapeRun.RANGE,
+            usernames=usernames,
+            since=self.since or 0,
+            until=self.until,
+            number_of_users=max(self.number_of_users or 0, 0),
+            number_of_repositories=max(self.number_of_repositories or 0, 0),
+        )
+
+    def resume_run(self, run_id: int) -> ScrapeRun:
+        """
+        Loads a scrape run and continues it from its last checkpoint.
+        :param run_id: The id of the scrape run
+        :return: The scrape run
+        """
+        try:
+            scrape_run: ScrapeRun = ScrapeRun.objects.get(pk=run_id)
+        except ScrapeRun.DoesNotExist:
+            raise CommandError(f'scrape run {run_id} does not exist.')
+        if scrape_run.status == ScrapeRun.FINISHED:
+            raise CommandError(f'scrape run {run_id} is already finished.')
+
+        self.since = scrape_run.resume_since
+        self.until = scrape_run.until
+        self.number_of_users = scrape_run.remaining_users
+        self.number_of_repositories = scrape_run.number_of_repositories
+        logger.info(f'- resuming run {run_id} after {scrape_run.users_processed} users processed')
+        scrape_run.finish(ScrapeRun.RUNNING)
+        return scrape_run
+
+    def start_shards(self, scrape_run: ScrapeRun) -> List[ScrapeRun]:
+        """
+        Splits the range of users of a run into shard runs.
+        :param scrape_run: The run of the whole range of users
+        :return: The run of each shard
+        """
+        return [
+            ScrapeRun.objects.create(
+                mode=ScrapeRun.RANGE, since=since, until=until, parent=scrape_run,
+                number_of_repositories=scrape_run.number_of_repositories
+            )
+            for since, until in split_id_range(scrape_run.since, scrape_run.until, self.shards)
+        ]
+
+    def handle_shards(self, scrape_run: ScrapeRun) -> bool:
+        """
+        Scrapes the shards of a run in a pool of processes, each with its own database connection, scraper and
+        tokens, and adds up their counters. A resumed run only scrapes the shards that didn't finish.
+        :return: Whether or not every shard was scraped
+        """
+        shard_runs: List[ScrapeRun] = (
+            list(scrape_run.shards.exclude(status=ScrapeRun.FINISHED)) if scrape_run.shards.exists()
+            else self.start_shards(scrape_run)
+        )
+        options: Dict[str, Any] = {
+            'retry': self.retry, 'engine': self.engine_name, 'backend': self.backend, 'refresh': self.refresh,
+            'workers': self.workers, 'batch_size': self.batch_size
+        }
+        shard_tokens: List[List[str]] = distribute_tokens(settings.GITHUB_TOKENS, len(shard_runs))
+
+        if shard_runs:
+            # the connections of this process can't be shared with the shard processes.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=len(shard_runs)) as executor:
+                futures: Dict[Future, ScrapeRun] = {
+                    executor.submit(scrape_shard, shard_run.id, tokens, options): shard_run
+                    for shard_run, tokens in zip(shard_runs, shard_tokens)
+                }
+                wait(futures)
+            for future, shard_run in futures.items():
+                if future.exception() is not None:
+                    logger.error(f'--- shard run {shard_run.id} failed: {future.exception()}')
+
+        scrape_run.merge_shards()
+        self.merge_response_caches(scrape_run)
+        logger.info(f'- users added: {scrape_run.users_added}, repositories added: {scrape_run.repositories_added}')
+        return not scrape_run.shards.exclude(status=ScrapeRun.FINISHED).exists()
 
-    def handle_users_range(self, scraper: Scraper = None):
+    @staticmethod
+    def merge_response_caches(scrape_run: ScrapeRun) -> None:
+        """
+        Merges the response cache files of the shards of a run into the cache file of the run. It's only done once
+        the shard processes ended, so the file is written by a single process.
+        :param scrape_run: The sharded run
+        :return:
+        """
+        if not settings.GITHUB_RESPONSE_CACHE:
+            return
+        response_cache: ResponseCache = ResponseCache(settings.GITHUB_RESPONSE_CACHE)
+        for shard_id in scrape_run.shards.values_list('id', flat=True):
+            response_cache.merge(shard_cache_path(settings.GITHUB_RESPONSE_CACHE, shard_id))
+        response_cache.close()
+
+    def create_scraper(self, scrape_run: ScrapeRun) -> Scraper:
         kwargs: Dict[str, Any] = {
-            'since': self.since,
-            'number_of_users': self.number_of_users,
-            'number_of_repositories': self.number_of_repositories
+            'token': settings.GITHUB_TOKEN, 'api_host': settings.GITHUB_API_HOST, 'scrape_run': scrape_run,
+            'tokens': self.tokens if self.tokens is not None else settings.GITHUB_TOKENS
         }
-        kwargs = {key: value for key, value in kwargs.items() if value is not None}
-        scraper = scraper or Scraper(token=settings.GITHUB_TOKEN)
+        if self.workers is not None:
+            kwargs['concurrency'] = self.workers
+        if self.batch_size is not None:
+            kwargs['batch_size'] = self.batch_size
+        if settings.GITHUB_RESPONSE_ARCHIVE:
+            kwargs['response_archive'] = ResponseArchive(settings.GITHUB_RESPONSE_ARCHIVE)
+        if self.engine is Scraper and settings.GITHUB_RESPONSE_CACHE and scrape_run.parent_id is not None:
+            # the shard processes run at the same time, so each one writes its own file.
+            kwargs['response_cache'] = ResponseCache(
+                shard_cache_path(settings.GITHUB_RESPONSE_CACHE, scrape_run.id),
+                shared_path=settings.GITHUB_RESPONSE_CACHE
+            )
+        elif self.engine is Scraper and settings.GITHUB_RESPONSE_CACHE:
+            kwargs['response_cache'] = ResponseCache(settings.GITHUB_RESPONSE_CACHE)
+        if self.engine is Scraper:
+            kwargs.update(backend=self.backend, refresh=self.refresh, pool_size=settings.GITHUB_CONNECTION_POOL_SIZE)
+        return self.engine(**kwargs)
 
-        try:
-            scraper.scrape_users(**kwargs)
-        except RateLimitExceededError as limit_error:  # pragma: no cover
-            if self.retry:
-                logger.warning(f'--- github rate limit exceeded! '
-                               f'continuing automatically in {limit_error.limit_reset_seconds} seconds')
+    def log_summary(self, scraper: Scraper) -> None:
+        """
+        Logs the counters and the metrics of a scraper, and saves the final snapshot of the metrics in its run.
+        :param scraper: The scraper that finished
+        :return:
+        """
+        logger.info(f'- users added: {scraper.users_added}, repositories added: {scraper.repositories_added}')
+        response_cache: Optional[ResponseCache] = scraper.api.response_cache
+        if response_cache is not None:
+            response_cache.close()
+            logger.info(f'- response cache hits: {response_cache.hits}, misses: {response_cache.misses}')
+        response_archive: Optional[ResponseArchive] = scraper.api.response_archive
+        if response_archive is not None:
+            response_archive.close()
+            logger.info(f'- responses archived: {response_archive.responses}')
+        connection_pool: ConnectionPool = scraper.api.connection_pool
+        if connection_pool.requests:
+            logger.info(f'- http connections opened: {connection_pool.opened}, requests: {connection_pool.requests}, '
+                        f'reused connections: {connection_pool.reused}')
+        metrics: Dict[str, Any] = scraper.metrics.snapshot()
+        for line in summary_lines(metrics):
+            logger.info(f'-- {line}')
+        if scraper.scrape_run is not None:
+            scraper.scrape_run.save_metrics(metrics)
+
+    def wait_for_reset(self, limit_error: RateLimitExceededError, metrics: ScraperMetrics) -> bool:
+        """
+        Waits until the rate limit reset time has passed, if the command was asked to retry.
+        :param limit_error: The error raised when the rate limit was exceeded
+        :param metrics: The metrics of the scraper, where the time waited is recorded
+        :return: Whether or not scraping should continue
+        """
+        if not self.retry:
+            logger.error('--- github rate limit was exceeded! scraping stopped.')
+            return False
+
+        wait_seconds: int = max(limit_error.limit_reset_seconds, 1)
+        logger.warning(f'--- github rate limit exceeded! continuing automatically in {wait_seconds} seconds')
+        time.sleep(wait_seconds)
+        metrics.record_sleep('rate_limit_reset', wait_seconds)
+        logger.info('--- rate limit reset time elapsed. picking up where we left.')
+        return True
+
+    def handle_individual_users(self, user_list: List[str], scrape_run: ScrapeRun) -> bool:
+        """
+        Scrapes a list of usernames, waiting for the rate limit reset and resuming if asked to retry.
+        :return: Whether or not every user was scraped
+        """
+        kwargs: Dict[str, Any] = {}
+        if self.number_of_repositories is not None:
+            kwargs['number_of_repositories'] = self.number_of_repositories
+
+        scraper: Scraper = self.create_scraper(scrape_run)
+        finished: bool = True
+        while user_list:
+            users_processed: int = scraper.users_processed
+            try:
+                scraper.scrape_individual_users(user_list, **kwargs)
+                break
+            except RateLimitExceededError as limit_error:
+                # the users written before the error are the first ones of the list, only the rest is scraped again.
+                user_list = user_list[scraper.users_processed - users_processed:]
+                logger.info(f'--- rate limit reached with {len(user_list)} user(s) left to scrape.')
+                if not self.wait_for_reset(limit_error, scraper.metrics):
+                    finished = False
+                    break
+        self.log_summary(scraper)
+        return finished
+
+    def handle_users_range(self, scrape_run: ScrapeRun) -> bool:
+        """
+        Scrapes a range of users, waiting for the rate limit reset and resuming if asked to retry.
+        :return: Whether or not the whole range was scraped
+        """
+        scraper: Scraper = self.create_scraper(scrape_run)
+        # a resumed run with a number of users that was already reached has nothing left to scrape.
+        finished: bool = bool(scrape_run.number_of_users) and not scrape_run.remaining_users
+        while not finished:
+            kwargs: Dict[str, Any] = {
+                'since': self.since,
+                'until': self.until,
+                'number_of_users': self.number_of_users,
+                'number_of_repositories': self.number_of_repositories
+            }
+            kwargs = {key: value for key, value in kwargs.items() if value is not None}
+            users_processed: int = scraper.users_processed
+
+            try:
+                scraper.scrape_users(**kwargs)
+                finished = True
+            except RateLimitExceededError as limit_error:
                 logger.info(f'--- rate limit reached at id {limit_error.last_id} '
                             f'with {scraper.users_processed} users processed.')
+                # resume after the last user completely written, `None` means no user was written.
+                if limit_error.last_id is not None:
+                    self.since = limit_error.last_id
+                # no number of users means all of them, so there's nothing to subtract.
+                if self.number_of_users:
+                    self.number_of_users -= scraper.users_processed - users_processed
+                if not self.wait_for_reset(limit_error, scraper.metrics):
+                    break
+                logger.info(f'- scraping remaining {self.number_of_users or "all"} users starting at id {self.since}')
+        self.log_summary(scraper)
+        return finished
 
-                time.sleep(limit_error.limit_reset_seconds)
-                logger.info('--- rate limit reset time elapsed. picking up where we left.')
 
-                self.since = limit_error.last_id
-                self.number_of_users = self.number_of_users - scraper.users_processed
-                logger.info(f'- scraping remaining {self.number_of_users} users starting at id {self.since}')
-                self.handle_users_range(scraper=scraper)
-                return
-            else:
-                logger.error('--- github rate limit was exceeded! scraping stopped.')
-        logger.info(f'users added: {scraper.users_added}, repositories added: {scraper.repositories_added}')
+def scrape_shard(run_id: int, tokens: List[str], options: Dict[str, Any]) -> None:
+    """
+    Scrapes the range of users of a shard run in a worker process, continuing it from its checkpoint.
+    :param run_id: The id of the shard run
+    :param tokens: The GitHub OAuth tokens of the shard
+    :param options: The scrape_git options of the shard
+    :return:
+    """
+    # worker processes that were not forked have to set django up themselves.
+    django.setup()
+    command: Command = Command()
+    command.tokens = tokens
+    call_command(command, resume=run_id, **options)
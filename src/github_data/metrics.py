@@ -0,0 +1,242 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from logging import Logger
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+logger: Logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the buckets of the latency histograms.
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRIC_PREFIX: str = 'github_scraper'
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets, like a Prometheus histogram.
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * len(self.buckets)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimates a quantile of the observed values as the upper bound of the bucket it falls in.
+        :param fraction: The quantile to estimate, between 0 and 1
+        :return: The upper bound of the bucket, `inf` if it's above the last one
+        """
+        rank: float = fraction * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return math.inf
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'buckets': list(zip(self.buckets, self.counts)), 'count': self.count, 'sum': self.sum}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'Histogram':
+        histogram: Histogram = cls([bound for bound, _ in data['buckets']])
+        histogram.counts = [count for _, count in data['buckets']]
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        return histogram
+
+
+class ScraperMetrics:
+    """
+    Instrumentation of a scrape: the latency of the requests to each GitHub API endpoint, the time spent writing
+    to the database and sleeping, the rows written and the rate limit budget left.
+    It's shared by the fetcher threads and the writer, so every update takes a lock.
+    """
+    def __init__(self, *, clock: Callable[[], float] = time.monotonic):
+        self.clock: Callable[[], float] = clock
+        self.lock: threading.Lock = threading.Lock()
+        self.started: float = clock()
+        self.request_latency: Dict[str, Histogram] = {}
+        self.write_latency: Histogram = Histogram()
+        self.rows_written: int = 0
+        self.sleep_seconds: Dict[str, float] = {}
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_limit: Optional[int] = None
+
+    def observe_request(self, endpoint: str, seconds: float) -> None:
+        """
+        Records the latency of a request.
+        :param endpoint: The method and the path template of the request, like `GET /users/{username}/repos`
+        :param seconds: The time the request took
+        :return:
+        """
+        with self.lock:
+            self.request_latency.setdefault(endpoint, Histogram()).observe(seconds)
+
+    @contextmanager
+    def time_write(self, rows: int) -> Iterator[None]:
+        """
+        Context manager that records the time spent writing a batch of rows to the database.
+        The rows are only counted if the block didn't raise.
+        :param rows: The number of rows written in the block
+        """
+        start: float = self.clock()
+        yield
+        with self.lock:
+            self.write_latency.observe(self.clock() - start)
+            self.rows_written += rows
+
+    def record_sleep(self, reason: str, seconds: float) -> None:
+        """
+        Records the time spent sleeping instead of scraping.
+        :param reason: Why the scraper slept, `pacing`, `secondary_rate_limit` or `rate_limit_reset`
+        :param seconds: The time slept
+        :return:
+        """
+        with self.lock:
+            self.sleep_seconds[reason] = self.sleep_seconds.get(reason, 0.0) + seconds
+
+    def record_rate_limit(self, remaining: int, limit: int) -> None:
+        with self.lock:
+            self.rate_limit_remaining, self.rate_limit_limit = remaining, limit
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Gets all the metrics as a JSON serializable summary.
+        :return: The summary of the metrics
+        """
+        with self.lock:
+            elapsed: float = self.clock() - self.started
+            return {
+                'elapsed_seconds': elapsed,
+                'rows_written': self.rows_written,
+                'rows_per_second': self.rows_written / elapsed if elapsed > 0 else 0.0,
+                'requests': {endpoint: histogram.to_dict() for endpoint, histogram in self.request_latency.items()},
+                'db_writes': self.write_latency.to_dict(),
+                'sleep_seconds': dict(self.sleep_seconds),
+                'rate_limit': {'remaining': self.rate_limit_remaining, 'limit': self.rate_limit_limit},
+            }
+
+
+def summary_lines(snapshot: Mapping[str, Any]) -> List[str]:
+    """
+    Formats a summary of the metrics for the log at the end of a scrape.
+    :param snapshot: The summary of the metrics
+    :return: The lines of the summary
+    """
+    lines: List[str] = []
+    for endpoint, data in sorted(snapshot['requests'].items()):
+        histogram: Histogram = Histogram.from_dict(data)
+        lines.append(
+            f'{endpoint}: {histogram.count} request(s), average {histogram.sum / histogram.count:.3f}s, '
+            f'p50 <= {histogram.quantile(0.5)}s, p95 <= {histogram.quantile(0.95)}s'
+        )
+    writes: Histogram = Histogram.from_dict(snapshot['db_writes'])
+    lines.append(
+        f'rows written: {snapshot["rows_written"]} ({snapshot["rows_per_second"]:.1f} rows/s), '
+        f'database writes: {writes.sum:.3f}s in {writes.count} transaction(s)'
+    )
+    sleeps: str = ', '.join(f'{reason} {seconds:.1f}s' for reason, seconds in sorted(snapshot['sleep_seconds'].items()))
+    lines.append(f'slept: {sleeps or "0s"}, elapsed: {snapshot["elapsed_seconds"]:.1f}s')
+    rate_limit: Mapping[str, Optional[int]] = snapshot['rate_limit']
+    if rate_limit['remaining'] is not None:
+        lines.append(f'rate limit budget left: {rate_limit["remaining"]}/{rate_limit["limit"]}')
+    return lines
+
+
+def format_labels(labels: Mapping[str, Any]) -> str:
+    escaped: List[str] = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}' if escaped else ''
+
+
+def format_bound(bound: float) -> str:
+    return '+Inf' if bound == math.inf else repr(float(bound))
+
+
+class PrometheusWriter:
+    """
+    Writes metrics in the Prometheus text exposition format, with the HELP and TYPE lines of every metric once.
+    """
+    def __init__(self):
+        self.metrics: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def samples(self, name: str, kind: str, description: str) -> List[str]:
+        return self.metrics.setdefault(f'{METRIC_PREFIX}_{name}', (kind, description, []))[2]
+
+    def add(self, name: str, kind: str, description: str, labels: Mapping[str, Any], value: float) -> None:
+        self.samples(name, kind, description).append(f'{METRIC_PREFIX}_{name}{format_labels(labels)} {value}')
+
+    def add_histogram(self, name: str, description: str, labels: Mapping[str, Any],
+                      histogram: Mapping[str, Any]) -> None:
+        samples: List[str] = self.samples(name, 'histogram', description)
+        metric: str = f'{METRIC_PREFIX}_{name}'
+        for bound, count in histogram['buckets']:
+            samples.append(f'{metric}_bucket{format_labels({**labels, "le": format_bound(bound)})} {count}')
+        samples.append(f'{metric}_bucket{format_labels({**labels, "le": "+Inf"})} {histogram["count"]}')
+        samples.append(f'{metric}_sum{format_labels(labels)} {histogram["sum"]}')
+        samples.append(f'{metric}_count{format_labels(labels)} {histogram["count"]}')
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, (kind, description, samples) in self.metrics.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def render_prometheus(runs: Iterable[Tuple[Mapping[str, Any], Mapping[str, Any]]]) -> str:
+    """
+    Renders the metrics of scrape runs in the Prometheus text exposition format.
+    :param runs: The labels that identify each run, and the summary of its metrics
+    :return: The metrics, as text
+    """
+    writer: PrometheusWriter = PrometheusWriter()
+    for labels, snapshot in runs:
+        for endpoint, histogram in sorted(snapshot['requests'].items()):
+            writer.add_histogram('request_duration_seconds', 'Latency of the requests to the GitHub API.',
+                                 {**labels, 'endpoint': endpoint}, histogram)
+        writer.add_histogram('db_write_duration_seconds', 'Time spent writing pages to the database.',
+                             labels, snapshot['db_writes'])
+        writer.add('rows_written_total', 'counter', 'Users and repositories written to the database.',
+                   labels, snapshot['rows_written'])
+        writer.add('rows_per_second', 'gauge', 'Users and repositories written per second since the run started.',
+                   labels, snapshot['rows_per_second'])
+        for reason, seconds in sorted(snapshot['sleep_seconds'].items()):
+            writer.add('sleep_seconds_total', 'counter', 'Time spent sleeping instead of scraping.',
+                       {**labels, 'reason': reason}, seconds)
+        if snapshot['rate_limit']['remaining'] is not None:
+            writer.add('rate_limit_remaining', 'gauge', 'Requests left in the rate limit budget of the tokens.',
+                       labels, snapshot['rate_limit']['remaining'])
+            writer.add('rate_limit_limit', 'gauge', 'Requests per hour allowed by the rate limit of the tokens.',
+                       labels, snapshot['rate_limit']['limit'])
+    return writer.render()
+
+
+def render_cache_stats(stats: Mapping[str, int]) -> str:
+    """
+    Renders the hits and misses of the API response cache of this process in the Prometheus text exposition format.
+    Nothing is rendered until the cache was used.
+    :param stats: The hits and misses of the cache
+    :return: The metrics, as text
+    """
+    if not stats['hits'] and not stats['misses']:
+        return ''
+    writer: PrometheusWriter = PrometheusWriter()
+    writer.add('api_cache_hits_total', 'counter', 'API responses served from the response cache.', {}, stats['hits'])
+    writer.add('api_cache_misses_total', 'counter', 'API responses rendered and stored in the response cache.', {},
+               stats['misses'])
+    return writer.render()
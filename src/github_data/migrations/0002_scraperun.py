@@ -0,0 +1,36 @@
+# Generated by Django 3.1.14 on 2026-10-17 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('range', 'range of users'), ('users', 'individual users')], max_length=5)),
+                ('status', models.CharField(choices=[('running', 'running'), ('stopped', 'stopped'), ('failed', 'failed'), ('finished', 'finished')], default='running', max_length=8)),
+                ('usernames', models.JSONField(blank=True, default=list)),
+                ('since', models.IntegerField(default=0, verbose_name='starting github user id')),
+                ('number_of_users', models.IntegerField(default=0)),
+                ('number_of_repositories', models.IntegerField(default=0)),
+                ('last_id', models.IntegerField(blank=True, null=True, verbose_name='last github user id written')),
+                ('users_processed', models.IntegerField(default=0)),
+                ('users_added', models.IntegerField(default=0)),
+                ('repositories_processed', models.IntegerField(default=0)),
+                ('repositories_added', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'scrape_run',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.14 on 2026-10-17 06:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_data', '0002_scraperun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scraperun',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='github_data.scraperun'),
+        ),
+        migrations.AddField(
+            model_name='scraperun',
+            name='until',
+            field=models.IntegerField(blank=True, null=True, verbose_name='last github user id in the range'),
+        ),
+    ]
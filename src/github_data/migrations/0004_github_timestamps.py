@@ -0,0 +1,38 @@
+# Generated by Django 3.1.14 on 2026-10-17 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_data', '0003_scraperun_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='githubrepository',
+            name='pushed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last push on github'),
+        ),
+        migrations.AddField(
+            model_name='githubrepository',
+            name='scraped_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last written by the scraper'),
+        ),
+        migrations.AddField(
+            model_name='githubrepository',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last update on github'),
+        ),
+        migrations.AddField(
+            model_name='githubuser',
+            name='scraped_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last written by the scraper'),
+        ),
+        migrations.AddField(
+            model_name='githubuser',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last update on github'),
+        ),
+    ]
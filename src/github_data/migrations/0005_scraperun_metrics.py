@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_data', '0004_github_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scraperun',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
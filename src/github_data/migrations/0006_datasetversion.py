@@ -0,0 +1,30 @@
+# Generated by Django 3.1.14 on 2026-10-17 07:20
+
+from django.db import migrations, models
+
+
+def create_dataset_version(apps, schema_editor):
+    DatasetVersion = apps.get_model('github_data', 'DatasetVersion')
+    DatasetVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_data', '0005_scraperun_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'dataset_version',
+            },
+        ),
+        migrations.RunPython(create_dataset_version, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,10 @@
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
 from django.db import models
+from django.db.models import F, Sum
+from django.utils import timezone
 
 
 class GithubUser(models.Model):
@@ -8,6 +14,8 @@ class GithubUser(models.Model):
     id = models.IntegerField(primary_key=True, verbose_name='github user id', db_column='github_id')
     login = models.CharField(max_length=39, verbose_name='github login username', unique=True, db_column='github_login')
     url = models.URLField()
+    updated_at = models.DateTimeField(blank=True, null=True, verbose_name='last update on github')
+    scraped_at = models.DateTimeField(blank=True, null=True, verbose_name='last written by the scraper')
 
     class Meta:
         db_table = 'github_user'
@@ -27,6 +35,9 @@ class GithubRepository(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     url = models.URLField()
+    updated_at = models.DateTimeField(blank=True, null=True, verbose_name='last update on github')
+    pushed_at = models.DateTimeField(blank=True, null=True, verbose_name='last push on github')
+    scraped_at = models.DateTimeField(blank=True, null=True, verbose_name='last written by the scraper')
 
     class Meta:
         db_table = 'github_repository'
@@ -35,3 +46,156 @@ class GithubRepository(models.Model):
 
     def __str__(self):
         return f'{self.full_name}'
+
+
+class ScrapeRun(models.Model):
+    """
+    Model representing a run of the scrape_git command and its last checkpoint.
+    The checkpoint is saved in the same transaction as each batch of users written, so a run that was killed
+    can be resumed from the last batch in the database.
+    """
+    RANGE = 'range'
+    INDIVIDUAL_USERS = 'users'
+    MODE_CHOICES = [(RANGE, 'range of users'), (INDIVIDUAL_USERS, 'individual users')]
+
+    RUNNING = 'running'
+    STOPPED = 'stopped'
+    FAILED = 'failed'
+    FINISHED = 'finished'
+    STATUS_CHOICES = [(RUNNING, 'running'), (STOPPED, 'stopped'), (FAILED, 'failed'), (FINISHED, 'finished')]
+
+    mode = models.CharField(max_length=5, choices=MODE_CHOICES)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=RUNNING)
+    usernames = models.JSONField(default=list, blank=True)
+    since = models.IntegerField(default=0, verbose_name='starting github user id')
+    until = models.IntegerField(blank=True, null=True, verbose_name='last github user id in the range')
+    number_of_users = models.IntegerField(default=0)
+    number_of_repositories = models.IntegerField(default=0)
+    last_id = models.IntegerField(blank=True, null=True, verbose_name='last github user id written')
+    users_processed = models.IntegerField(default=0)
+    users_added = models.IntegerField(default=0)
+    repositories_processed = models.IntegerField(default=0)
+    repositories_added = models.IntegerField(default=0)
+    metrics = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, related_name='shards', blank=True, null=True)
+
+    class Meta:
+        db_table = 'scrape_run'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'scrape run {self.id} ({self.status})'
+
+    @property
+    def resume_since(self) -> int:
+        """ The ID after which a range of users continues. """
+        return self.last_id if self.last_id is not None else self.since
+
+    @property
+    def remaining_users(self) -> int:
+        """ The number of users left in a range of users, 0 means all users. """
+        if not self.number_of_users:
+            return 0
+        return max(self.number_of_users - self.users_processed, 0)
+
+    @property
+    def remaining_usernames(self) -> list:
+        """ The usernames left in a list of individual users. """
+        return self.usernames[self.users_processed:]
+
+    def checkpoint(self, users: list, *, users_processed: int, users_added: int, repositories_processed: int,
+                   repositories_added: int, metrics: Optional[dict] = None) -> None:
+        """
+        Moves the checkpoint past a batch of users and saves it.
+        :param users: The user data written to the database, in order
+        :param users_processed: The number of users processed in the batch, including the ones that don't exist
+        :param users_added: The number of users inserted in the batch
+        :param repositories_processed: The number of repositories written in the batch
+        :param repositories_added: The number of repositories inserted in the batch
+        :param metrics: The snapshot of the metrics of the scraper, `None` keeps the last one
+        :return:
+        """
+        if users:
+            self.last_id = users[-1]['id']
+        self.users_processed += users_processed
+        self.users_added += users_added
+        self.repositories_processed += repositories_processed
+        self.repositories_added += repositories_added
+        if metrics is not None:
+            self.metrics = metrics
+        self.save()
+
+    def save_metrics(self, metrics: dict) -> None:
+        self.metrics = metrics
+        self.save(update_fields=['metrics', 'updated_at'])
+
+    def finish(self, status: str) -> None:
+        self.status = status
+        self.save(update_fields=['status', 'updated_at'])
+
+    def merge_shards(self) -> None:
+        """
+        Adds up the counters of the shards of a sharded run and saves them.
+        :return:
+        """
+        counters: Dict[str, int] = self.shards.aggregate(
+            users_processed=Sum('users_processed'), users_added=Sum('users_added'),
+            repositories_processed=Sum('repositories_processed'), repositories_added=Sum('repositories_added')
+        )
+        for counter, value in counters.items():
+            setattr(self, counter, value or 0)
+        self.save()
+
+
+class DatasetVersion(models.Model):
+    """
+    Model representing the version of the scraped data, a single row bumped after every transaction that writes
+    users or repositories. The cached API responses are keyed on it, so they are never served once the data changed.
+    """
+    SINGLETON_ID = 1
+    # the key of the current version in the API cache.
+    CACHE_KEY = 'api-dataset-version'
+
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'dataset_version'
+
+    def __str__(self):
+        return f'dataset version {self.version}'
+
+    @classmethod
+    def current(cls) -> int:
+        """ The current version of the scraped data. """
+        return cls.objects.filter(pk=cls.SINGLETON_ID).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def cached(cls) -> int:
+        """
+        The current version of the scraped data, kept in the API cache for API_CACHE_VERSION_TIMEOUT seconds so
+        the cached responses are served without querying the database. A bump drops it from the cache, and the
+        processes that don't share the cache with the scraper see the new version once it expires.
+        :return: The current version
+        """
+        cache = caches[settings.API_CACHE_ALIAS]
+        version: Optional[int] = cache.get(cls.CACHE_KEY)
+        if version is None:
+            version = cls.current()
+            cache.set(cls.CACHE_KEY, version, settings.API_CACHE_VERSION_TIMEOUT)
+        return version
+
+    @classmethod
+    def bump(cls) -> None:
+        """
+        Increments the version in a single statement, so the scrapers of parallel processes never lose a bump.
+        :return:
+        """
+        bumped: int = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not bumped:
+            cls.objects.get_or_create(pk=cls.SINGLETON_ID, defaults={'version': 1, 'updated_at': timezone.now()})
+        caches[settings.API_CACHE_ALIAS].delete(cls.CACHE_KEY)
@@ -0,0 +1,68 @@
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination by id, like the `since` parameter of the GitHub users list: a page has the first `per_page`
+    rows with an id greater than `since`, so every page is an indexed range scan no matter how deep it is, and the
+    table is never counted. The response body is the list of rows, and the url of the next page is sent in the
+    `Link` header with `rel="next"`, like the GitHub API does. The last page has no `Link` header.
+    """
+    since_query_param: str = 'since'
+    page_size_query_param: str = 'per_page'
+
+    def __init__(self):
+        self.request: Optional[Request] = None
+        self.next_since: Optional[int] = None
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> List[Model]:
+        """
+        Fetches one row more than the page size to know if there is a next page.
+        :param queryset: The queryset of the rows to paginate
+        :param request: The request with the `since` and `per_page` query parameters
+        :param view: The view paginating the queryset
+        :return: The rows of the page
+        """
+        self.request = request
+        page_size: int = self.get_page_size(request)
+        rows: List[Model] = list(queryset.filter(pk__gt=self.get_since(request)).order_by('pk')[:page_size + 1])
+        self.next_since = rows[page_size - 1].pk if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_since(self, request: Request) -> int:
+        since: str = request.query_params.get(self.since_query_param) or '0'
+        try:
+            return int(since)
+        except ValueError:
+            raise ValidationError({self.since_query_param: 'A valid integer is required.'})
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        :return: The `per_page` query parameter, between 1 and API_MAX_PAGE_SIZE, or the default page size
+        """
+        try:
+            page_size: int = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            page_size = api_settings.PAGE_SIZE
+        return min(max(page_size, 1), settings.API_MAX_PAGE_SIZE)
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_since is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.since_query_param, self.next_since)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        next_link: Optional[str] = self.get_next_link()
+        return Response(data, headers={'Link': f'<{next_link}>; rel="next"'} if next_link else None)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return schema
@@ -0,0 +1,103 @@
+import logging
+import threading
+from logging import Logger
+from queue import Full, Queue
+from typing import Iterator, TypeVar
+
+logger: Logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+DEFAULT_QUEUE_SIZE: int = 4
+# how often a fetcher blocked on a full queue checks if the writer stopped.
+PUT_TIMEOUT: float = 0.1
+
+
+class FetchFailed:
+    """
+    Queue item that carries the exception that stopped the fetcher stage to the writer stage.
+    """
+    __slots__ = ('error',)
+
+    def __init__(self, error: Exception):
+        self.error: Exception = error
+
+
+FETCH_FINISHED: object = object()
+
+
+class Prefetcher:
+    """
+    Runs an iterator in a fetcher thread from the moment it's created, putting its items in a bounded queue.
+    The fetcher blocks when `max_size` items are waiting, so it never gets too far ahead of the caller. Iterating the
+    prefetcher yields the items in order, and raises the exception that stopped the iterator after the items queued
+    before it. Closing it stops the fetcher, even if the items were not all consumed.
+    """
+    def __init__(self, items: Iterator[T], *, max_size: int = DEFAULT_QUEUE_SIZE, name: str = 'scraper-fetcher'):
+        """
+        :param items: The iterator fetching the items. Generators are closed in the fetcher thread when it's done
+        :param max_size: The maximum number of items waiting in the queue. min: 1
+        :param name: The name of the fetcher thread
+        """
+        self.items: Iterator[T] = items
+        self.queue: Queue = Queue(maxsize=max(max_size, 1))
+        self.stopped: threading.Event = threading.Event()
+        self.thread: threading.Thread = threading.Thread(target=self.fetch, name=name, daemon=True)
+        self.thread.start()
+
+    def put(self, item: object) -> bool:
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except Full:
+                continue
+        return False
+
+    def fetch(self) -> None:
+        try:
+            for item in self.items:
+                if not self.put(item):
+                    logger.debug('-- consumer stopped, closing the fetcher.')
+                    return
+            self.put(FETCH_FINISHED)
+        except Exception as error:
+            self.put(FetchFailed(error))
+        finally:
+            if hasattr(self.items, 'close'):
+                self.items.close()
+
+    def __iter__(self) -> Iterator[T]:
+        while True:
+            item: object = self.queue.get()
+            if item is FETCH_FINISHED:
+                return
+            if isinstance(item, FetchFailed):
+                raise item.error
+            yield item
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+
+def prefetch(items: Iterator[T], *, max_size: int = DEFAULT_QUEUE_SIZE) -> Iterator[T]:
+    """
+    Streams the items of an iterator that fetches them from the GitHub API through a bounded queue.
+    The iterator runs in a fetcher thread while the caller consumes the items, usually writing them to the database,
+    so fetching and writing overlap. The fetcher blocks when `max_size` items are waiting, so it never gets too far
+    ahead of the writer. If the fetcher raises an exception, like RateLimitExceededError, the items queued before it
+    are yielded first and then it's raised in the caller. If the caller stops consuming, the fetcher is closed.
+    :param items: The iterator fetching the items. Generators are closed in the fetcher thread when it's done
+    :param max_size: The maximum number of items waiting in the queue, 0 runs the iterator in the calling thread
+    :return: An iterator with the items, in order
+    """
+    if max_size < 1:
+        yield from items
+        return
+
+    fetcher: Prefetcher = Prefetcher(items, max_size=max_size)
+    try:
+        yield from fetcher
+    finally:
+        fetcher.close()
@@ -0,0 +1,162 @@
+from datetime import datetime
+from typing import Any, Mapping, Optional
+
+from django.utils.dateparse import parse_datetime
+
+from github_data.exceptions import InvalidRecordError
+from github_data.models import GithubUser, GithubRepository
+
+URL_SCHEMES = ('http://', 'https://')
+
+
+def validate_id(value: Any, field: str) -> int:
+    """
+    Validates that a value is a positive integer id.
+    :param value: The value to validate
+    :param field: The name of the field, used in the error message
+    :return: The validated id
+    """
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise InvalidRecordError(f'{field} must be a positive integer, got {value!r}.')
+    return value
+
+
+def validate_text(value: Any, field: str, max_length: Optional[int], *, required: bool = True) -> Optional[str]:
+    """
+    Validates that a value is a string within the length limit of its database column.
+    :param value: The value to validate
+    :param field: The name of the field, used in the error message
+    :param max_length: The maximum length of the value, `None` means no limit
+    :param required: Whether or not the value can be empty
+    :return: The validated string, or `None` if it's not required and empty
+    """
+    if value is None or value == '':
+        if required:
+            raise InvalidRecordError(f'{field} is required.')
+        return value
+    if not isinstance(value, str):
+        raise InvalidRecordError(f'{field} must be a string, got {type(value).__name__}.')
+    if max_length is not None and len(value) > max_length:
+        raise InvalidRecordError(f'{field} has {len(value)} characters, the maximum is {max_length}.')
+    return value
+
+
+def validate_url(value: Any, field: str, max_length: int) -> str:
+    """
+    Validates that a value is an absolute http(s) url within the length limit of its database column.
+    :param value: The value to validate
+    :param field: The name of the field, used in the error message
+    :param max_length: The maximum length of the url
+    :return: The validated url
+    """
+    url: str = validate_text(value, field, max_length)
+    if not url.startswith(URL_SCHEMES):
+        raise InvalidRecordError(f'{field} must be an http(s) url, got {url!r}.')
+    return url
+
+
+def validate_timestamp(value: Any, field: str) -> Optional[datetime]:
+    """
+    Validates that a value is an ISO 8601 timestamp, like the ones of the GitHub API.
+    :param value: The value to validate
+    :param field: The name of the field, used in the error message
+    :return: The parsed timestamp, or `None` if it's empty
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        timestamp: Optional[datetime] = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        raise InvalidRecordError(f'{field} must be an ISO 8601 timestamp, got {value!r}.')
+    return timestamp
+
+
+class UserRecord:
+    """
+    Plain typed GitHub User record validated in memory, without querying the database.
+    Uniqueness is left to the database constraints.
+    """
+    __slots__ = ('id', 'login', 'url', 'updated_at')
+
+    LOGIN_MAX_LENGTH: int = GithubUser._meta.get_field('login').max_length
+    URL_MAX_LENGTH: int = GithubUser._meta.get_field('url').max_length
+
+    def __init__(self, id: int, login: str, url: str, updated_at: Optional[datetime] = None):
+        self.id: int = id
+        self.login: str = login
+        self.url: str = url
+        self.updated_at: Optional[datetime] = updated_at
+
+    @classmethod
+    def from_data(cls, user_data: Mapping) -> 'UserRecord':
+        """
+        Validates the shape and length limits of GitHub User data.
+        :param user_data: Github User data
+        :return: The validated UserRecord
+        :raises InvalidRecordError: If the data is not valid
+        """
+        return cls(
+            id=validate_id(user_data.get('id'), 'id'),
+            login=validate_text(user_data.get('login'), 'login', cls.LOGIN_MAX_LENGTH),
+            url=validate_url(user_data.get('url'), 'url', cls.URL_MAX_LENGTH),
+            updated_at=validate_timestamp(user_data.get('updated_at'), 'updated_at'),
+        )
+
+    def to_model(self) -> GithubUser:
+        return GithubUser(id=self.id, login=self.login, url=self.url, updated_at=self.updated_at)
+
+
+class RepositoryRecord:
+    """
+    Plain typed GitHub Repository record validated in memory, without querying the database.
+    Uniqueness and the owner foreign key are left to the database constraints.
+    """
+    __slots__ = ('id', 'owner', 'full_name', 'name', 'description', 'url', 'updated_at', 'pushed_at')
+
+    FULL_NAME_MAX_LENGTH: int = GithubRepository._meta.get_field('full_name').max_length
+    NAME_MAX_LENGTH: int = GithubRepository._meta.get_field('name').max_length
+    URL_MAX_LENGTH: int = GithubRepository._meta.get_field('url').max_length
+
+    def __init__(self, id: int, owner: UserRecord, full_name: str, name: str, description: Optional[str], url: str,
+                 updated_at: Optional[datetime] = None, pushed_at: Optional[datetime] = None):
+        self.id: int = id
+        self.owner: UserRecord = owner
+        self.full_name: str = full_name
+        self.name: str = name
+        self.description: Optional[str] = description
+        self.url: str = url
+        self.updated_at: Optional[datetime] = updated_at
+        self.pushed_at: Optional[datetime] = pushed_at
+
+    @classmethod
+    def from_data(cls, repository_data: Mapping) -> 'RepositoryRecord':
+        """
+        Validates the shape and length limits of GitHub Repository data, including its owner.
+        :param repository_data: Github Repository data
+        :return: The validated RepositoryRecord
+        :raises InvalidRecordError: If the data is not valid
+        """
+        owner_data: Any = repository_data.get('owner')
+        if not isinstance(owner_data, Mapping):
+            raise InvalidRecordError('owner is required.')
+
+        return cls(
+            id=validate_id(repository_data.get('id'), 'id'),
+            owner=UserRecord.from_data(owner_data),
+            full_name=validate_text(repository_data.get('full_name'), 'full_name', cls.FULL_NAME_MAX_LENGTH),
+            name=validate_text(repository_data.get('name'), 'name', cls.NAME_MAX_LENGTH),
+            description=validate_text(repository_data.get('description'), 'description', None, required=False),
+            url=validate_url(repository_data.get('url'), 'url', cls.URL_MAX_LENGTH),
+            updated_at=validate_timestamp(repository_data.get('updated_at'), 'updated_at'),
+            pushed_at=validate_timestamp(repository_data.get('pushed_at'), 'pushed_at'),
+        )
+
+    def to_model(self) -> GithubRepository:
+        return GithubRepository(
+            id=self.id, owner_id=self.owner.id, full_name=self.full_name, name=self.name,
+            description=self.description, url=self.url, updated_at=self.updated_at, pushed_at=self.pushed_at
+        )
@@ -0,0 +1,91 @@
+import logging
+from logging import Logger
+from pathlib import Path
+from typing import Any, Iterable, List, Mapping, NamedTuple, Tuple
+
+from django.db import transaction
+
+from github_data.archive import DEFAULT_READERS, read_archive
+from github_data.graphql import repository_data, user_data
+from github_data.ingest import DEFAULT_BATCH_SIZE, IngestResult, OwnerCache, ingest_repositories, ingest_users
+
+logger: Logger = logging.getLogger(__name__)
+
+USERS_ENDPOINT: str = 'GET /users'
+USER_ENDPOINT: str = 'GET /users/{username}'
+REPOSITORIES_ENDPOINT: str = 'GET /users/{username}/repos'
+GRAPHQL_ENDPOINT: str = 'POST /graphql'
+
+
+class ReplayResult(NamedTuple):
+    """
+    The number of archived responses replayed, and the number of users and repositories they wrote.
+    """
+    responses: int = 0
+    users: int = 0
+    repositories: int = 0
+
+
+def response_data(record: Mapping[str, Any]) -> Tuple[List[Mapping], List[Mapping]]:
+    """
+    Extracts the users and repositories of an archived response, in the shape of the GitHub REST API data.
+    Responses of other endpoints have neither.
+    :param record: The archived response
+    :return: The list of user data and the list of repository data of the response
+    """
+    endpoint: str = record['endpoint']
+    response: Any = record['response']
+    if endpoint == USERS_ENDPOINT:
+        return response, []
+    if endpoint == USER_ENDPOINT:
+        return [response], []
+    if endpoint == REPOSITORIES_ENDPOINT:
+        return [], response
+    if endpoint != GRAPHQL_ENDPOINT:
+        return [], []
+
+    users: List[Mapping] = []
+    repositories: List[Mapping] = []
+    for node in (response.get('data') or {}).values():
+        if node is None:
+            continue
+        owner: Mapping = user_data(node, record['host'])
+        users.append(owner)
+        repositories.extend(repository_data(repository, owner, record['host'])
+                            for repository in node['repositories']['nodes'])
+    return users, repositories
+
+
+def replay_archive(paths: Iterable[Path], *, readers: int = DEFAULT_READERS,
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> ReplayResult:
+    """
+    Writes the users and repositories of archived GitHub API responses to the database, without fetching them again.
+    The responses are streamed in chunks in the order they were archived, so later responses update the data of
+    earlier ones, and each chunk is written in a single transaction.
+    :param paths: The paths of the archive files, in the order they were written
+    :param readers: The number of archive files decompressed in parallel
+    :param batch_size: The number of rows written by each bulk statement
+    :return: The number of responses replayed, and of users and repositories written
+    """
+    owner_cache: OwnerCache = OwnerCache()
+    result: ReplayResult = ReplayResult()
+    for chunk in read_archive(paths, readers=readers):
+        users: List[Mapping] = []
+        repositories: List[Mapping] = []
+        for record in chunk:
+            record_users, record_repositories = response_data(record)
+            users.extend(record_users)
+            repositories.extend(record_repositories)
+
+        with transaction.atomic():
+            users_result: IngestResult = ingest_users(users, owner_cache=owner_cache, batch_size=batch_size)
+            repositories_result: IngestResult = ingest_repositories(
+                repositories, owner_cache=owner_cache, batch_size=batch_size
+            )
+        result = ReplayResult(
+            result.responses + len(chunk),
+            result.users + users_result.added + users_result.updated,
+            result.repositories + repositories_result.added + repositories_result.updated
+        )
+        logger.debug(f'-- replayed {result.responses} responses')
+    return result
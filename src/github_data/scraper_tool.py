@@ -1,54 +1,132 @@
 import logging
 import math
 import itertools
+from collections import deque
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 from logging import Logger
-from typing import List, Optional, Tuple
+from typing import Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple, Any
+from urllib.error import HTTPError
 
-from fastcore.net import HTTP4xxClientError
-from ghapi.core import GhApi
+from django.db import transaction
+from django.db.models import QuerySet
 from fastcore.foundation import L as fastlist
-from rest_framework.serializers import ModelSerializer
 
-from github_data.exceptions import RateLimitExceededError
-from github_data.models import GithubUser, GithubRepository
-from github_data.serializers import GithubUserSerializer, GithubRepositorySerializer
+from github_data.archive import ResponseArchive
+from github_data.exceptions import InvalidRecordError, RateLimitExceededError
+from github_data.github_api import CacheEntries, ResponseCache, ScraperApi, is_not_modified
+from github_data.graphql import GraphQLFetcher
+from github_data.ingest import (
+    DEFAULT_BATCH_SIZE, IngestResult, OwnerCache, build_user, ingest_users, ingest_repositories
+)
+from github_data.metrics import ScraperMetrics
+from github_data.models import GithubRepository, GithubUser, ScrapeRun
+from github_data.pipeline import DEFAULT_QUEUE_SIZE, prefetch
+from github_data.records import validate_timestamp
 
 logger: Logger = logging.getLogger(__name__)
 
+# the `updated_at` and `pushed_at` timestamps of a repository.
+RepositoryVersion = Tuple[Optional[datetime], Optional[datetime]]
+# the sorts of the repositories listings used to refresh, with the index of the timestamp each sorts by.
+REFRESH_SORTS: Dict[str, int] = {'updated': 0, 'pushed': 1}
+# the status codes of the GitHub API for users that don't exist, which are skipped instead of stopping the run.
+MISSING_USER_STATUSES: Tuple[int, ...] = (404, 410)
+
+
+class UserBatch(NamedTuple):
+    """
+    A batch of users fetched from the GitHub API with their repositories, written in a single transaction.
+    The cache entries of the responses it was fetched from are only set once it's committed.
+    """
+    users: List[fastlist]
+    repositories: List[fastlist]
+    missing: int = 0
+    responses: Optional[CacheEntries] = None
+
 
 class Scraper:
     MIN_PAGE_SIZE: int = 1
     MAX_PAGE_SIZE: int = 100
-    DEFAULT_USER_PAGE_SIZE: int = 50
-    DEFAULT_REPOSITORY_PAGE_SIZE: int = 30
+    DEFAULT_USER_PAGE_SIZE: int = MAX_PAGE_SIZE
+    DEFAULT_REPOSITORY_PAGE_SIZE: int = MAX_PAGE_SIZE
     DEFAULT_NUMBER_OF_REPOSITORIES: int = 0
     DEFAULT_NUMBER_OF_USERS: int = 0
     NO_REPOSITORIES: int = 0
     NO_USERS: int = 0
+    MIN_CONCURRENCY: int = 1
+    DEFAULT_CONCURRENCY: int = 1
+    REST_BACKEND: str = 'rest'
+    GRAPHQL_BACKEND: str = 'graphql'
 
     def __init__(self, *, token: Optional[str] = None,
+                 tokens: Optional[List[str]] = None,
                  users_page_size: int = DEFAULT_USER_PAGE_SIZE,
-                 repositories_page_size: int = DEFAULT_REPOSITORY_PAGE_SIZE):
+                 repositories_page_size: int = DEFAULT_REPOSITORY_PAGE_SIZE,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 api_host: Optional[str] = None,
+                 owner_cache_size: int = OwnerCache.DEFAULT_MAX_SIZE,
+                 response_cache: Optional[ResponseCache] = None,
+                 response_archive: Optional[ResponseArchive] = None,
+                 scrape_run: Optional[ScrapeRun] = None,
+                 backend: str = REST_BACKEND,
+                 refresh: bool = False,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 pool_size: Optional[int] = None):
         """
         Initializes a GitHub Scraper with a determined page size for users and repositories.
         :param token: Github OAuth token to get a better rate limit
+        :param tokens: Github OAuth tokens to rotate across, routing each request to the one with most budget left
         :param users_page_size: The amount of users each github users api call will fetch. max: 100
         :param repositories_page_size: The amount of repositories each github repositories api call will fetch. max: 100
+        :param concurrency: The number of workers fetching user data from the GitHub API in parallel. min: 1
+        :param api_host: The base url of the GitHub API, defaults to https://api.github.com
+        :param owner_cache_size: The maximum number of user ids remembered to skip repository owner lookups
+        :param response_cache: The cache of response ETags used to skip pages that did not change
+        :param response_archive: The archive every raw response of the GitHub API is appended to
+        :param scrape_run: The run whose checkpoint is saved with every batch of users written
+        :param backend: Fetch users and repositories with the REST API (rest), or with batched queries to the
+        GraphQL API (graphql), which needs a token
+        :param refresh: Only fetch and write the repositories that changed since they were scraped
+        :param queue_size: The number of fetched batches of users that can wait to be written. min: 0, which fetches
+        and writes in turns instead of in a fetcher thread
+        :param batch_size: The number of rows written by each bulk statement of a page transaction. min: 1
+        :param pool_size: The number of keep-alive connections to the GitHub API kept open between requests,
+        defaults to one for each worker and one for the fetcher thread
         """
-        self.api: GhApi = GhApi(token=token)
+        self.concurrency: int = max(concurrency, self.MIN_CONCURRENCY)
+        self.metrics: ScraperMetrics = ScraperMetrics()
+        self.api: ScraperApi = ScraperApi(
+            token=token, tokens=tokens, gh_host=api_host, response_cache=response_cache,
+            response_archive=response_archive, metrics=self.metrics,
+            pool_size=pool_size if pool_size is not None else self.concurrency + 1
+        )
+        self.owner_cache: OwnerCache = OwnerCache(owner_cache_size)
+        self.scrape_run: Optional[ScrapeRun] = scrape_run
+        self.refresh: bool = refresh
+        self.queue_size: int = max(queue_size, 0)
+        self.batch_size: int = max(batch_size, 1)
         self.repositories_processed: int = 0
         self.users_processed: int = 0
         self.repositories_added: int = 0
         self.users_added: int = 0
+        self.repositories_updated: int = 0
+        self.users_updated: int = 0
         # Set bound for the page sizes to the minimum and the maximum values
         self.users_page_size: int = max(min(self.MAX_PAGE_SIZE, users_page_size), self.MIN_PAGE_SIZE)
         self.repositories_page_size: int = max(min(self.MAX_PAGE_SIZE, repositories_page_size), self.MIN_PAGE_SIZE)
+        self.graphql: Optional[GraphQLFetcher] = None
+        if backend == self.GRAPHQL_BACKEND:
+            self.graphql = GraphQLFetcher(self.api, repositories_page_size=self.repositories_page_size)
         logger.debug(f'scrapper instance created with token: {token}.')
 
     def scrape_individual_users(self, usernames: List[str], *,
                                 number_of_repositories: int = DEFAULT_NUMBER_OF_REPOSITORIES) -> None:
         """
         Scrapes a list of users and their repositories from the GitHub API.
+        Users are fetched in a fetcher thread and written in batches by this thread as they arrive.
         :param usernames: The list of usernames to scrape
         :param number_of_repositories: The number of repositories to be scraped for each user, 0 means all repositories
         :return:
@@ -56,39 +134,101 @@ class Scraper:
 
         # set bound for the number of users and repositories, set to the default 0 (all) if it's negative.
         number_of_repositories = max(number_of_repositories, self.DEFAULT_NUMBER_OF_REPOSITORIES)
-
-        for username in usernames:
+        if self.graphql is not None:
+            self.write_batches(self.fetch_individual_users_graphql(
+                usernames, number_of_repositories=number_of_repositories
+            ), queue_size=self.queue_size)
+            return
+
+        self.write_batches(self.fetch_individual_users(
+            usernames, number_of_repositories=number_of_repositories,
+            stored_versions=self.load_repository_versions(usernames)
+        ), queue_size=self.queue_size)
+
+    def fetch_individual_users(self, usernames: List[str], *, number_of_repositories: int,
+                               stored_versions: Dict[str, Dict[int, RepositoryVersion]]) -> Iterator[UserBatch]:
+        """
+        Fetches a list of users and their repositories, a batch of users at a time, without touching the database.
+        Users that don't exist are skipped.
+        :param usernames: The list of usernames to fetch
+        :param number_of_repositories: The number of repositories to be fetched for each user, 0 means all repositories
+        :param stored_versions: The timestamps of the repositories of the users in the database, used to refresh
+        :return: An iterator with the batches of users, in the order of the list
+        """
+        def fetch_user(username: str) -> Tuple[Optional[Tuple[fastlist, List[fastlist]]], CacheEntries]:
             logger.info(f'- scraping user {username}')
-            try:
-                user_data: fastlist = self.api.users.get_by_username(username)
-            except HTTP4xxClientError as error:  # pragma: no cover
-                # Raise rate limit exceeded error.
-                raise RateLimitExceededError(
-                    error.url, error.code, 'Rate Limit Exceeded',
-                    error.headers, error.fp
-                )
+            with self.api.staging_responses() as responses:
+                try:
+                    user_data: fastlist = self.api.users.get_by_username(username)
+                except HTTPError as error:
+                    if error.code not in MISSING_USER_STATUSES:
+                        raise
+                    logger.warning(f'-- user {username} was not found.')
+                    return None, responses
+                return (user_data, self.fetch_user_repositories(
+                    username, number_of_repositories=number_of_repositories,
+                    public_repositories=user_data.get('public_repos'), stored_versions=stored_versions.get(username)
+                )), responses
+
+        users: List[fastlist] = []
+        repositories: List[fastlist] = []
+        missing: int = 0
+        responses: CacheEntries = {}
+        try:
+            for result, user_responses in self.map_concurrently(fetch_user, usernames):
+                responses.update(user_responses)
+                if result is None:
+                    missing += 1
+                else:
+                    users.append(result[0])
+                    repositories.extend(result[1])
+                # a batch of users at a time, so a long list of users is checkpointed as it goes.
+                if len(users) + missing >= self.users_page_size:
+                    yield UserBatch(users, repositories, missing=missing, responses=responses)
+                    users, repositories, missing, responses = [], [], 0, {}
+        except Exception:
+            # write every user completely fetched, even if the rate limit was reached.
+            yield UserBatch(users, repositories, missing=missing, responses=responses)
+            raise
+        yield UserBatch(users, repositories, missing=missing, responses=responses)
+
+    def fetch_individual_users_graphql(self, usernames: List[str], *,
+                                       number_of_repositories: int) -> Iterator[UserBatch]:
+        """
+        Fetches a list of users and their repositories with one GraphQL query per batch of users.
+        Batches are fetched concurrently and yielded in order.
+        :param usernames: The list of usernames to fetch
+        :param number_of_repositories: The number of repositories to be fetched for each user, 0 means all repositories
+        :return: An iterator with the batches of users, in the order of the list
+        """
+        def fetch_batch(batch: List[str]) -> List[Optional[Tuple[fastlist, List[fastlist]]]]:
+            logger.info(f'- scraping users {", ".join(batch)}')
+            return self.graphql.fetch_users(batch, number_of_repositories=number_of_repositories)
 
-            self.users_added += create_user(user_data)
-            self.users_processed += 1
-            try:
-                self.scrape_user_repositories(username, number_of_repositories=number_of_repositories)
-            except HTTP4xxClientError as error:  # pragma: no cover
-                # Raise rate limit exceeded error.
-                raise RateLimitExceededError(
-                    error.url, error.code, 'Rate Limit Exceeded',
-                    error.headers, error.fp
-                )
+        batches: List[List[str]] = [
+            usernames[start:start + self.users_page_size] for start in range(0, len(usernames), self.users_page_size)
+        ]
+        for results in self.map_concurrently(fetch_batch, batches):
+            users: List[fastlist] = [user_data for user_data, _ in filter(None, results)]
+            repositories: List[fastlist] = [
+                repository for _, user_repositories in filter(None, results) for repository in user_repositories
+            ]
+            # users that don't exist are processed too, so the written users are still the first ones of the list.
+            yield UserBatch(users, repositories, missing=len(results) - len(users))
 
     def scrape_users(self, *, since: int = 0,
                      number_of_users: int = DEFAULT_NUMBER_OF_USERS,
-                     number_of_repositories: int = DEFAULT_NUMBER_OF_REPOSITORIES) -> None:
+                     number_of_repositories: int = DEFAULT_NUMBER_OF_REPOSITORIES,
+                     until: Optional[int] = None) -> None:
         """
         Scrapes a determined quantity of users and their repositories from the GitHub API.
+        Pages of users are fetched in a fetcher thread and written by this thread as they arrive.
         :param since: The starting ID from where the number of users specified will be fetched
         :param number_of_users: The number of users to be scraped from the GitHub API,
         0 means all users. min: 0
         :param number_of_repositories: The number of repositories to be scraped for each User,
         0 means all repositories. min: 0
+        :param until: The last user ID to be scraped, `None` means no limit
         :return:
         """
 
@@ -97,82 +237,351 @@ class Scraper:
         number_of_repositories = max(number_of_repositories, self.DEFAULT_NUMBER_OF_REPOSITORIES)
         logger.info(f'- scraping {number_of_users} user(s) and {number_of_repositories} repo(s) starting at id {since}')
 
+        # refreshing reads the repositories stored for each page, which needs the database connection of this thread.
+        self.write_batches(self.fetch_users_range(
+            since=since, until=until, number_of_users=number_of_users, number_of_repositories=number_of_repositories
+        ), queue_size=0 if self.refresh else self.queue_size)
+
+    def fetch_users_range(self, *, since: int, until: Optional[int], number_of_users: int,
+                          number_of_repositories: int) -> Iterator[UserBatch]:
+        """
+        Fetches the pages of a range of users and their repositories without touching the database.
+        :param since: The starting ID from where the number of users specified will be fetched
+        :param until: The last user ID to be fetched, `None` means no limit
+        :param number_of_users: The number of users to be fetched, 0 means all users
+        :param number_of_repositories: The number of repositories to be fetched for each User, 0 means all repositories
+        :return: An iterator with the batches of users, in order
+        :raises RateLimitExceededError: If the rate limit was reached, with the ID to resume from
+        """
         pages, remaining_count, page_size = self.calculate_user_paging(number_of_users)
         logger.debug(f'- scraping {pages} page(s) of {page_size} user(s) and one page of {remaining_count} user(s)')
         parse_remaining: bool = True
 
-        for page_count in itertools.count(1):
-            try:
-                user_list: fastlist = self.api.users.list(since, per_page=page_size)
-            except HTTP4xxClientError as error:  # pragma: no cover
-                raise RateLimitExceededError(
-                    error.url, error.code, 'Rate Limit Exceeded',
-                    error.headers, error.fp, last_id=since
+        try:
+            for page_count in itertools.count(1):
+                with self.api.staging_responses() as page_responses:
+                    user_list: fastlist = self.list_users(since, page_size)
+                logger.debug(f'- fetched {len(user_list)} user(s) in page #{page_count}')
+                users_in_range: fastlist = trim_users(user_list, until)
+                yield from self.fetch_users_page(users_in_range, number_of_repositories, page_responses=page_responses)
+                since: Optional[int] = users_in_range[-1].id if users_in_range else None
+
+                # stop if reached page limit, the end of the range, or if there are no more users to get
+                if pages and page_count >= pages or len(users_in_range) < page_size or since == until:
+                    parse_remaining = len(users_in_range) == page_size and since != until
+                    break
+
+            if remaining_count and parse_remaining and since is not None:
+                with self.api.staging_responses() as page_responses:
+                    remaining_users: fastlist = self.list_users(since, remaining_count)
+                yield from self.fetch_users_page(
+                    trim_users(remaining_users, until), number_of_repositories, page_responses=page_responses
                 )
-            logger.debug(f'- fetched {len(user_list)} user(s) in page #{page_count}')
-            since: int = self.parse_users_list(user_list, number_of_repositories)
+        except RateLimitExceededError as error:
+            # no user of the page was fetched, so the page starts again.
+            if error.last_id is None:
+                error.last_id = since
+            raise
 
-            # stop if reached page limit, or if there are no more users to get
-            if pages and page_count >= pages or len(user_list) < page_size:
-                parse_remaining = len(user_list) == page_size
-                break
-
-        if remaining_count and parse_remaining and since is not None:
-            remaining_users: fastlist = self.api.users.list(since, per_page=remaining_count)
-            self.parse_users_list(remaining_users, number_of_repositories)
-
-    def parse_users_list(self, users: fastlist, number_of_repositories: int) -> Optional[int]:
+    def list_users(self, since: int, page_size: int) -> fastlist:
+        """
+        Fetches a page of users from the GitHub API.
+        :param since: The ID after which the users of the page start
+        :param page_size: The number of users in the page
+        :return: The list of user data
+        :raises RateLimitExceededError: If the rate limit was reached, with `since` as the ID to resume from
         """
-        Inserts all users from a list of user data into the database, and scrapes repository data for each user.
+        try:
+            return self.api.users.list(since, per_page=page_size)
+        except RateLimitExceededError as error:
+            error.last_id = since
+            raise
+
+    def fetch_users_page(self, users: fastlist, number_of_repositories: int, *,
+                         page_responses: Optional[CacheEntries] = None) -> Iterator[UserBatch]:
+        """
+        Fetches the repositories of every user in a page of user data. Repository pages are fetched concurrently,
+        but the users are kept in the order of the page.
         :param users: The list containing user data
-        :param number_of_repositories: The number of repositories to scrape for each User
-        :return: The ID of the last user parsed. Returns `None` if the list is empty
+        :param number_of_repositories: The number of repositories to fetch for each User
+        :param page_responses: The staged cache entry of the page of users, only set with a batch of the whole page
+        :return: An iterator with the batch of users of the page. If a request failed, the batch only has the users
+        fetched before it, and the error is raised after it
         """
-        last_user_id: Optional[int] = None
-        for user in users:
+        if self.graphql is not None:
+            results: List[Optional[Tuple[fastlist, List[fastlist]]]] = self.graphql.fetch_users(
+                [user.login for user in users], number_of_repositories=number_of_repositories
+            )
+            yield UserBatch(list(users), [
+                repository for _, user_repositories in filter(None, results) for repository in user_repositories
+            ], responses=page_responses)
+            return
+
+        stored_versions: Dict[str, Dict[int, RepositoryVersion]] = self.load_repository_versions(
+            [user.login for user in users]
+        )
+
+        def fetch_repositories(user: fastlist) -> Tuple[List[fastlist], CacheEntries]:
             logger.info(f'- scraping user {user.login}')
-            self.users_added += create_user(user)
-            self.users_processed += 1
-
-            try:
-                self.scrape_user_repositories(user.login, number_of_repositories=number_of_repositories)
-            except HTTP4xxClientError as error:  # pragma: no cover
-                raise RateLimitExceededError(
-                    error.url, error.code, 'Rate Limit Exceeded',
-                    error.headers, error.fp, last_id=last_user_id
-                )
-            last_user_id = user.id
-        return last_user_id
+            with self.api.staging_responses() as responses:
+                return self.fetch_user_repositories(
+                    user.login, number_of_repositories=number_of_repositories,
+                    public_repositories=user.get('public_repos'), stored_versions=stored_versions.get(user.login)
+                ), responses
+
+        fetched_users: List[fastlist] = []
+        repositories: List[fastlist] = []
+        responses: CacheEntries = {}
+        try:
+            for user, (user_repositories, user_responses) in zip(
+                users, self.map_concurrently(fetch_repositories, users)
+            ):
+                fetched_users.append(user)
+                repositories.extend(user_repositories)
+                responses.update(user_responses)
+        except Exception as error:
+            # resume from the last user whose repositories were completely written. The page of users isn't
+            # cached, so the resumed run fetches it again instead of taking its users as written.
+            if isinstance(error, RateLimitExceededError):
+                error.last_id = fetched_users[-1].id if fetched_users else None
+            yield UserBatch(fetched_users, repositories, responses=responses)
+            raise
+        yield UserBatch(fetched_users, repositories, responses={**(page_responses or {}), **responses})
+
+    def write_batches(self, batches: Iterator[UserBatch], *, queue_size: int) -> None:
+        """
+        Writes the batches of users of a fetcher as they arrive, each one in its own transaction.
+        The fetcher runs in its own thread, up to `queue_size` batches ahead of the writes.
+        :param batches: The iterator fetching the batches of users
+        :param queue_size: The number of fetched batches that can wait to be written, 0 fetches and writes in turns
+        :return:
+        """
+        for batch in prefetch(batches, max_size=queue_size):
+            self.write_users(batch.users, batch.repositories, missing=batch.missing, responses=batch.responses)
 
-    def scrape_user_repositories(self, username: str, *, number_of_repositories: int) -> None:
+    def write_users(self, users: List[fastlist], repositories: List[fastlist], *, missing: int = 0,
+                    responses: Optional[CacheEntries] = None) -> None:
         """
-        Scrapes a determined quantity of User Repositories from the GitHub Api.
-        :param username: The username of the GitHub User to scrape Repositories from
-        :param number_of_repositories: The number of repositories to be scraped, 0 means all repositories
+        Inserts a list of users and their already fetched repositories into the database.
+        The checkpoint of the scrape run is saved in the same transaction, with a snapshot of the metrics. The time
+        of a write includes its commit, so the snapshot has the writes up to the previous batch.
+        :param users: The list containing user data
+        :param repositories: The list containing the repository data of all the users
+        :param missing: The number of users requested that don't exist, which are counted as processed
+        :param responses: The staged cache entries of the responses the users were fetched from, set once the users
+        are committed
         :return:
         """
-        pages, page_size = self.calculate_repository_paging(number_of_repositories)
+        if not users and not missing:
+            return
+
+        # users from pages that did not change since they were cached are not written again.
+        changed_users: List[fastlist] = [user for user in users if not is_not_modified(user)]
+        if self.refresh:
+            changed_users = self.filter_changed_users(changed_users)
+        try:
+            with self.metrics.time_write(len(changed_users) + len(repositories)), transaction.atomic():
+                result: IngestResult = ingest_users(
+                    changed_users, owner_cache=self.owner_cache, batch_size=self.batch_size
+                )
+                repositories_result: IngestResult = self.parse_repositories_list(repositories)
+                if responses and self.api.response_cache is not None:
+                    transaction.on_commit(partial(self.api.response_cache.update, responses))
+                if self.scrape_run is not None:
+                    self.scrape_run.checkpoint(
+                        users, users_processed=len(users) + missing, users_added=result.added,
+                        repositories_processed=len(repositories), repositories_added=repositories_result.added,
+                        metrics=self.metrics.snapshot()
+                    )
+        except Exception:
+            # the owners written by the transaction were rolled back with it.
+            self.owner_cache.discard()
+            raise
+        self.users_added += result.added
+        self.users_updated += result.updated
+        self.users_processed += len(users) + missing
+
+    def fetch_user_repositories(self, username: str, *, number_of_repositories: int,
+                                public_repositories: Optional[int] = None,
+                                stored_versions: Optional[Dict[int, RepositoryVersion]] = None) -> List[fastlist]:
+        """
+        Fetches a determined quantity of User Repositories from the GitHub Api without touching the database.
+        :param username: The username of the GitHub User to fetch Repositories from
+        :param number_of_repositories: The number of repositories to be fetched, 0 means all repositories
+        :param public_repositories: The number of public repositories of the user, if known
+        :param stored_versions: The timestamps of the repositories of the user in the database, used to refresh
+        :return: The list of repository data for the user
+        """
+        if self.refresh:
+            if public_repositories == self.NO_REPOSITORIES:
+                return []
+            return self.fetch_changed_repositories(
+                username, number_of_repositories=number_of_repositories, stored_versions=stored_versions or {}
+            )
+
+        pages, page_size = self.calculate_repository_paging(number_of_repositories, public_repositories)
         logger.debug(f'-- scraping {pages} page(s) of {page_size} repositories for user {username}')
 
+        repositories: List[fastlist] = []
         for page in itertools.count(1):
+            if pages is not None and page > pages:
+                break
             repository_list: fastlist = self.api.repos.list_for_user(username, page=page, per_page=page_size)
             logger.debug(f'-- fetched {len(repository_list)} repositories in page {page}')
-            self.parse_repositories_list(repository_list)
+            if not is_not_modified(repository_list):
+                repositories.extend(repository_list)
 
-            # stop if reached page limit, or if there are no more repositories to get
-            if pages and page >= pages or len(repository_list) < page_size:
+            # stop if there are no more repositories to get
+            if len(repository_list) < page_size:
+                break
+        return trim_repositories(repositories, number_of_repositories)
+
+    def fetch_changed_repositories(self, username: str, *, number_of_repositories: int,
+                                   stored_versions: Dict[int, RepositoryVersion]) -> List[fastlist]:
+        """
+        Fetches the repositories of a user that changed since they were scraped.
+        A push only moves the `pushed_at` of a repository and an edit only its `updated_at`, so the repositories are
+        listed most recently updated first and then most recently pushed first, and each listing stops at the first
+        repository with the same timestamp it was sorted by as when it was scraped, the ones after it didn't change.
+        If the first listing reaches the last repository of the user, both timestamps of every repository were
+        compared, so the second one is skipped.
+        :param username: The username of the GitHub User to fetch Repositories from
+        :param number_of_repositories: The number of changed repositories to be fetched, 0 means all of them
+        :param stored_versions: The timestamps of the repositories of the user in the database
+        :return: The list of data of the new and changed repositories of the user
+        """
+        changed: Dict[int, fastlist] = {}
+        for sort in REFRESH_SORTS:
+            if len(changed) >= number_of_repositories > 0:
                 break
+            if self.collect_changed_repositories(
+                username, changed, sort=sort, number_of_repositories=number_of_repositories,
+                stored_versions=stored_versions
+            ):
+                break
+        logger.debug(f'-- {len(changed)} changed repositories for user {username}')
+        return trim_repositories(list(changed.values()), number_of_repositories)
 
-    def parse_repositories_list(self, repositories: fastlist) -> None:
+    def collect_changed_repositories(self, username: str, changed: Dict[int, fastlist], *, sort: str,
+                                     number_of_repositories: int,
+                                     stored_versions: Dict[int, RepositoryVersion]) -> bool:
+        """
+        Lists the repositories of a user sorted by one of their timestamps, most recent first, until the page of the
+        first one with the same timestamp as when it was scraped. The rest of that page is compared too, since it was
+        already fetched.
+        :param username: The username of the GitHub User to fetch Repositories from
+        :param changed: The new and changed repositories found so far by id, the ones found are added to it
+        :param sort: `updated` or `pushed`, the timestamp to sort the repositories by
+        :param number_of_repositories: The number of changed repositories to be fetched, 0 means all of them
+        :param stored_versions: The timestamps of the repositories of the user in the database
+        :return: Whether or not the listing reached the last repository of the user
+        """
+        timestamp: int = REFRESH_SORTS[sort]
+        for page in itertools.count(1):
+            repository_list: fastlist = self.api.repos.list_for_user(
+                username, sort=sort, direction='desc', page=page, per_page=self.repositories_page_size
+            )
+            last_page: bool = len(repository_list) < self.repositories_page_size
+            # the most recent repositories didn't change since the page was cached.
+            if is_not_modified(repository_list):
+                return last_page
+
+            unchanged_found: bool = False
+            for repository in repository_list:
+                version: RepositoryVersion = repository_version(repository)
+                stored_version: Optional[RepositoryVersion] = stored_versions.get(repository.id)
+                if version != stored_version:
+                    changed.setdefault(repository.id, repository)
+                if stored_version is not None and stored_version[timestamp] == version[timestamp]:
+                    unchanged_found = True
+
+            if last_page:
+                return True
+            if unchanged_found or len(changed) >= number_of_repositories > 0:
+                return False
+
+    @staticmethod
+    def filter_changed_users(users: List[fastlist]) -> List[fastlist]:
+        """
+        Leaves out the users that didn't change since they were scraped, loading the stored ones in a single query.
+        Summaries of users, like the ones of the users list, have no `updated_at` and are compared by their login and
+        url. Users that are not valid are kept, so they are reported when they are written.
+        :param users: The list containing user data
+        :return: The users that are not stored or changed
+        """
+        stored_users: Dict[int, Tuple[str, str, Optional[datetime]]] = {
+            user_id: (login, url, updated_at) for user_id, login, url, updated_at in GithubUser.objects.filter(
+                id__in=[user.get('id') for user in users]
+            ).values_list('id', 'login', 'url', 'updated_at')
+        }
+        changed_users: List[fastlist] = []
+        for user_data in users:
+            user: Optional[GithubUser] = build_user(user_data)
+            stored_user: Optional[Tuple[str, str, Optional[datetime]]] = stored_users.get(user.id) if user else None
+            if stored_user is None or (user.login, user.url) != stored_user[:2] or (
+                user.updated_at is not None and user.updated_at != stored_user[2]
+            ):
+                changed_users.append(user_data)
+        return changed_users
+
+    def load_repository_versions(self, logins: List[str]) -> Dict[str, Dict[int, RepositoryVersion]]:
+        """
+        Loads the timestamps of the repositories of a list of users from the database, in a single query.
+        Only loaded when refreshing, so the workers fetching repositories don't query the database.
+        :param logins: The usernames of the owners of the repositories
+        :return: The `(updated_at, pushed_at)` of each repository by id, for each username
         """
-        Inserts all repositories from a list of repository data into the database
+        stored_versions: Dict[str, Dict[int, RepositoryVersion]] = {}
+        if not self.refresh:
+            return stored_versions
+        repositories: QuerySet = GithubRepository.objects.filter(owner__login__in=logins).values_list(
+            'owner__login', 'id', 'updated_at', 'pushed_at'
+        )
+        for login, repository_id, updated_at, pushed_at in repositories:
+            stored_versions.setdefault(login, {})[repository_id] = (updated_at, pushed_at)
+        return stored_versions
+
+    def map_concurrently(self, function: Callable[[Any], Any], items: List[Any]) -> Iterator[Any]:
+        """
+        Calls a function that fetches data from the GitHub API for every item, using up to `self.concurrency` workers.
+        Results are yielded in the same order as the items, so the database writes stay sequential.
+        Only `2 * self.concurrency` calls are submitted ahead of the result being consumed, so a slow consumer
+        holds the workers back instead of piling up results.
+        If any call fails, like when it hits the rate limit, the pending calls are cancelled and its error is raised
+        unchanged when its result is reached.
+        :param function: The function to call with each item
+        :param items: The items to call the function with
+        :return: An iterator with the results of each call, in order
+        """
+        remaining_items: Iterator[Any] = iter(items)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures: Deque[Future] = deque(
+                executor.submit(function, item) for item in itertools.islice(remaining_items, 2 * self.concurrency)
+            )
+            try:
+                while futures:
+                    result: Any = futures.popleft().result()
+                    futures.extend(executor.submit(function, item) for item in itertools.islice(remaining_items, 1))
+                    yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def parse_repositories_list(self, repositories: fastlist) -> IngestResult:
+        """
+        Inserts or updates all repositories from a list of repository data into the database in bulk.
         :param repositories: The list containing repository data
-        :return:
+        :return: The number of repositories inserted and updated
         """
         for repository in repositories:
             logger.info(f'-- scraping repository {repository.full_name}')
-            self.repositories_added += create_repository(repository)
-            self.repositories_processed += 1
+        result: IngestResult = ingest_repositories(
+            repositories, owner_cache=self.owner_cache, batch_size=self.batch_size
+        )
+        self.repositories_added += result.added
+        self.repositories_updated += result.updated
+        self.repositories_processed += len(repositories)
+        return result
 
     def calculate_user_paging(self, number_of_users: int) -> Tuple[int, int, int]:
         """
@@ -187,7 +596,7 @@ class Scraper:
         # no calculation needed if we want all repositories
         # return 0 pages, 0 remainder, and the same page size
         if number_of_users == 0:
-            return self.NO_USERS, self.NO_USERS, self.repositories_page_size
+            return self.NO_USERS, self.NO_USERS, self.users_page_size
 
         page_size: int = self.users_page_size
         pages, remaining_count = divmod(number_of_users, page_size)
@@ -201,68 +610,72 @@ class Scraper:
 
         return pages, remaining_count, page_size
 
-    def calculate_repository_paging(self, number_of_repositories: int) -> Tuple[int, int]:
+    def calculate_repository_paging(self, number_of_repositories: int,
+                                    public_repositories: Optional[int] = None) -> Tuple[Optional[int], int]:
         """
-        Calculates paging information to be used to get the Repository data for each User from the GitHub Api.
-        :param number_of_repositories: The number of repositories to paginate
-        :return: The number of pages and the page size to get the desired amount of repositories
+        Plans the pages used to get the Repository data for each User from the GitHub Api with as few requests as
+        possible. Pages always have the repositories page size (unless fewer repositories are needed),
+        and the repositories fetched after `number_of_repositories` are left out afterwards.
+        :param number_of_repositories: The number of repositories to paginate, 0 means all repositories
+        :param public_repositories: The number of public repositories of the user, if known
+        :return: The number of pages and the page size to get the desired amount of repositories. The number of pages
+        is `None` if it's not known, then pages are fetched until one is not full
         """
 
         # bound the number of repositories, set to the default 0 (all) if it's negative.
         number_of_repositories = max(number_of_repositories, self.DEFAULT_NUMBER_OF_REPOSITORIES)
 
-        # no calculation needed if we want all repositories
-        if number_of_repositories == 0:
-            return self.NO_REPOSITORIES, self.repositories_page_size
-
-        # if the number of repositories has any remainder after dividing by the page size
-        # and the user has a bigger total number of repositories, the pagination will give you a whole extra page
-        # with more repositories than what was specified in `number_of_repositories`.
-        # so.... let's find the factors of `number_of_repositories`
-        # and use the closest one to `self.repositories_page_size` as the page size.
-        # i brought this on myself.
+        # the number of repositories of the user, when it's known, saves the request of a last empty page.
+        total: Optional[int] = number_of_repositories or None
+        if public_repositories is not None:
+            total = min(total, public_repositories) if total else public_repositories
 
-        factors: List[int] = [
-            n for n in range(1, number_of_repositories + 1)
-            if number_of_repositories % n == 0
-        ]
-
-        page_size: int = min(factors, key=lambda x: abs(x - self.repositories_page_size))
-        pages: int = math.ceil(number_of_repositories / page_size)
+        if total is None:
+            return None, self.repositories_page_size
+        if total == 0:
+            return self.NO_REPOSITORIES, self.repositories_page_size
 
         # if the number of repositories is less than the page size,
         # make it so that there's only one page with that particular size
-        if 0 < number_of_repositories < page_size:
-            page_size = number_of_repositories
+        page_size: int = min(total, self.repositories_page_size)
+        return math.ceil(total / page_size), page_size
 
-        return pages, page_size
+
+def trim_users(users: fastlist, until: Optional[int]) -> fastlist:
+    """
+    Helper function that leaves out the users of a page after the last user ID of a range.
+    :param users: The list containing user data, sorted by ID
+    :param until: The last user ID of the range, `None` means no limit
+    :return: The users with an ID up to `until`
+    """
+    if until is None or not users or users[-1].id <= until:
+        return users
+    return fastlist(user for user in users if user.id <= until)
 
 
-def create_user(user_data: fastlist) -> bool:
+def trim_repositories(repositories: List[fastlist], number_of_repositories: int) -> List[fastlist]:
     """
-    Helper function that uses the Django Rest Framework ModelSerializer
-    to validate and insert a GithubUser object into the database.
-    :param user_data: Github User data
-    :return: Whether or not the user was inserted into the database
+    Helper function that leaves out the repositories fetched after the number of repositories requested.
+    :param repositories: The list containing repository data
+    :param number_of_repositories: The number of repositories requested, 0 (or less) means all repositories
+    :return: The first `number_of_repositories` repositories
     """
-    user: Optional[GithubUser] = None
-    serializer: ModelSerializer = GithubUserSerializer(data=user_data)
-    if serializer.is_valid():
-        user = serializer.save()
-        logger.debug(f'- user {user.login} added to the database.')
-    return user is not None
+    if number_of_repositories <= 0:
+        return repositories
+    return repositories[:number_of_repositories]
 
 
-def create_repository(repository_data: fastlist) -> bool:
+def repository_version(repository_data: fastlist) -> RepositoryVersion:
     """
-    Helper function that uses the Django Rest Framework ModelSerializer
-    to validate and insert a GithubRepository object into the database.
+    Gets the timestamps that tell if a repository changed from GitHub Repository data.
     :param repository_data: Github Repository data
-    :return: Whether or not the repository was inserted into the database
+    :return: The `updated_at` and `pushed_at` of the repository, `None` if they are missing or invalid
     """
-    repository: Optional[GithubRepository] = None
-    serializer: ModelSerializer = GithubRepositorySerializer(data=repository_data)
-    if serializer.is_valid():
-        repository = serializer.save()
-        logger.debug(f'-- repository {repository.full_name} added to the database.')
-    return repository is not None
+    try:
+        return (
+            validate_timestamp(repository_data.get('updated_at'), 'updated_at'),
+            validate_timestamp(repository_data.get('pushed_at'), 'pushed_at')
+        )
+    except InvalidRecordError:
+        return None, None
+
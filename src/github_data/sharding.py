@@ -0,0 +1,29 @@
+from typing import List, Optional, Tuple
+
+
+def split_id_range(since: int, until: int, shards: int) -> List[Tuple[int, int]]:
+    """
+    Splits a range of GitHub user ids into contiguous shards of about the same size.
+    :param since: The id after which the range starts, like the `since` parameter of the GitHub API
+    :param until: The last id of the range
+    :param shards: The number of shards to split the range into. min: 1
+    :return: The `(since, until)` range of each shard, in order. Ranges too small to split get fewer shards
+    """
+    size: int = max(until - since, 0)
+    shards = max(min(shards, size), 1)
+    boundaries: List[int] = [since + size * shard // shards for shard in range(shards + 1)]
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def distribute_tokens(tokens: List[Optional[str]], shards: int) -> List[List[Optional[str]]]:
+    """
+    Distributes GitHub OAuth tokens between shards, so shards don't share a token while there are enough of them.
+    :param tokens: The GitHub OAuth tokens available
+    :param shards: The number of shards
+    :return: The tokens of each shard. With fewer tokens than shards, each token is shared by several shards
+    """
+    if not tokens:
+        return [[] for _ in range(shards)]
+    if len(tokens) < shards:
+        return [[tokens[shard % len(tokens)]] for shard in range(shards)]
+    return [tokens[shard::shards] for shard in range(shards)]
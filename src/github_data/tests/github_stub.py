@@ -0,0 +1,213 @@
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+RATE_LIMIT_MESSAGE: str = 'API rate limit exceeded'
+GRAPHQL_RESPONSES_PATH: Path = Path(__file__).parent / 'fixtures' / 'graphql_responses.json'
+
+
+def load_graphql_responses() -> List[Dict]:
+    """
+    Loads the recorded GraphQL responses for the users `user-1`, with 3 repositories, and `user-2`, with none,
+    and for the missing user `missing`.
+    """
+    with open(GRAPHQL_RESPONSES_PATH) as recordings:
+        return json.load(recordings)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads: bool = True
+
+
+class GithubStubServer:
+    """
+    Local stand-in for the GitHub REST API serving the users and repositories endpoints used by the scrapers.
+    Users have consecutive ids starting at 1 and the login `user-{id}`. Repositories are updated a minute apart,
+    the ones with higher ids last, unless they are given a new `updated_at` in `repository_updates` or a new
+    `pushed_at` in `repository_pushes`.
+    GraphQL queries are answered by replaying recorded responses, matched by the query variables.
+    The first `secondary_limited_requests` requests are rejected by a secondary rate limit, with a 429 that still has
+    rate limit budget left and the `retry_after` seconds in its Retry-After header. The user `forbidden_login` is
+    answered with an ordinary 403 that still has rate limit budget left.
+    Connections are kept alive between requests and responses are compressed for clients that accept gzip.
+    Use it as a context manager and point the scraper to `api_host`.
+    """
+    def __init__(self, repositories_per_user: Dict[int, int], *, rate_limited_login: Optional[str] = None,
+                 forbidden_login: Optional[str] = None,
+                 token_budgets: Optional[Dict[str, int]] = None,
+                 graphql_responses: Optional[List[Dict]] = None,
+                 secondary_limited_requests: int = 0, retry_after: Optional[int] = None) -> None:
+        self.repositories_per_user: Dict[int, int] = repositories_per_user
+        self.graphql_responses: List[Dict] = graphql_responses or []
+        self.repository_updates: Dict[int, str] = {}
+        self.repository_pushes: Dict[int, str] = {}
+        self.rate_limited_login: Optional[str] = rate_limited_login
+        self.forbidden_login: Optional[str] = forbidden_login
+        self.token_budgets: Dict[str, int] = dict(token_budgets or {})
+        self.token_limits: Dict[str, int] = dict(self.token_budgets)
+        self.token_resets: Dict[str, int] = {token: int(time.time()) + 60 * (index + 1)
+                                             for index, token in enumerate(self.token_budgets)}
+        self.secondary_limited_requests: int = secondary_limited_requests
+        self.retry_after: Optional[int] = retry_after
+        self.requests: List[str] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.thread: threading.Thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def api_host(self) -> str:
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> 'GithubStubServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def user_data(self, user_id: int) -> Dict:
+        login: str = f'user-{user_id}'
+        return {
+            'id': user_id, 'login': login, 'url': f'{self.api_host}/users/{login}',
+            'public_repos': self.repositories_per_user[user_id], 'updated_at': '2021-01-01T00:00:00Z'
+        }
+
+    def repository_data(self, owner: Dict, repository_id: int) -> Dict:
+        github_id: int = owner['id'] * 1000 + repository_id
+        created_at: str = f'2021-01-01T00:{repository_id % 60:02d}:00Z'
+        return {
+            'id': github_id, 'owner': owner, 'name': f'repo-{repository_id}',
+            'full_name': f'{owner["login"]}/repo-{repository_id}', 'description': '',
+            'url': f'{self.api_host}/repos/{owner["login"]}/repo-{repository_id}',
+            'updated_at': self.repository_updates.get(github_id, created_at),
+            'pushed_at': self.repository_pushes.get(github_id, created_at)
+        }
+
+    def route(self, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        """
+        Resolves a request path and its query parameters into a status code and a JSON payload.
+        """
+        per_page: int = int(query.get('per_page', 30))
+        if path == '/users':
+            since: int = int(query.get('since', 0))
+            user_ids: List[int] = sorted(user_id for user_id in self.repositories_per_user if user_id > since)
+            # like the GitHub API, the users list only has the summary of each user.
+            return 200, [
+                {key: value for key, value in self.user_data(user_id).items() if key in ('id', 'login', 'url')}
+                for user_id in user_ids[:per_page]
+            ]
+
+        match = re.fullmatch(r'/users/user-(\d+)(/repos)?', path)
+        if not match or int(match.group(1)) not in self.repositories_per_user:
+            return 404, {'message': 'Not Found'}
+        user: Dict = self.user_data(int(match.group(1)))
+        if user['login'] == self.forbidden_login:
+            return 403, {'message': 'Resource not accessible by integration'}
+        if not match.group(2):
+            return 200, user
+        if user['login'] == self.rate_limited_login:
+            return 403, {'message': RATE_LIMIT_MESSAGE}
+
+        page: int = int(query.get('page', 1))
+        repositories: List[Dict] = [
+            self.repository_data(user, repository_id) for repository_id in range(self.repositories_per_user[user['id']])
+        ]
+        if query.get('sort') in ('updated', 'pushed'):
+            repositories.sort(key=lambda repository: repository[f'{query["sort"]}_at'],
+                              reverse=query.get('direction') != 'asc')
+        return 200, repositories[(page - 1) * per_page:page * per_page]
+
+    def graphql(self, variables: Dict[str, Any]) -> Tuple[int, Any]:
+        """
+        Replays the recorded response of a GraphQL query with the same variables.
+        """
+        for recording in self.graphql_responses:
+            if recording['variables'] == variables:
+                return 200, recording['response']
+        return 400, {'message': 'No recorded response for the query variables'}
+
+    def handler_class(self) -> type:
+        stub: GithubStubServer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep the connections alive between requests, like the GitHub API. The headers and the body of a response
+            # are written separately, so they are sent right away instead of waiting for the ack of the headers.
+            protocol_version: str = 'HTTP/1.1'
+            disable_nagle_algorithm: bool = True
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                stub.requests.append(self.path)
+                query: Dict[str, str] = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                token: str = (self.headers.get('Authorization') or '').replace('token ', '')
+                limit, remaining, reset = 5000, 4999, int(time.time()) + 3600
+                if token in stub.token_budgets:
+                    with stub.lock:
+                        limit, reset = stub.token_limits[token], stub.token_resets[token]
+                        remaining = stub.token_budgets[token] - 1
+                        stub.token_budgets[token] = max(remaining, 0)
+
+                with stub.lock:
+                    secondary_limited: bool = stub.secondary_limited_requests > 0
+                    stub.secondary_limited_requests -= secondary_limited
+                if secondary_limited:
+                    status, payload = 429, {'message': 'You have exceeded a secondary rate limit'}
+                elif remaining < 0:
+                    remaining, (status, payload) = 0, (403, {'message': RATE_LIMIT_MESSAGE})
+                else:
+                    status, payload = stub.route(url.path, query)
+                    if status == 403 and payload['message'] == RATE_LIMIT_MESSAGE:
+                        remaining = 0
+                self.respond(status, payload, limit=limit, remaining=remaining, reset=reset, resource='core')
+
+            def do_POST(self) -> None:
+                stub.requests.append(f'POST {self.path}')
+                request: Dict = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if urlparse(self.path).path != '/graphql':
+                    status, payload = 404, {'message': 'Not Found'}
+                else:
+                    status, payload = stub.graphql(request.get('variables') or {})
+                self.respond(
+                    status, payload, limit=5000, remaining=4999, reset=int(time.time()) + 3600, resource='graphql'
+                )
+
+            def respond(self, status: int, payload: Any, *, limit: int, remaining: int, reset: int,
+                        resource: str) -> None:
+                body: bytes = json.dumps(payload).encode()
+                etag: str = f'"{hashlib.md5(body).hexdigest()}"'
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    status, body = 304, b''
+                compress: bool = bool(body) and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+                if compress:
+                    body = gzip.compress(body)
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                if compress:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('X-RateLimit-Limit', str(limit))
+                self.send_header('X-RateLimit-Remaining', str(remaining))
+                self.send_header('X-RateLimit-Reset', str(reset))
+                self.send_header('X-RateLimit-Resource', resource)
+                if status == 429 and stub.retry_after is not None:
+                    self.send_header('Retry-After', str(stub.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,75 @@
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from django.test import SimpleTestCase
+
+from github_data import archive
+from github_data.archive import ResponseArchive, archive_files, read_archive
+from github_data.github_api import ScraperApi
+from github_data.tests.github_stub import GithubStubServer
+
+
+class ResponseArchiveTestCase(SimpleTestCase):
+    """
+    Tests for the archive of raw GitHub API responses and the parallel reader of its files.
+    """
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path: Path = Path(self.directory.name)
+
+    def read_records(self, **kwargs: Any) -> List[Dict]:
+        return [record for chunk in read_archive(archive_files([self.path]), **kwargs) for record in chunk]
+
+    def test_api_responses_are_archived(self) -> None:
+        response_archive: ResponseArchive = ResponseArchive(self.path)
+        with GithubStubServer({1: 3, 2: 0}) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host, response_archive=response_archive)
+            api.users.list(0, per_page=2)
+            api.repos.list_for_user('user-1', per_page=5)
+        response_archive.close()
+
+        records: List[Dict] = self.read_records()
+        self.assertEqual(response_archive.responses, 2)
+        self.assertListEqual([record['endpoint'] for record in records],
+                             ['GET /users', 'GET /users/{username}/repos'])
+        self.assertDictEqual(records[1]['route'], {'username': 'user-1'})
+        self.assertDictEqual(records[1]['query'], {'per_page': 5})
+        self.assertEqual(records[1]['host'], stub.api_host)
+        self.assertListEqual([repository['name'] for repository in records[1]['response']],
+                             ['repo-0', 'repo-1', 'repo-2'])
+
+    def test_files_are_rotated_and_read_in_order(self) -> None:
+        response_archive: ResponseArchive = ResponseArchive(self.path, max_file_size=1)
+        for index in range(5):
+            response_archive.append('GET /users', 'http://localhost', None, {'since': index}, [{'id': index}])
+        response_archive.close()
+
+        self.assertEqual(len(archive_files([self.path])), 5)
+        records: List[Dict] = self.read_records(readers=2)
+        self.assertListEqual([record['query']['since'] for record in records], [0, 1, 2, 3, 4])
+
+    def test_chunks_are_streamed(self) -> None:
+        response_archive: ResponseArchive = ResponseArchive(self.path)
+        for index in range(archive.CHUNK_SIZE + 1):
+            response_archive.append('GET /users', 'http://localhost', None, {'since': index}, [])
+        response_archive.close()
+
+        chunks: List[List[Dict]] = list(read_archive(archive_files([self.path])))
+        self.assertListEqual([len(chunk) for chunk in chunks], [archive.CHUNK_SIZE, 1])
+
+    def test_file_that_was_not_closed_is_read(self) -> None:
+        response_archive: ResponseArchive = ResponseArchive(self.path)
+        for index in range(3):
+            response_archive.append('GET /users', 'http://localhost', None, {'since': index}, [])
+        flushed_size: int = response_archive.file.fileobj.tell()
+        response_archive.append('GET /users', 'http://localhost', None, {'since': 3}, [{'id': 1}] * 100)
+        response_archive.close()
+        # the process was killed in the middle of writing the last response.
+        with open(response_archive.path, 'r+b') as archive_file:
+            archive_file.truncate(flushed_size + 10)
+
+        with self.assertLogs('github_data.archive', 'WARNING'):
+            records: List[Dict] = self.read_records()
+        self.assertListEqual([record['query']['since'] for record in records], [0, 1, 2])
@@ -0,0 +1,114 @@
+from typing import Dict
+
+import aiohttp
+
+from django.test import TestCase
+
+from github_data.async_scraper import AsyncScraper
+from github_data.exceptions import RateLimitExceededError
+from github_data.models import GithubUser, GithubRepository
+from github_data.scraper_tool import Scraper
+from github_data.tests.github_stub import GithubStubServer
+
+
+class AsyncScraperTestCase(TestCase):
+    """
+    Tests for the asyncio Scraper tool, using a local stand-in for the GitHub API.
+    """
+    def setUp(self) -> None:
+        self.repositories_per_user: Dict[int, int] = {1: 3, 2: 0, 3: 5, 4: 1, 5: 2, 6: 4}
+
+    def test_scraping_users(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            scraper: AsyncScraper = AsyncScraper(users_page_size=4, repositories_page_size=2, api_host=stub.api_host)
+            scraper.scrape_users(since=0, number_of_users=6, number_of_repositories=0)
+
+        self.assertEqual(GithubUser.objects.count(), 6)
+        self.assertEqual(GithubRepository.objects.count(), 15)
+        self.assertEqual(GithubRepository.objects.filter(owner_id=3).count(), 5)
+        self.assertEqual(scraper.users_processed, 6)
+        self.assertEqual(scraper.repositories_added, 15)
+
+    def test_scraping_individual_users(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            scraper: AsyncScraper = AsyncScraper(repositories_page_size=2, api_host=stub.api_host)
+            scraper.scrape_individual_users(['user-6', 'user-2'], number_of_repositories=3)
+
+        self.assertEqual(GithubRepository.objects.filter(owner_id=6).count(), 3)
+        self.assertTrue(GithubUser.objects.filter(login='user-2').exists())
+        self.assertEqual(scraper.users_added, 2)
+
+    def test_individual_users_are_written_in_batches(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            scraper: AsyncScraper = AsyncScraper(users_page_size=2, api_host=stub.api_host)
+            scraper.scrape_individual_users(['user-1', 'missing', 'user-3', 'user-4', 'user-5'])
+
+        # the user that doesn't exist is skipped instead of stopping the run.
+        self.assertListEqual(
+            list(GithubUser.objects.values_list('login', flat=True)), ['user-1', 'user-3', 'user-4', 'user-5']
+        )
+        self.assertEqual((scraper.users_processed, scraper.users_added), (5, 4))
+        self.assertEqual(scraper.metrics.snapshot()['db_writes']['count'], 3)
+
+    def test_rate_limit_stops_individual_users(self) -> None:
+        with GithubStubServer(self.repositories_per_user, rate_limited_login='user-3') as stub:
+            scraper: AsyncScraper = AsyncScraper(users_page_size=2, api_host=stub.api_host)
+            with self.assertRaises(RateLimitExceededError):
+                scraper.scrape_individual_users(['user-1', 'user-2', 'user-3', 'user-4', 'user-5', 'user-6'])
+
+        # the batches after the one that hit the rate limit are never fetched.
+        self.assertListEqual(list(GithubUser.objects.values_list('login', flat=True)), ['user-1', 'user-2'])
+        self.assertFalse(any(request.startswith('/users/user-5') for request in stub.requests))
+
+    def test_secondary_rate_limit_is_retried(self) -> None:
+        with GithubStubServer(self.repositories_per_user, secondary_limited_requests=3, retry_after=0) as stub:
+            scraper: AsyncScraper = AsyncScraper(api_host=stub.api_host)
+            scraper.scrape_individual_users(['user-1'])
+
+        self.assertEqual(GithubRepository.objects.filter(owner_id=1).count(), 3)
+        self.assertEqual(len(stub.requests), 5)
+        self.assertIn('secondary_rate_limit', scraper.metrics.snapshot()['sleep_seconds'])
+
+    def test_secondary_rate_limit_retries_are_capped(self) -> None:
+        with GithubStubServer(self.repositories_per_user, secondary_limited_requests=100, retry_after=0) as stub:
+            scraper: AsyncScraper = AsyncScraper(api_host=stub.api_host)
+            scraper.api.secondary_limit_retries = 2
+            with self.assertRaises(RateLimitExceededError):
+                scraper.scrape_individual_users(['user-1'])
+
+        self.assertEqual(len(stub.requests), 3)
+
+    def test_forbidden_requests_are_not_retried(self) -> None:
+        with GithubStubServer(self.repositories_per_user, forbidden_login='user-1') as stub:
+            scraper: AsyncScraper = AsyncScraper(api_host=stub.api_host)
+            with self.assertRaises(aiohttp.ClientResponseError) as context:
+                scraper.scrape_individual_users(['user-1'])
+
+        self.assertEqual(context.exception.status, 403)
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_same_results_as_synchronous_scraper(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            scraper: Scraper = Scraper(users_page_size=4, repositories_page_size=2, api_host=stub.api_host)
+            scraper.scrape_users(since=1, number_of_users=4, number_of_repositories=2)
+            synchronous_requests: int = len(stub.requests)
+            GithubUser.objects.all().delete()
+
+            async_scraper: AsyncScraper = AsyncScraper(
+                users_page_size=4, repositories_page_size=2, api_host=stub.api_host
+            )
+            async_scraper.scrape_users(since=1, number_of_users=4, number_of_repositories=2)
+
+        self.assertEqual(len(stub.requests) - synchronous_requests, synchronous_requests)
+        self.assertEqual(async_scraper.users_added, scraper.users_added)
+        self.assertEqual(async_scraper.repositories_added, scraper.repositories_added)
+
+    def test_rate_limit_keeps_last_completed_user(self) -> None:
+        with GithubStubServer(self.repositories_per_user, rate_limited_login='user-3') as stub:
+            scraper: AsyncScraper = AsyncScraper(users_page_size=6, api_host=stub.api_host)
+            with self.assertRaises(RateLimitExceededError) as context:
+                scraper.scrape_users(since=0, number_of_users=6)
+
+        self.assertEqual(context.exception.last_id, 2)
+        self.assertEqual(scraper.users_processed, 2)
+        self.assertFalse(GithubUser.objects.filter(id=3).exists())
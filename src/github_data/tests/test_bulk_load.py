@@ -0,0 +1,101 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.db.models import Field
+from django.test import SimpleTestCase, TestCase
+
+from github_data.bulk_load import bulk_load, csv_rows, merge_statement
+from github_data.models import GithubUser, GithubRepository
+from github_data.tests.test_ingest import repository_data, user_data
+
+
+class BulkLoadTestCase(TestCase):
+    """
+    Tests for the raw bulk statements that merge rows into the database, with executemany on SQLite.
+    """
+    def test_insert_and_update_counts(self) -> None:
+        GithubUser.objects.create(**user_data(1))
+        GithubUser.objects.create(**user_data(2))
+        users: List[GithubUser] = [
+            GithubUser(**user_data(1)), GithubUser(**user_data(2, 'renamed-2')), GithubUser(**user_data(3))
+        ]
+
+        self.assertTupleEqual(bulk_load(GithubUser, users, ['login', 'url'], timestamp_field='scraped_at'), (1, 1))
+        self.assertListEqual(
+            list(GithubUser.objects.values_list('login', flat=True)), ['user-1', 'renamed-2', 'user-3']
+        )
+        # only the rows inserted or updated get the time they were written.
+        self.assertIsNone(GithubUser.objects.get(id=1).scraped_at)
+        self.assertIsNotNone(GithubUser.objects.get(id=3).scraped_at)
+
+    def test_stored_values_are_kept(self) -> None:
+        GithubUser.objects.create(**user_data(1), updated_at='2021-01-01T00:00:00Z')
+
+        bulk_load(GithubUser, [GithubUser(**user_data(1, 'renamed-1'))], ['login', 'url', 'updated_at'],
+                  keep_stored_fields=['updated_at'])
+
+        user: GithubUser = GithubUser.objects.get(id=1)
+        self.assertEqual(user.login, 'renamed-1')
+        self.assertIsNotNone(user.updated_at)
+
+    def test_unique_conflicts_are_rejected(self) -> None:
+        GithubUser.objects.create(**user_data(1))
+
+        with self.assertRaises(IntegrityError):
+            bulk_load(GithubUser, [GithubUser(**user_data(2, 'user-1'))], ['login', 'url'])
+        self.assertEqual(GithubUser.objects.count(), 1)
+
+
+class MergeStatementTestCase(SimpleTestCase):
+    """
+    Tests for the SQL of the merge of PostgreSQL, which can't run against the test database.
+    """
+    def test_postgresql_merge(self) -> None:
+        columns: List[Field] = [GithubUser._meta.get_field(field) for field in ('id', 'login', 'updated_at')]
+        statement: str = merge_statement(
+            GithubUser, columns, columns[1:], ['updated_at'], source='SELECT * FROM "staging"', vendor='postgresql'
+        )
+
+        self.assertIn('ON CONFLICT ("github_id") DO UPDATE SET', statement)
+        self.assertIn('"updated_at" = COALESCE(EXCLUDED."updated_at", "github_user"."updated_at")', statement)
+        self.assertIn('WHERE "github_user"."github_login" IS DISTINCT FROM EXCLUDED."github_login" OR ', statement)
+
+    def test_copy_rows_keep_empty_strings(self) -> None:
+        self.assertEqual(csv_rows([[1, 'a "b"', None, '']]).read(), '"1","a ""b""",,""\n')
+
+
+class ImportDataCommandTestCase(TestCase):
+    """
+    Tests for the import_data command that loads newline-delimited JSON files into the database.
+    """
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name: str, records: List[Dict]) -> str:
+        path: Path = Path(self.directory.name) / name
+        with (gzip.open(path, 'wt') if name.endswith('.gz') else open(path, 'w')) as data_file:
+            data_file.writelines(json.dumps(record) + '\n' for record in records)
+        return str(path)
+
+    def test_import_users_and_repositories(self) -> None:
+        users: str = self.write_file('users.ndjson', [user_data(user_id) for user_id in range(1, 6)])
+        repositories: str = self.write_file('repositories.ndjson.gz', [
+            repository_data(repository_id, user_data(repository_id % 7 + 1)) for repository_id in range(1, 11)
+        ])
+
+        call_command('import_data', 'users', users, batch_size=2)
+        call_command('import_data', 'repositories', repositories, batch_size=3)
+
+        self.assertEqual(GithubUser.objects.count(), 7)
+        self.assertEqual(GithubRepository.objects.count(), 10)
+        self.assertEqual(GithubRepository.objects.get(id=6).owner.login, 'user-7')
+
+    def test_unreadable_file(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'users', f'{self.directory.name}/missing.ndjson')
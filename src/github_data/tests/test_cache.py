@@ -0,0 +1,119 @@
+import json
+import tempfile
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from github_data.cache import CacheStats
+from github_data.ingest import ingest_repositories, ingest_users
+from github_data.models import DatasetVersion, GithubUser
+from github_data.tests.test_ingest import repository_data, user_data
+
+
+class ResponseCacheTestCase(APITestCase):
+    """
+    Tests for the cache of the API responses, keyed on the version of the scraped data.
+    """
+    @classmethod
+    def setUpTestData(cls) -> None:
+        for user_id in range(1, 4):
+            GithubUser.objects.create(**user_data(user_id))
+
+    def setUp(self) -> None:
+        caches[settings.API_CACHE_ALIAS].clear()
+        self.stats: CacheStats = CacheStats()
+        stats_patch = mock.patch('github_data.cache.api_cache_stats', self.stats)
+        stats_patch.start()
+        self.addCleanup(stats_patch.stop)
+
+    def get(self, url: str) -> HttpResponse:
+        return self.client.get(url, HTTP_ACCEPT='application/json')
+
+    def test_responses_are_cached_until_the_version_changes(self) -> None:
+        url: str = f'{reverse("user-list")}?per_page=2'
+        first: HttpResponse = self.get(url)
+        with self.assertNumQueries(0):
+            cached: HttpResponse = self.get(url)
+        GithubUser.objects.filter(id=1).update(login='renamed-1')
+        stale: HttpResponse = self.get(url)
+        DatasetVersion.bump()
+        current: HttpResponse = self.get(url)
+
+        self.assertListEqual([first['X-Cache'], cached['X-Cache'], stale['X-Cache'], current['X-Cache']],
+                             ['MISS', 'HIT', 'HIT', 'MISS'])
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['Link'], first['Link'])
+        self.assertEqual(cached['Content-Type'], first['Content-Type'])
+        self.assertEqual(current.json()[0]['login'], 'renamed-1')
+        self.assertDictEqual(self.stats.snapshot(), {'hits': 2, 'misses': 2})
+
+    def test_renderers_are_cached_apart(self) -> None:
+        url: str = reverse('user-detail', kwargs={'login': 'user-1'})
+        self.get(url)
+        response: HttpResponse = self.client.get(url, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    def test_errors_are_not_cached(self) -> None:
+        url: str = reverse('user-detail', kwargs={'login': 'missing'})
+        responses: List[HttpResponse] = [self.get(url), self.get(url)]
+
+        self.assertListEqual([response.status_code for response in responses], [status.HTTP_404_NOT_FOUND] * 2)
+        self.assertListEqual([response['X-Cache'] for response in responses], ['MISS', 'MISS'])
+
+    def test_cache_stats_metrics(self) -> None:
+        self.get(reverse('api-root'))
+        self.get(reverse('api-root'))
+        with mock.patch('github_data.views.api_cache_stats', self.stats):
+            text: str = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('github_scraper_api_cache_hits_total 1', text)
+        self.assertIn('github_scraper_api_cache_misses_total 1', text)
+
+
+class DatasetVersionTestCase(APITransactionTestCase):
+    """
+    Tests for the version of the scraped data, bumped when the transactions that write it are committed.
+    """
+    def test_writes_bump_the_version(self) -> None:
+        version: int = DatasetVersion.current()
+        ingest_users([user_data(1), user_data(2)])
+        self.assertEqual(DatasetVersion.current(), version + 1)
+
+        ingest_users([user_data(1), user_data(2)])
+        self.assertEqual(DatasetVersion.current(), version + 1)
+
+    def test_cached_version_is_dropped_by_bumps(self) -> None:
+        caches[settings.API_CACHE_ALIAS].clear()
+        version: int = DatasetVersion.cached()
+        with self.assertNumQueries(0):
+            self.assertEqual(DatasetVersion.cached(), version)
+        DatasetVersion.bump()
+        self.assertEqual(DatasetVersion.cached(), version + 1)
+
+    def test_transactions_bump_the_version_once(self) -> None:
+        version: int = DatasetVersion.current()
+        with transaction.atomic():
+            ingest_users([user_data(1)])
+            ingest_repositories([repository_data(1, user_data(2)), repository_data(2, user_data(3))])
+            self.assertEqual(DatasetVersion.current(), version)
+        self.assertEqual(DatasetVersion.current(), version + 1)
+
+    def test_imports_bump_the_version_once_per_batch(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path: Path = Path(directory) / 'users.ndjson'
+            path.write_text(''.join(json.dumps(user_data(user_id)) + '\n' for user_id in range(1, 6)))
+            version: int = DatasetVersion.current()
+            call_command('import_data', 'users', str(path), batch_size=2)
+
+        self.assertEqual(DatasetVersion.current(), version + 3)
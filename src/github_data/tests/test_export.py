@@ -0,0 +1,77 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from github_data.export import export_ndjson, ndjson_chunks
+from github_data.models import GithubUser, GithubRepository
+
+
+class ExportTestCase(APITestCase):
+    """
+    Tests for the streaming newline-delimited JSON export of the users and repositories.
+    """
+    @classmethod
+    def setUpTestData(cls) -> None:
+        for user_id in range(1, 4):
+            GithubUser.objects.create(id=user_id, login=f'user-{user_id}', url='https://api.github.com/users/_')
+        for repository_id in range(1, 6):
+            GithubRepository.objects.create(
+                id=repository_id, owner_id=repository_id % 3 + 1, name=f'repo-{repository_id}',
+                full_name=f'user-{repository_id % 3 + 1}/repo-{repository_id}', url='https://api.github.com/repos/_'
+            )
+
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_users_export(self) -> None:
+        with self.assertNumQueries(1):
+            response: StreamingHttpResponse = self.client.get(reverse('export-users'))
+            content: bytes = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        users: List[Dict] = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertListEqual([user['login'] for user in users], ['user-1', 'user-2', 'user-3'])
+
+    def test_gzip_repositories_export(self) -> None:
+        with self.assertNumQueries(1):
+            response: StreamingHttpResponse = self.client.get(reverse('export-repositories'),
+                                                              HTTP_ACCEPT_ENCODING='gzip, deflate')
+            content: bytes = gzip.decompress(b''.join(response.streaming_content))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        repositories: List[Dict] = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertListEqual([repository['id'] for repository in repositories], [1, 2, 3, 4, 5])
+        self.assertDictEqual(repositories[0]['owner'],
+                             {'id': 2, 'login': 'user-2', 'url': 'https://api.github.com/users/_'})
+
+    def test_rows_are_encoded_in_chunks(self) -> None:
+        chunks: List[bytes] = list(ndjson_chunks(({'id': row_id} for row_id in range(5)), chunk_size=2))
+        self.assertListEqual([chunk.count(b'\n') for chunk in chunks], [2, 2, 1])
+        self.assertEqual(gzip.decompress(b''.join(export_ndjson('users', compress=True))).count(b'\n'), 3)
+
+    def test_export_command_output_can_be_imported(self) -> None:
+        users: str = str(Path(self.directory.name) / 'users.ndjson.gz')
+        repositories: str = str(Path(self.directory.name) / 'repos.ndjson')
+        call_command('export_data', 'users', output=users)
+        call_command('export_data', 'repositories', output=repositories)
+        exported: List[Dict] = list(GithubRepository.objects.values('id', 'owner_id', 'full_name', 'name', 'url'))
+        GithubRepository.objects.all().delete()
+        GithubUser.objects.all().delete()
+
+        call_command('import_data', 'users', users)
+        call_command('import_data', 'repositories', repositories)
+
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertListEqual(
+            list(GithubRepository.objects.values('id', 'owner_id', 'full_name', 'name', 'url')), exported
+        )
@@ -0,0 +1,304 @@
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+from urllib.error import HTTPError
+
+from django.test import TestCase, TransactionTestCase
+
+from github_data.exceptions import RateLimitExceededError
+from github_data.github_api import (
+    GRAPHQL_RESOURCE, ResponseCache, ScraperApi, NotModifiedPage, RateLimitGovernor, TokenPool, is_not_modified,
+    is_secondary_rate_limited, shard_cache_path
+)
+from github_data.models import GithubUser, GithubRepository
+from github_data.scraper_tool import Scraper
+from github_data.tests.github_stub import GithubStubServer
+
+
+class ResponseCacheTestCase(TestCase):
+    """
+    Tests for the conditional requests of the GitHub API client with a response cache.
+    """
+    def setUp(self) -> None:
+        self.repositories_per_user: Dict[int, int] = {1: 3, 2: 0, 3: 5}
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.cache_path: Path = Path(self.directory.name) / 'responses.json'
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_not_modified_page(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host, response_cache=ResponseCache())
+            first_page = api.users.list(0, per_page=2)
+            second_page = api.users.list(0, per_page=2)
+
+        self.assertFalse(is_not_modified(first_page))
+        self.assertIsInstance(second_page, NotModifiedPage)
+        self.assertListEqual([user.login for user in second_page], ['user-1', 'user-2'])
+        self.assertEqual((api.response_cache.hits, api.response_cache.misses), (1, 1))
+
+    def test_updates_are_appended_and_compacted_on_close(self) -> None:
+        response_cache: ResponseCache = ResponseCache(self.cache_path, flush_interval=2)
+        response_cache.set('/users/user-1', {'etag': '"1"'})
+        response_cache.set('/users/user-2', {'etag': '"2"'})
+        response_cache.set('/users/user-1', {'etag': '"3"'})
+        response_cache.flush()
+
+        # every update is a line, the last one of a url wins.
+        self.assertEqual(len(self.cache_path.read_text().splitlines()), 3)
+        self.assertDictEqual(ResponseCache(self.cache_path).get('/users/user-1'), {'etag': '"3"'})
+        response_cache.close()
+        self.assertEqual(len(self.cache_path.read_text().splitlines()), 2)
+        self.assertDictEqual(ResponseCache(self.cache_path).get('/users/user-1'), {'etag': '"3"'})
+
+    def test_undecodable_lines_are_skipped(self) -> None:
+        # a cache saved as a single JSON object, an appended line, and the partial line of a run that was killed.
+        self.cache_path.write_text(
+            '{"/users/user-1": {"etag": "\\"1\\""}}\n["/users/user-2", {"etag": "\\"2\\""}]\n["/us'
+        )
+
+        response_cache: ResponseCache = ResponseCache(self.cache_path)
+        response_cache.set('/users/user-3', {'etag': '"3"'})
+        response_cache.flush()
+
+        self.assertEqual(len(ResponseCache(self.cache_path).entries), 3)
+
+    def test_shard_caches_are_merged(self) -> None:
+        shared_cache: ResponseCache = ResponseCache(self.cache_path)
+        shared_cache.set('/users/user-1', {'etag': '"1"'})
+        shared_cache.close()
+
+        # each shard starts from the shared entries, but only writes its own file.
+        shard_caches: Dict[int, ResponseCache] = {
+            shard_id: ResponseCache(shard_cache_path(self.cache_path, shard_id), shared_path=self.cache_path)
+            for shard_id in (1, 2)
+        }
+        for shard_id, shard_cache in shard_caches.items():
+            self.assertDictEqual(shard_cache.get('/users/user-1'), {'etag': '"1"'})
+            shard_cache.set(f'/users/user-{shard_id + 1}', {'etag': f'"{shard_id + 1}"'})
+            shard_cache.close()
+        self.assertEqual(len(self.cache_path.read_text().splitlines()), 1)
+
+        merged_cache: ResponseCache = ResponseCache(self.cache_path)
+        for shard_id in shard_caches:
+            merged_cache.merge(shard_cache_path(self.cache_path, shard_id))
+        merged_cache.close()
+
+        self.assertSetEqual(
+            set(ResponseCache(self.cache_path).entries), {'/users/user-1', '/users/user-2', '/users/user-3'}
+        )
+        self.assertFalse(any(shard_cache.path.exists() for shard_cache in shard_caches.values()))
+
+
+class ResponseCacheScrapeTestCase(TransactionTestCase):
+    """
+    Tests for the response cache of scrapes, whose entries are set once the users fetched from them are committed.
+    """
+    def setUp(self) -> None:
+        self.repositories_per_user: Dict[int, int] = {1: 3, 2: 0, 3: 5}
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache_path: Path = Path(self.directory.name) / 'responses.json'
+
+    def test_unchanged_pages_are_not_written_again(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            first_scraper: Scraper = Scraper(
+                users_page_size=2, repositories_page_size=2, api_host=stub.api_host,
+                response_cache=ResponseCache(self.cache_path)
+            )
+            first_scraper.scrape_users(since=0, number_of_users=3)
+            first_scraper.api.response_cache.flush()
+            GithubRepository.objects.filter(owner_id=3).update(description='written by the first scrape')
+
+            # a new run loads the validators saved by the first one.
+            second_scraper: Scraper = Scraper(
+                users_page_size=2, repositories_page_size=2, api_host=stub.api_host,
+                response_cache=ResponseCache(self.cache_path)
+            )
+            second_scraper.scrape_users(since=0, number_of_users=3)
+
+        self.assertEqual(first_scraper.repositories_added, 8)
+        self.assertEqual(second_scraper.api.response_cache.misses, 0)
+        self.assertEqual(second_scraper.api.response_cache.hits, first_scraper.api.response_cache.misses)
+        self.assertEqual(second_scraper.users_processed, 3)
+        self.assertEqual(second_scraper.repositories_processed, 0)
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertEqual(
+            GithubRepository.objects.filter(description='written by the first scrape').count(), 5
+        )
+
+    def test_resuming_at_a_page_boundary(self) -> None:
+        with GithubStubServer({user_id: 0 for user_id in range(1, 9)}, token_budgets={'first': 7}) as stub:
+            # the budget runs out right after the third page of users, before the repositories of its users.
+            first_scraper: Scraper = Scraper(
+                token='first', users_page_size=2, api_host=stub.api_host, response_cache=ResponseCache(self.cache_path)
+            )
+            with self.assertRaises(RateLimitExceededError) as context:
+                first_scraper.scrape_users(since=0, number_of_users=8)
+            first_scraper.api.response_cache.close()
+
+            second_scraper: Scraper = Scraper(
+                token='second', users_page_size=2, api_host=stub.api_host,
+                response_cache=ResponseCache(self.cache_path)
+            )
+            second_scraper.scrape_users(since=context.exception.last_id, number_of_users=4)
+
+        # the page of users that was never written wasn't cached, so its users are written by the resumed run.
+        self.assertEqual(context.exception.last_id, 4)
+        self.assertListEqual(list(GithubUser.objects.values_list('id', flat=True)), list(range(1, 9)))
+        self.assertEqual(second_scraper.users_added, 4)
+
+
+class TokenPoolTestCase(TestCase):
+    """
+    Tests for the rotation of GitHub OAuth tokens by rate limit budget.
+    """
+    def test_token_with_most_budget_is_used(self) -> None:
+        token_pool: TokenPool = TokenPool(['first', 'second'])
+        token_pool.update('first', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(time.time() + 60)})
+
+        self.assertEqual(token_pool.acquire('/users'), 'second')
+        token_pool.update('second', {'X-RateLimit-Remaining': '3', 'X-RateLimit-Reset': str(time.time() + 60)})
+        self.assertEqual(token_pool.acquire('/users'), 'first')
+
+    def test_budget_is_restored_after_reset(self) -> None:
+        token_pool: TokenPool = TokenPool(['first'])
+        token_pool.update('first', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() - 1)})
+        self.assertEqual(token_pool.acquire('/users'), 'first')
+
+    def test_graphql_budget_is_tracked_separately(self) -> None:
+        token_pool: TokenPool = TokenPool(['first', 'second'])
+        token_pool.update('first', {
+            'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 60), 'X-RateLimit-Resource': 'graphql'
+        })
+        token_pool.update('second', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(time.time() + 60)})
+
+        self.assertEqual(token_pool.acquire('/users'), 'first')
+        self.assertEqual(token_pool.acquire('/graphql', GRAPHQL_RESOURCE), 'second')
+        # the first token only ran out of its graphql budget.
+        self.assertEqual(token_pool.budget(time.time(), GRAPHQL_RESOURCE)[0], 5000)
+        self.assertEqual(token_pool.budget(time.time())[0], 5010)
+
+    def test_exhausted_pool(self) -> None:
+        token_pool: TokenPool = TokenPool(['first', 'second'])
+        reset: int = int(time.time()) + 120
+        token_pool.update('first', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset + 60)})
+        token_pool.update('second', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+
+        with self.assertRaises(RateLimitExceededError) as context:
+            token_pool.acquire('/users')
+        self.assertLessEqual(context.exception.limit_reset_seconds, 120)
+
+    def test_scraping_with_token_rotation(self) -> None:
+        budgets: Dict[str, int] = {'small': 2, 'big': 100}
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets=budgets) as stub:
+            scraper: Scraper = Scraper(tokens=list(budgets), repositories_page_size=2, api_host=stub.api_host)
+            scraper.scrape_users(since=0, number_of_users=3)
+
+        self.assertEqual(GithubRepository.objects.count(), 8)
+        # both tokens were used, the small one only while it had more budget left than the big one.
+        self.assertEqual(stub.token_budgets['small'], 1)
+        self.assertEqual(stub.token_budgets['big'], 100 - len(stub.requests) + 1)
+
+    def test_scraping_stops_when_every_token_is_exhausted(self) -> None:
+        budgets: Dict[str, int] = {'first': 2, 'second': 3}
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets=budgets) as stub:
+            scraper: Scraper = Scraper(tokens=list(budgets), repositories_page_size=2, api_host=stub.api_host)
+            with self.assertRaises(RateLimitExceededError) as context:
+                scraper.scrape_users(since=0, number_of_users=3)
+
+        # the users page, the 2 pages of user-1, user-2's page and the first page of user-3.
+        # the pool stops before sending requests it knows will be rejected.
+        self.assertEqual(context.exception.last_id, 2)
+        self.assertEqual(len(stub.requests), 5)
+        self.assertLessEqual(context.exception.limit_reset_seconds, 60)
+
+
+class SecondaryRateLimitTestCase(TestCase):
+    """
+    Tests for the retries of the requests rejected by a secondary rate limit, while the token still has budget left.
+    """
+    def test_requests_are_retried_after_retry_after(self) -> None:
+        with GithubStubServer({1: 0}, secondary_limited_requests=2, retry_after=0) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host)
+            user = api.users.get_by_username('user-1')
+
+        self.assertEqual(user.login, 'user-1')
+        self.assertEqual(len(stub.requests), 3)
+        self.assertDictEqual(api.metrics.snapshot()['sleep_seconds'], {'secondary_rate_limit': 0})
+
+    def test_requests_back_off_without_retry_after(self) -> None:
+        with GithubStubServer({1: 0}, secondary_limited_requests=2) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host, secondary_limit_backoff=0.01)
+            api.users.get_by_username('user-1')
+
+        # the backoff is doubled on every retry.
+        self.assertAlmostEqual(api.metrics.snapshot()['sleep_seconds']['secondary_rate_limit'], 0.03)
+
+    def test_retries_are_capped(self) -> None:
+        with GithubStubServer({1: 0}, secondary_limited_requests=100, retry_after=0) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host, secondary_limit_retries=3)
+            with self.assertRaises(RateLimitExceededError) as context:
+                api.users.get_by_username('user-1')
+
+        self.assertEqual(len(stub.requests), 4)
+        self.assertEqual(context.exception.code, 429)
+        # the token was not taken as exhausted, it still has budget left.
+        self.assertEqual(api.token_pool.budget(time.time())[0], 4999)
+
+    def test_forbidden_requests_are_not_retried(self) -> None:
+        with GithubStubServer({1: 0}, forbidden_login='user-1') as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host)
+            with self.assertRaises(HTTPError) as context:
+                api.users.get_by_username('user-1')
+
+        self.assertNotIsInstance(context.exception, RateLimitExceededError)
+        self.assertEqual(context.exception.code, 403)
+        self.assertEqual(len(stub.requests), 1)
+        self.assertDictEqual(api.metrics.snapshot()['sleep_seconds'], {})
+
+    def test_secondary_limited_forbidden_responses(self) -> None:
+        headers: Dict[str, str] = {'X-RateLimit-Remaining': '4000'}
+        self.assertFalse(is_secondary_rate_limited(403, headers, '{"message": "Repository access blocked"}'))
+        self.assertTrue(is_secondary_rate_limited(403, {**headers, 'Retry-After': '30'}))
+        self.assertTrue(is_secondary_rate_limited(403, headers, 'You have exceeded a Secondary Rate Limit'))
+        self.assertFalse(is_secondary_rate_limited(403, {'X-RateLimit-Remaining': '0', 'Retry-After': '30'}))
+
+
+class RateLimitGovernorTestCase(TestCase):
+    """
+    Tests for the pacing of requests by the rate limit budget left.
+    """
+    def test_requests_are_not_paced_with_budget_left(self) -> None:
+        token_pool: TokenPool = TokenPool(['first'])
+        token_pool.update('first', {'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': str(time.time() + 100)})
+        governor: RateLimitGovernor = RateLimitGovernor(token_pool)
+
+        self.assertListEqual([governor.reserve() for _ in range(3)], [0, 0, 0])
+
+    def test_budget_left_is_spread_until_reset(self) -> None:
+        token_pool: TokenPool = TokenPool(['first'])
+        token_pool.update('first', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(time.time() + 100)})
+        governor: RateLimitGovernor = RateLimitGovernor(token_pool)
+
+        self.assertEqual(governor.reserve(), 0)
+        self.assertAlmostEqual(governor.reserve(), 10, delta=0.5)
+        self.assertAlmostEqual(governor.reserve(), 20, delta=0.5)
+        self.assertAlmostEqual(governor.waited, 30, delta=1)
+
+    def test_budget_of_every_token_is_paced(self) -> None:
+        token_pool: TokenPool = TokenPool(['first', 'second'])
+        for token in ['first', 'second']:
+            token_pool.update(token, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(time.time() + 100)})
+        governor: RateLimitGovernor = RateLimitGovernor(token_pool)
+
+        governor.reserve()
+        self.assertAlmostEqual(governor.reserve(), 5, delta=0.5)
+
+    def test_exhausted_budget_is_not_paced(self) -> None:
+        token_pool: TokenPool = TokenPool([None])
+        token_pool.update(None, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 100)})
+
+        self.assertEqual(RateLimitGovernor(token_pool).reserve(), 0)
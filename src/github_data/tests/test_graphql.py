@@ -0,0 +1,104 @@
+import time
+from typing import Dict, List
+
+from django.test import TestCase
+
+from github_data.exceptions import GraphQLQueryError, RateLimitExceededError
+from github_data.github_api import GRAPHQL_RESOURCE
+from github_data.graphql import build_users_query
+from github_data.models import GithubUser, GithubRepository
+from github_data.scraper_tool import Scraper
+from github_data.tests.github_stub import GithubStubServer, load_graphql_responses
+
+
+class GraphQLBackendTestCase(TestCase):
+    """
+    Tests for the GraphQL fetch backend of the Scraper, against recorded GraphQL responses.
+    """
+    def setUp(self) -> None:
+        self.repositories_per_user: Dict[int, int] = {1: 3, 2: 0}
+        self.graphql_responses: List[Dict] = load_graphql_responses()
+
+    def create_scraper(self, stub: GithubStubServer, **kwargs) -> Scraper:
+        return Scraper(
+            token='token', repositories_page_size=2, api_host=stub.api_host, backend=Scraper.GRAPHQL_BACKEND, **kwargs
+        )
+
+    def test_users_query(self) -> None:
+        query: str = build_users_query(2)
+
+        self.assertIn('query($first: Int!, $login0: String!, $after0: String, $login1: String!, $after1: String)',
+                      query)
+        self.assertIn('user0: user(login: $login0)', query)
+        self.assertIn('user1: user(login: $login1)', query)
+        self.assertNotIn('user2', query)
+
+    def test_individual_users(self) -> None:
+        with GithubStubServer(self.repositories_per_user, graphql_responses=self.graphql_responses) as stub:
+            scraper: Scraper = self.create_scraper(stub)
+            scraper.scrape_individual_users(['user-1', 'user-2', 'missing'])
+
+        # one query for the batch of users, and one for the last repository of user-1.
+        self.assertListEqual(stub.requests, ['POST /graphql', 'POST /graphql'])
+        self.assertListEqual(list(GithubUser.objects.values_list('login', flat=True)), ['user-1', 'user-2'])
+        self.assertListEqual(
+            list(GithubRepository.objects.values_list('id', 'full_name')),
+            [(1000, 'user-1/repo-0'), (1001, 'user-1/repo-1'), (1002, 'user-1/repo-2')]
+        )
+        self.assertEqual((scraper.users_processed, scraper.users_added, scraper.repositories_added), (3, 2, 3))
+
+    def test_individual_users_with_1_repository(self) -> None:
+        with GithubStubServer(self.repositories_per_user, graphql_responses=self.graphql_responses) as stub:
+            self.create_scraper(stub, users_page_size=3).scrape_individual_users(
+                ['user-1', 'user-2', 'missing'], number_of_repositories=2
+            )
+
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(GithubRepository.objects.count(), 2)
+
+    def test_users_range(self) -> None:
+        with GithubStubServer(self.repositories_per_user, graphql_responses=self.graphql_responses) as stub:
+            self.create_scraper(stub, users_page_size=2).scrape_users(since=0, number_of_users=2)
+
+        # the users are listed with the REST API, which the GraphQL API can't do by id.
+        self.assertListEqual(stub.requests, ['/users?since=0&per_page=2', 'POST /graphql', 'POST /graphql'])
+        self.assertEqual(GithubUser.objects.count(), 2)
+        self.assertEqual(GithubRepository.objects.filter(owner_id=1).count(), 3)
+
+    def test_rate_limited_query(self) -> None:
+        rate_limited: List[Dict] = [{
+            'variables': self.graphql_responses[1]['variables'],
+            'response': {'errors': [{'type': 'RATE_LIMITED', 'message': 'API rate limit exceeded'}]}
+        }]
+        with GithubStubServer(self.repositories_per_user, graphql_responses=rate_limited) as stub:
+            with self.assertRaises(RateLimitExceededError) as context:
+                self.create_scraper(stub, users_page_size=2).scrape_users(since=0, number_of_users=2)
+
+        # no user of the page was written, so the run resumes from the start of the page.
+        self.assertEqual(context.exception.last_id, 0)
+        self.assertEqual(GithubUser.objects.count(), 0)
+        # the reset time comes from the headers of the rate limited response.
+        self.assertAlmostEqual(context.exception.limit_reset_seconds, 3600, delta=5)
+
+    def test_failed_query(self) -> None:
+        failed: List[Dict] = [{
+            'variables': self.graphql_responses[0]['variables'],
+            'response': {'data': None, 'errors': [{'type': 'SERVICE_UNAVAILABLE', 'message': 'Something went wrong'}]}
+        }]
+        with GithubStubServer(self.repositories_per_user, graphql_responses=failed) as stub:
+            scraper: Scraper = self.create_scraper(stub)
+            with self.assertRaises(GraphQLQueryError):
+                scraper.scrape_individual_users(['user-1', 'user-2', 'missing'])
+
+        # the users are not taken as missing, so they are not processed and a resumed run fetches them again.
+        self.assertEqual(scraper.users_processed, 0)
+        self.assertEqual(GithubUser.objects.count(), 0)
+
+    def test_graphql_budget_is_tracked(self) -> None:
+        with GithubStubServer(self.repositories_per_user, graphql_responses=self.graphql_responses) as stub:
+            scraper: Scraper = self.create_scraper(stub)
+            scraper.scrape_individual_users(['user-1', 'user-2', 'missing'])
+
+        self.assertEqual(scraper.api.token_pool.budget(time.time(), GRAPHQL_RESOURCE)[0], 4999)
+        # the REST API budget was not spent.
+        self.assertEqual(scraper.api.token_pool.budget(time.time())[0], 5000)
@@ -0,0 +1,236 @@
+import logging
+from typing import Callable, Dict, List
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.serializers import ModelSerializer
+
+from github_data.ingest import USER_FIELDS, IngestResult, OwnerCache, ingest_users, ingest_repositories, upsert
+from github_data.models import GithubUser, GithubRepository
+from github_data.serializers import GithubRepositorySerializer
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def user_data(user_id: int, login: str = None) -> Dict:
+    login = login or f'user-{user_id}'
+    return {'id': user_id, 'login': login, 'url': f'https://api.github.com/users/{login}'}
+
+
+def repository_data(repository_id: int, owner: Dict, name: str = None) -> Dict:
+    name = name or f'repo-{repository_id}'
+    return {
+        'id': repository_id, 'owner': owner, 'name': name, 'full_name': f'{owner["login"]}/{name}',
+        'description': None, 'url': f'https://api.github.com/repos/{owner["login"]}/{name}'
+    }
+
+
+class IngestUsersTestCase(TestCase):
+    """
+    Tests for the bulk ingest of GitHub User pages.
+    """
+    def test_insert_and_update_counts(self) -> None:
+        GithubUser.objects.create(**user_data(1))
+        GithubUser.objects.create(**user_data(2))
+        users: List[Dict] = [user_data(1), user_data(2, login='renamed'), user_data(3), user_data(4)]
+
+        self.assertEqual(ingest_users(users), IngestResult(added=2, updated=1))
+        self.assertEqual(GithubUser.objects.get(id=2).login, 'renamed')
+        self.assertEqual(GithubUser.objects.count(), 4)
+
+    def test_invalid_users_are_skipped(self) -> None:
+        users: List[Dict] = [user_data(1), {'id': 2, 'login': 'x' * 40, 'url': 'https://api.github.com/'},
+                             {'login': 'no-id', 'url': 'https://api.github.com/'}]
+
+        self.assertEqual(ingest_users(users), IngestResult(added=1, updated=0))
+        self.assertListEqual(list(GithubUser.objects.values_list('id', flat=True)), [1])
+
+    def test_timestamps_missing_from_summaries_are_kept(self) -> None:
+        ingest_users([{**user_data(1), 'updated_at': '2021-01-01T00:00:00Z'}])
+        scraped_at = GithubUser.objects.get(id=1).scraped_at
+
+        # the users list doesn't have updated_at, so the user didn't change.
+        self.assertEqual(ingest_users([user_data(1)]), IngestResult(added=0, updated=0))
+        self.assertEqual(GithubUser.objects.get(id=1).updated_at.year, 2021)
+        self.assertEqual(ingest_users([{**user_data(1), 'updated_at': '2022-01-01T00:00:00Z'}]).updated, 1)
+        self.assertGreater(GithubUser.objects.get(id=1).scraped_at, scraped_at)
+
+    def test_unique_login_conflicts_are_not_counted(self) -> None:
+        GithubUser.objects.create(**user_data(1, login='taken'))
+
+        self.assertEqual(ingest_users([user_data(2, login='taken')]), IngestResult(added=0, updated=0))
+        self.assertFalse(GithubUser.objects.filter(id=2).exists())
+
+
+class IngestRepositoriesTestCase(TestCase):
+    """
+    Tests for the bulk ingest of GitHub Repository pages.
+    """
+    def setUp(self) -> None:
+        self.owner: Dict = user_data(7)
+
+    def test_page_is_written_with_constant_queries(self) -> None:
+        repositories: List[Dict] = [repository_data(repository_id, self.owner) for repository_id in range(1, 101)]
+
+        # count and merge for the owner and for the repositories, plus the transaction savepoints.
+        with self.assertNumQueries(10):
+            result: IngestResult = ingest_repositories(repositories)
+
+        self.assertEqual(result, IngestResult(added=100, updated=0))
+        self.assertTrue(GithubUser.objects.filter(id=7).exists())
+        self.assertEqual(GithubRepository.objects.count(), 100)
+
+    def test_known_owners_are_not_queried(self) -> None:
+        owner_cache: OwnerCache = OwnerCache()
+        ingest_users([self.owner], owner_cache=owner_cache)
+        self.assertIn(7, owner_cache)
+
+        # only the count and merge for the repositories, plus the transaction savepoints.
+        with self.assertNumQueries(6):
+            ingest_repositories([repository_data(1, self.owner)], owner_cache=owner_cache)
+
+    def test_unknown_owners_are_cached(self) -> None:
+        owner_cache: OwnerCache = OwnerCache()
+        ingest_repositories([repository_data(1, self.owner), repository_data(2, user_data(8))], owner_cache=owner_cache)
+
+        self.assertIn(7, owner_cache)
+        self.assertIn(8, owner_cache)
+
+    def test_insert_and_update_counts(self) -> None:
+        ingest_repositories([repository_data(1, self.owner), repository_data(2, self.owner)])
+        repositories: List[Dict] = [
+            repository_data(1, self.owner), repository_data(2, self.owner, name='moved'), repository_data(3, self.owner)
+        ]
+
+        self.assertEqual(ingest_repositories(repositories), IngestResult(added=1, updated=1))
+        self.assertEqual(GithubRepository.objects.get(id=2).full_name, 'user-7/moved')
+
+    def test_invalid_repositories_are_skipped(self) -> None:
+        no_owner: Dict = repository_data(2, self.owner)
+        no_owner['owner'] = None
+        repositories: List[Dict] = [repository_data(1, self.owner), no_owner, repository_data(3, self.owner, 'x' * 101)]
+
+        self.assertEqual(ingest_repositories(repositories), IngestResult(added=1, updated=0))
+        self.assertEqual(GithubRepository.objects.count(), 1)
+
+
+class IngestBatchesTestCase(TestCase):
+    """
+    Tests for the batches of bulk statements of the ingest, and their fallback when the database rejects a row.
+    """
+    def test_rows_are_written_in_batches(self) -> None:
+        with CaptureQueriesContext(connection) as context:
+            result: IngestResult = ingest_users([user_data(user_id) for user_id in range(1, 11)], batch_size=3)
+
+        inserts: List[Dict] = [query for query in context.captured_queries if 'INSERT INTO' in query['sql']]
+        self.assertEqual(len(inserts), 4)
+        self.assertEqual(result, IngestResult(added=10, updated=0))
+
+    def test_rejected_batch_is_written_row_by_row(self) -> None:
+        for user_id in range(1, 4):
+            GithubUser.objects.create(**user_data(user_id))
+        users: Dict[int, GithubUser] = {
+            user_id: GithubUser(**user_data(user_id, login=f'renamed-{user_id}')) for user_id in range(1, 4)
+        }
+        # the objects skip the record validation, so the null login is only rejected by the database.
+        users[2].login = None
+
+        with self.assertLogs('github_data.ingest', level='WARNING'):
+            result: IngestResult = upsert(GithubUser, users, USER_FIELDS)
+
+        self.assertEqual(result, IngestResult(added=0, updated=2))
+        self.assertListEqual(
+            list(GithubUser.objects.values_list('login', flat=True)), ['renamed-1', 'user-2', 'renamed-3']
+        )
+
+
+def count_statements(function: Callable[[], None]) -> int:
+    """
+    Counts the SQL statements executed by a function, leaving out transaction savepoints.
+    """
+    with CaptureQueriesContext(connection) as context:
+        function()
+    return len([query for query in context.captured_queries if 'SAVEPOINT' not in query['sql']])
+
+
+class OwnerCacheTestCase(TestCase):
+    """
+    Tests for the bounded cache of user ids known to be in the database.
+    """
+    def test_least_recently_used_ids_are_evicted(self) -> None:
+        owner_cache: OwnerCache = OwnerCache(max_size=3)
+        owner_cache.update([1, 2, 3])
+        self.assertIn(1, owner_cache)
+        owner_cache.update([4])
+
+        self.assertEqual(len(owner_cache), 3)
+        self.assertNotIn(2, owner_cache)
+        self.assertIn(1, owner_cache)
+        self.assertIn(4, owner_cache)
+
+    def test_staged_ids(self) -> None:
+        owner_cache: OwnerCache = OwnerCache()
+        # the test transaction is never committed, so the ids stay staged.
+        ingest_users([user_data(1), user_data(2)], owner_cache=owner_cache)
+        self.assertIn(1, owner_cache)
+        self.assertEqual(len(owner_cache), 0)
+
+        owner_cache.commit()
+        self.assertEqual(len(owner_cache), 2)
+        owner_cache.stage([3])
+        owner_cache.discard()
+        self.assertNotIn(3, owner_cache)
+
+
+class OwnerCacheTransactionTestCase(TransactionTestCase):
+    """
+    Tests for the ids of the owner cache written by transactions that are committed.
+    """
+    def test_ids_are_cached_when_the_transaction_is_committed(self) -> None:
+        owner_cache: OwnerCache = OwnerCache()
+        with transaction.atomic():
+            ingest_repositories([repository_data(1, user_data(7))], owner_cache=owner_cache)
+            ingest_users([user_data(8)], owner_cache=owner_cache)
+            self.assertEqual(len(owner_cache), 0)
+
+        self.assertEqual(len(owner_cache), 2)
+        self.assertSetEqual(owner_cache.staged, set())
+
+    def test_ids_are_cached_right_away_without_a_transaction(self) -> None:
+        owner_cache: OwnerCache = OwnerCache()
+        ingest_users([user_data(1)], owner_cache=owner_cache)
+
+        self.assertEqual(len(owner_cache), 1)
+
+
+class IngestQueryCountTestCase(TestCase):
+    """
+    Compares the queries per row of the ModelSerializer ingest and the in-memory record validation ingest.
+    """
+    def test_queries_per_repository(self) -> None:
+        owner: Dict = user_data(7)
+        GithubUser.objects.create(**owner)
+        number_of_repositories: int = 50
+
+        def serializer_ingest() -> None:
+            for repository_id in range(number_of_repositories):
+                serializer: ModelSerializer = GithubRepositorySerializer(data=repository_data(repository_id, owner))
+                if serializer.is_valid():
+                    serializer.save()
+
+        def record_ingest() -> None:
+            ingest_repositories([
+                repository_data(repository_id, owner)
+                for repository_id in range(number_of_repositories, 2 * number_of_repositories)
+            ])
+
+        serializer_queries: float = count_statements(serializer_ingest) / number_of_repositories
+        record_queries: float = count_statements(record_ingest) / number_of_repositories
+        logger.info(f'queries per repository: {serializer_queries} with serializers, {record_queries} with records')
+
+        # unique validators for id and full_name, the owner check and the insert, for every row.
+        self.assertEqual(serializer_queries, 4)
+        # owner count and merge, and repository count and merge, for the whole page.
+        self.assertEqual(record_queries, 4 / number_of_repositories)
+        self.assertEqual(GithubRepository.objects.count(), 2 * number_of_repositories)
@@ -0,0 +1,113 @@
+import json
+import math
+from typing import Any, Dict, List
+
+from django.test import SimpleTestCase, TestCase
+
+from github_data.metrics import Histogram, ScraperMetrics, render_prometheus, summary_lines
+from github_data.models import ScrapeRun
+from github_data.scraper_tool import Scraper
+from github_data.tests.github_stub import GithubStubServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now: float = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MetricsTestCase(SimpleTestCase):
+    """
+    Tests for the histograms and the summaries of the scraper metrics.
+    """
+    def setUp(self) -> None:
+        self.clock: FakeClock = FakeClock()
+        self.metrics: ScraperMetrics = ScraperMetrics(clock=self.clock)
+
+    def test_histogram(self) -> None:
+        histogram: Histogram = Histogram([0.1, 1, 10])
+        for value in [0.05, 0.5, 0.7, 20]:
+            histogram.observe(value)
+
+        self.assertListEqual(histogram.counts, [1, 3, 3])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 21.25)
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.quantile(0.95), math.inf)
+        self.assertListEqual(Histogram.from_dict(histogram.to_dict()).counts, histogram.counts)
+
+    def test_writes_are_timed(self) -> None:
+        with self.metrics.time_write(30):
+            self.clock.now += 0.5
+        with self.assertRaises(ValueError):
+            with self.metrics.time_write(10):
+                raise ValueError('database error')
+        self.clock.now += 1.5
+
+        snapshot: Dict[str, Any] = self.metrics.snapshot()
+        # the rows of a write that failed were not written.
+        self.assertEqual(snapshot['rows_written'], 30)
+        self.assertEqual(snapshot['rows_per_second'], 15)
+        self.assertEqual(snapshot['db_writes']['count'], 1)
+        self.assertEqual(snapshot['db_writes']['sum'], 0.5)
+
+    def test_snapshot_is_json_serializable(self) -> None:
+        self.metrics.observe_request('GET /users', 0.2)
+        self.metrics.record_sleep('pacing', 1.5)
+        self.metrics.record_sleep('pacing', 0.5)
+        self.metrics.record_rate_limit(4000, 5000)
+
+        snapshot: Dict[str, Any] = json.loads(json.dumps(self.metrics.snapshot()))
+        self.assertEqual(snapshot['requests']['GET /users']['count'], 1)
+        self.assertDictEqual(snapshot['sleep_seconds'], {'pacing': 2.0})
+        self.assertDictEqual(snapshot['rate_limit'], {'remaining': 4000, 'limit': 5000})
+        lines: List[str] = summary_lines(snapshot)
+        self.assertIn('GET /users: 1 request(s), average 0.200s, p50 <= 0.25s, p95 <= 0.25s', lines)
+        self.assertIn('rate limit budget left: 4000/5000', lines)
+
+    def test_prometheus_text(self) -> None:
+        self.metrics.observe_request('GET /users/{username}/repos', 0.2)
+        self.metrics.record_sleep('rate_limit_reset', 60)
+        text: str = render_prometheus([({'run': 1}, self.metrics.snapshot()), ({'run': 2}, self.metrics.snapshot())])
+
+        self.assertEqual(text.count('# TYPE github_scraper_request_duration_seconds histogram'), 1)
+        self.assertIn(
+            'github_scraper_request_duration_seconds_bucket'
+            '{run="1",endpoint="GET /users/{username}/repos",le="0.25"} 1', text
+        )
+        self.assertIn(
+            'github_scraper_request_duration_seconds_bucket'
+            '{run="2",endpoint="GET /users/{username}/repos",le="+Inf"} 1', text
+        )
+        self.assertIn('github_scraper_sleep_seconds_total{run="1",reason="rate_limit_reset"} 60', text)
+        self.assertIn('github_scraper_rows_written_total{run="2"} 0', text)
+        # there's no budget to report before the first response.
+        self.assertNotIn('github_scraper_rate_limit_remaining', text)
+
+
+class ScraperMetricsTestCase(TestCase):
+    """
+    Tests for the metrics recorded by the Scraper, using an in-memory GitHub API.
+    """
+    def test_scrape_is_instrumented(self) -> None:
+        scrape_run: ScrapeRun = ScrapeRun.objects.create(mode=ScrapeRun.RANGE)
+        with GithubStubServer({1: 3, 2: 0, 3: 1}) as stub:
+            scraper: Scraper = Scraper(
+                users_page_size=1, repositories_page_size=2, api_host=stub.api_host, scrape_run=scrape_run
+            )
+            scraper.scrape_users(since=0, number_of_users=3)
+
+        snapshot: Dict[str, Any] = scraper.metrics.snapshot()
+        # the requests of every user are added up in the endpoint of the path template.
+        self.assertSetEqual(set(snapshot['requests']), {'GET /users', 'GET /users/{username}/repos'})
+        self.assertEqual(snapshot['requests']['GET /users']['count'], 3)
+        self.assertEqual(snapshot['requests']['GET /users/{username}/repos']['count'], len(stub.requests) - 3)
+        self.assertEqual(snapshot['rows_written'], 7)
+        self.assertIsNotNone(snapshot['rate_limit']['remaining'])
+
+        # the checkpoint of the last page has the rows written with the previous pages.
+        scrape_run.refresh_from_db()
+        self.assertEqual(scrape_run.metrics['rows_written'], 5)
+        self.assertEqual(scrape_run.metrics['requests']['GET /users']['count'], 3)
@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Iterator, List
+
+from django.test import SimpleTestCase
+
+from github_data.exceptions import RateLimitExceededError
+from github_data.pipeline import prefetch
+
+
+class PrefetchTestCase(SimpleTestCase):
+    """
+    Tests for the bounded queue between the fetcher and the writer stages of the scraper.
+    """
+    def setUp(self) -> None:
+        self.fetched: List[int] = []
+        self.fetcher_threads: List[str] = []
+        self.closed: bool = False
+
+    def fetch(self, count: int, *, error: Exception = None) -> Iterator[int]:
+        try:
+            for item in range(count):
+                self.fetcher_threads.append(threading.current_thread().name)
+                self.fetched.append(item)
+                yield item
+            if error is not None:
+                raise error
+        finally:
+            self.closed = True
+
+    def test_items_are_fetched_in_another_thread(self) -> None:
+        self.assertListEqual(list(prefetch(self.fetch(5), max_size=2)), [0, 1, 2, 3, 4])
+        self.assertSetEqual(set(self.fetcher_threads), {'scraper-fetcher'})
+        self.assertTrue(self.closed)
+
+    def test_items_are_fetched_in_this_thread_without_queue(self) -> None:
+        self.assertListEqual(list(prefetch(self.fetch(3), max_size=0)), [0, 1, 2])
+        self.assertSetEqual(set(self.fetcher_threads), {threading.current_thread().name})
+
+    def test_fetcher_waits_for_the_writer(self) -> None:
+        items: Iterator[int] = prefetch(self.fetch(20), max_size=3)
+        next(items)
+        time.sleep(0.3)
+
+        # the item consumed, the ones in the queue and the one waiting to be queued.
+        self.assertLessEqual(len(self.fetched), 5)
+        items.close()
+        self.assertTrue(self.closed)
+
+    def test_error_is_raised_after_queued_items(self) -> None:
+        error: RateLimitExceededError = RateLimitExceededError(
+            '/users', 403, 'API rate limit exceeded', {'X-RateLimit-Reset': str(int(time.time()) + 60)}, None
+        )
+        written: List[int] = []
+        with self.assertRaises(RateLimitExceededError):
+            for item in prefetch(self.fetch(3, error=error), max_size=5):
+                written.append(item)
+
+        self.assertListEqual(written, [0, 1, 2])
+
+    def test_writer_error_stops_the_fetcher(self) -> None:
+        with self.assertRaises(ValueError):
+            for item in prefetch(self.fetch(100), max_size=2):
+                if item == 1:
+                    raise ValueError('database error')
+
+        self.assertTrue(self.closed)
+        self.assertLess(len(self.fetched), 100)
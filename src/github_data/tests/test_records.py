@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from typing import Dict
+
+from django.test import SimpleTestCase
+
+from github_data.exceptions import InvalidRecordError
+from github_data.records import UserRecord, RepositoryRecord
+
+
+class UserRecordTestCase(SimpleTestCase):
+    """
+    Tests for the in-memory validation of GitHub User data.
+    """
+    def setUp(self) -> None:
+        self.user_data: Dict = {'id': 3, 'login': 'marioscience', 'url': 'https://api.github.com/users/_'}
+
+    def test_valid_user(self) -> None:
+        record: UserRecord = UserRecord.from_data(self.user_data)
+        self.assertEqual((record.id, record.login, record.url), (3, 'marioscience', 'https://api.github.com/users/_'))
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_invalid_users(self) -> None:
+        invalid_values: Dict = {
+            'id': [None, 0, -1, '3', True],
+            'login': [None, '', 'x' * 40, 5],
+            'url': [None, 'api.github.com/users/_', 'https://' + 'x' * 200],
+        }
+        for field, values in invalid_values.items():
+            for value in values:
+                with self.subTest(field=field, value=value), self.assertRaises(InvalidRecordError):
+                    UserRecord.from_data({**self.user_data, field: value})
+
+
+class RepositoryRecordTestCase(SimpleTestCase):
+    """
+    Tests for the in-memory validation of GitHub Repository data.
+    """
+    def setUp(self) -> None:
+        self.repository_data: Dict = {
+            'id': 888, 'name': 'electrify-me', 'full_name': 'isthisarealuser/electrify-me', 'description': None,
+            'url': 'https://api.github.com/repos/_/_',
+            'owner': {'id': 400, 'login': 'isthisarealuser', 'url': 'https://api.github.com/users/_'},
+        }
+
+    def test_valid_repository(self) -> None:
+        record: RepositoryRecord = RepositoryRecord.from_data(self.repository_data)
+        self.assertEqual(record.owner.id, 400)
+        self.assertEqual(record.to_model().owner_id, 400)
+        self.assertIsNone(record.description)
+
+    def test_repository_timestamps(self) -> None:
+        record: RepositoryRecord = RepositoryRecord.from_data(
+            {**self.repository_data, 'updated_at': '2021-02-03T04:05:06Z', 'pushed_at': None}
+        )
+        self.assertEqual(record.to_model().updated_at, datetime(2021, 2, 3, 4, 5, 6, tzinfo=timezone.utc))
+        self.assertIsNone(record.pushed_at)
+
+    def test_invalid_repositories(self) -> None:
+        invalid_values: Dict = {
+            'owner': [None, 'isthisarealuser', {'id': 400}],
+            'full_name': ['', 'x' * 141],
+            'name': [None, 'x' * 101],
+            'description': [42],
+            'updated_at': ['yesterday', 42],
+            'pushed_at': ['2021-13-01T00:00:00Z'],
+        }
+        for field, values in invalid_values.items():
+            for value in values:
+                with self.subTest(field=field, value=value), self.assertRaises(InvalidRecordError):
+                    RepositoryRecord.from_data({**self.repository_data, field: value})
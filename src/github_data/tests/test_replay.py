@@ -0,0 +1,52 @@
+import tempfile
+from typing import Dict, List
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from github_data.models import GithubUser, GithubRepository
+from github_data.replay import response_data
+from github_data.tests.github_stub import GithubStubServer, load_graphql_responses
+
+
+class ReplayArchiveTestCase(TestCase):
+    """
+    Tests for rebuilding the database from the archive of raw GitHub API responses.
+    """
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_replay_rebuilds_the_scraped_data(self) -> None:
+        with GithubStubServer({1: 2, 2: 3, 3: 0}) as stub, override_settings(
+                GITHUB_API_HOST=stub.api_host, GITHUB_RESPONSE_ARCHIVE=self.directory.name):
+            call_command('scrape_git', users=3, workers=2)
+        scraped: List[Dict] = list(GithubRepository.objects.order_by('id').values('id', 'owner_id', 'full_name'))
+        GithubRepository.objects.all().delete()
+        GithubUser.objects.all().delete()
+
+        with override_settings(GITHUB_RESPONSE_ARCHIVE=self.directory.name):
+            call_command('replay_archive', readers=2, batch_size=2)
+
+        self.assertListEqual(list(GithubUser.objects.order_by('id').values_list('login', flat=True)),
+                             ['user-1', 'user-2', 'user-3'])
+        self.assertListEqual(
+            list(GithubRepository.objects.order_by('id').values('id', 'owner_id', 'full_name')), scraped
+        )
+
+    def test_replay_needs_an_archive(self) -> None:
+        with override_settings(GITHUB_RESPONSE_ARCHIVE=None), self.assertRaises(CommandError):
+            call_command('replay_archive')
+        with self.assertRaises(CommandError):
+            call_command('replay_archive', f'{self.directory.name}/missing.jsonl.gz')
+
+    def test_graphql_responses(self) -> None:
+        recording: Dict = load_graphql_responses()[0]
+        users, repositories = response_data({
+            'endpoint': 'POST /graphql', 'host': 'https://api.github.com', 'response': recording['response']
+        })
+
+        self.assertIn('user-1', [user['login'] for user in users])
+        self.assertTrue(repositories)
+        self.assertTrue(all(repository['owner']['login'] == 'user-1' for repository in repositories))
+        self.assertTupleEqual(response_data({'endpoint': 'GET /rate_limit', 'host': '', 'response': {}}), ([], []))
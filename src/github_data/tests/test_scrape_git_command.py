@@ -1,10 +1,18 @@
-from typing import List, Dict
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List, Dict
+from unittest import mock
 
-from django.core.management import call_command
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
 
 from github_data.exceptions import RateLimitExceededError
-from github_data.models import GithubUser, GithubRepository
+from github_data.github_api import ResponseCache, shard_cache_path
+from github_data.management.commands.scrape_git import Command, scrape_shard
+from github_data.models import GithubUser, GithubRepository, ScrapeRun
+from github_data.scraper_tool import Scraper
+from github_data.tests.github_stub import GithubStubServer, load_graphql_responses
 
 
 class ScrapeCommandTestCase(TestCase):
@@ -58,3 +66,231 @@ class ScrapeCommandTestCase(TestCase):
 
         self.assertEqual(GithubUser.objects.count(), 2)
         self.assertEqual(GithubRepository.objects.count(), 66)
+
+
+class ScrapeCommandEngineTestCase(TestCase):
+    """
+    Tests for the scraping engines of the scrape_git command, using a local stand-in for the GitHub API.
+    """
+    def test_async_engine(self) -> None:
+        with GithubStubServer({1: 2, 2: 3, 3: 0}) as stub, override_settings(GITHUB_API_HOST=stub.api_host):
+            call_command('scrape_git', users=3, engine='async', workers=10)
+
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertEqual(GithubRepository.objects.count(), 5)
+
+    def test_sync_engine_with_workers(self) -> None:
+        with GithubStubServer({1: 2, 2: 3, 3: 0}) as stub, override_settings(GITHUB_API_HOST=stub.api_host):
+            call_command('scrape_git', 'user-2', 'user-3', workers=2)
+
+        self.assertEqual(GithubUser.objects.count(), 2)
+        self.assertEqual(GithubRepository.objects.filter(owner__login='user-2').count(), 3)
+
+    def test_graphql_backend(self) -> None:
+        with GithubStubServer({1: 3, 2: 0}, graphql_responses=load_graphql_responses()) as stub, \
+                override_settings(GITHUB_API_HOST=stub.api_host, GITHUB_TOKEN='token'):
+            call_command('scrape_git', 'user-1', 'user-2', 'missing', repositories=2, backend='graphql')
+
+        self.assertListEqual(stub.requests, ['POST /graphql'])
+        self.assertEqual(GithubUser.objects.count(), 2)
+        self.assertEqual(GithubRepository.objects.count(), 2)
+        self.assertEqual(ScrapeRun.objects.get().users_processed, 3)
+
+    def test_graphql_backend_needs_the_sync_engine(self) -> None:
+        with self.assertRaises(CommandError), override_settings(GITHUB_TOKEN='token'):
+            call_command('scrape_git', users=3, engine='async', backend='graphql')
+
+    def test_refresh(self) -> None:
+        with GithubStubServer({1: 2, 2: 3, 3: 0}) as stub, override_settings(GITHUB_API_HOST=stub.api_host):
+            call_command('scrape_git', users=3)
+            call_command('scrape_git', users=3, refresh=True)
+
+        self.assertEqual(ScrapeRun.objects.last().repositories_processed, 0)
+        with self.assertRaises(CommandError):
+            call_command('scrape_git', users=3, engine='async', refresh=True)
+
+
+class FakeClock:
+    """
+    Clock that moves forward when it sleeps instead of blocking, so rate limit waits are instant.
+    """
+    def __init__(self) -> None:
+        self.offset: float = 0
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float) -> None:
+        self.offset += seconds
+
+
+class ScrapeCommandRetryTestCase(TestCase):
+    """
+    Tests for resuming the scrape_git command after the rate limit reset, using a local stand-in for the GitHub API.
+    """
+    def call_command_with_retry(self, stub: GithubStubServer, *args: str, **options: int) -> List[float]:
+        """
+        Calls the scrape_git command with a single token, refilling its budget when the command waits for the reset.
+        :return: The seconds the command waited for the rate limit reset
+        """
+        clock: FakeClock = FakeClock()
+        waits: List[float] = []
+
+        def wait_for_reset(seconds: float) -> None:
+            waits.append(seconds)
+            clock.sleep(seconds)
+            stub.token_budgets['token'] = 100
+
+        with override_settings(GITHUB_API_HOST=stub.api_host, GITHUB_TOKENS=['token']), \
+                mock.patch('github_data.github_api.time', clock), \
+                mock.patch('github_data.management.commands.scrape_git.time.sleep', wait_for_reset):
+            call_command('scrape_git', *args, retry=True, **options)
+        return waits
+
+    def count_requests(self, stub: GithubStubServer, path: str) -> int:
+        return len([request for request in stub.requests if request.split('?')[0] == path])
+
+    def test_users_range_resumes_after_last_written_user(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 3}) as stub:
+            waits: List[float] = self.call_command_with_retry(stub, users=3)
+
+        self.assertEqual(len(waits), 1)
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertEqual(GithubRepository.objects.count(), 8)
+        # user-1 and user-2 were written before the rate limit was reached, so they are not fetched again.
+        self.assertEqual(self.count_requests(stub, '/users/user-1/repos'), 1)
+        self.assertEqual(self.count_requests(stub, '/users/user-2/repos'), 1)
+        self.assertIn('/users?since=2&per_page=1', stub.requests)
+
+    def test_individual_users_resume_after_last_written_user(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 3}) as stub:
+            waits: List[float] = self.call_command_with_retry(stub, 'user-1', 'user-2', 'user-3')
+
+        self.assertEqual(len(waits), 1)
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertEqual(GithubRepository.objects.count(), 8)
+        self.assertEqual(self.count_requests(stub, '/users/user-1'), 1)
+        self.assertEqual(self.count_requests(stub, '/users/user-3/repos'), 1)
+
+    def test_run_metrics_are_saved(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 3}) as stub:
+            waits: List[float] = self.call_command_with_retry(stub, users=3)
+
+        metrics: Dict[str, Any] = ScrapeRun.objects.get().metrics
+        self.assertEqual(metrics['rows_written'], 11)
+        self.assertEqual(metrics['sleep_seconds']['rate_limit_reset'], waits[0])
+        self.assertIn('GET /users/{username}/repos', metrics['requests'])
+
+    def test_all_users_resume(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 3}) as stub:
+            waits: List[float] = self.call_command_with_retry(stub)
+
+        self.assertEqual(len(waits), 1)
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertEqual(GithubRepository.objects.count(), 8)
+
+
+class ScrapeRunTestCase(TestCase):
+    """
+    Tests for the checkpoints of the scrape_git command and resuming a scrape run from them.
+    """
+    def call_command_with_token(self, stub: GithubStubServer, *args: str, **options: int) -> ScrapeRun:
+        with override_settings(GITHUB_API_HOST=stub.api_host, GITHUB_TOKENS=['token']):
+            call_command('scrape_git', *args, **options)
+        return ScrapeRun.objects.last()
+
+    def test_checkpoint_of_stopped_run(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 3}) as stub:
+            scrape_run: ScrapeRun = self.call_command_with_token(stub, users=3)
+
+        self.assertEqual(scrape_run.status, ScrapeRun.STOPPED)
+        self.assertEqual(scrape_run.last_id, 2)
+        self.assertEqual(scrape_run.users_processed, 2)
+        self.assertEqual(scrape_run.repositories_processed, 3)
+        self.assertEqual(scrape_run.remaining_users, 1)
+
+    def test_resume_users_range(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 3}) as stub:
+            scrape_run: ScrapeRun = self.call_command_with_token(stub, users=3)
+            stub.token_budgets['token'] = 100
+            self.call_command_with_token(stub, resume=scrape_run.id)
+
+        scrape_run.refresh_from_db()
+        self.assertEqual(scrape_run.status, ScrapeRun.FINISHED)
+        self.assertEqual((scrape_run.users_processed, scrape_run.repositories_processed), (3, 8))
+        self.assertEqual(GithubRepository.objects.count(), 8)
+        # the pages completed before the run stopped are not fetched again.
+        self.assertEqual(len([request for request in stub.requests if request.startswith('/users/user-1/')]), 1)
+        self.assertIn('/users?since=2&per_page=1', stub.requests)
+
+    def test_resume_individual_users(self) -> None:
+        with GithubStubServer({1: 3, 2: 0, 3: 5}, token_budgets={'token': 2}) as stub:
+            scrape_run: ScrapeRun = self.call_command_with_token(stub, 'user-1', 'user-2', 'user-3')
+            self.assertListEqual(scrape_run.remaining_usernames, ['user-2', 'user-3'])
+            stub.token_budgets['token'] = 100
+            self.call_command_with_token(stub, resume=scrape_run.id)
+
+        scrape_run.refresh_from_db()
+        self.assertEqual(scrape_run.status, ScrapeRun.FINISHED)
+        self.assertEqual(GithubUser.objects.count(), 3)
+        self.assertEqual(GithubRepository.objects.count(), 8)
+        self.assertEqual(stub.requests.count('/users/user-1'), 1)
+
+    def test_finished_run_can_not_be_resumed(self) -> None:
+        scrape_run: ScrapeRun = ScrapeRun.objects.create(mode=ScrapeRun.RANGE, status=ScrapeRun.FINISHED)
+
+        with self.assertRaises(CommandError):
+            call_command('scrape_git', resume=scrape_run.id)
+        with self.assertRaises(CommandError):
+            call_command('scrape_git', resume=scrape_run.id + 1)
+
+
+class ScrapeShardsTestCase(TestCase):
+    """
+    Tests for scraping a range of users in shards. The shards are scraped in this process, since the shard
+    processes can't see the test database.
+    """
+    def test_shards_are_scraped_and_merged(self) -> None:
+        scrape_run: ScrapeRun = ScrapeRun.objects.create(mode=ScrapeRun.RANGE, since=0, until=4)
+        command: Command = Command()
+        command.shards = 2
+
+        with GithubStubServer({1: 3, 2: 0, 3: 5, 4: 1, 5: 2}) as stub, override_settings(GITHUB_API_HOST=stub.api_host):
+            shard_runs: List[ScrapeRun] = command.start_shards(scrape_run)
+            for shard_run in shard_runs:
+                scrape_shard(shard_run.id, [], {'retry': False, 'engine': 'sync', 'workers': None})
+        scrape_run.merge_shards()
+
+        self.assertListEqual([(shard_run.since, shard_run.until) for shard_run in shard_runs], [(0, 2), (2, 4)])
+        self.assertSetEqual(set(scrape_run.shards.values_list('status', flat=True)), {ScrapeRun.FINISHED})
+        self.assertListEqual(list(GithubUser.objects.values_list('id', flat=True)), [1, 2, 3, 4])
+        self.assertEqual((scrape_run.users_processed, scrape_run.repositories_processed), (4, 9))
+
+    def test_shards_write_their_own_response_cache(self) -> None:
+        scrape_run: ScrapeRun = ScrapeRun.objects.create(mode=ScrapeRun.RANGE, since=0, until=4)
+        command: Command = Command()
+        command.shards = 2
+        command.tokens = []
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path: Path = Path(directory) / 'responses.json'
+            with override_settings(GITHUB_RESPONSE_CACHE=str(cache_path)):
+                shard_runs: List[ScrapeRun] = command.start_shards(scrape_run)
+                for shard_run in shard_runs:
+                    scraper: Scraper = command.create_scraper(shard_run)
+                    self.assertEqual(scraper.api.response_cache.path, shard_cache_path(cache_path, shard_run.id))
+                    scraper.api.response_cache.set(f'/users?since={shard_run.since}', {'etag': f'"{shard_run.id}"'})
+                    scraper.api.response_cache.close()
+                command.merge_response_caches(scrape_run)
+
+            self.assertSetEqual(set(ResponseCache(cache_path).entries), {'/users?since=0', '/users?since=2'})
+            self.assertListEqual([path.name for path in Path(directory).iterdir()], ['responses.json'])
+
+    def test_shards_need_a_range(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command('scrape_git', shards=2)
+        with self.assertRaises(CommandError):
+            call_command('scrape_git', since=10, until=20, users=5, shards=2)
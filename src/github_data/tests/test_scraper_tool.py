@@ -1,9 +1,78 @@
-from typing import List
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+from urllib.error import HTTPError
+
+from django.db import IntegrityError
 from django.test import TestCase
+from fastcore.foundation import L as fastlist
+from fastcore.xtras import dict2obj
 
 from github_data.exceptions import RateLimitExceededError
 from github_data.models import GithubUser, GithubRepository
 from github_data.scraper_tool import Scraper
+from github_data.tests.github_stub import GithubStubServer
+
+
+class FakeGithubApi:
+    """
+    In-memory stand-in for the GhApi users and repos endpoints used by the Scraper.
+    Users have consecutive ids starting at 1 and the login `user-{id}`.
+    """
+    response_cache: None = None
+
+    def __init__(self, repositories_per_user: Dict[int, int], *,
+                 rate_limited_login: Optional[str] = None, delay: float = 0) -> None:
+        self.repositories_per_user: Dict[int, int] = repositories_per_user
+        self.rate_limited_login: Optional[str] = rate_limited_login
+        self.delay: float = delay
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.users = SimpleNamespace(list=self.list_users, get_by_username=self.get_user)
+        self.repos = SimpleNamespace(list_for_user=self.list_repositories)
+
+    @contextmanager
+    def staging_responses(self) -> Iterator[Dict]:
+        yield {}
+
+    @staticmethod
+    def user_data(user_id: int) -> Dict:
+        return {'id': user_id, 'login': f'user-{user_id}', 'url': f'https://api.github.com/users/user-{user_id}'}
+
+    def list_users(self, since: int = 0, per_page: int = 30) -> fastlist:
+        user_ids: List[int] = sorted(user_id for user_id in self.repositories_per_user if user_id > since)
+        return dict2obj([self.user_data(user_id) for user_id in user_ids[:per_page]])
+
+    def get_user(self, username: str) -> fastlist:
+        return dict2obj(self.user_data(int(username.split('-')[1])))
+
+    def list_repositories(self, username: str, page: int = 1, per_page: int = 30) -> fastlist:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            # like ScraperApi, which raises the rate limit error once every token ran out of budget.
+            if username == self.rate_limited_login:
+                raise RateLimitExceededError(
+                    'https://api.github.com/', 403, 'Rate Limit Exceeded',
+                    {'X-RateLimit-Reset': str(int(time.time()) + 60)}, None
+                )
+            owner: Dict = self.get_user(username)
+            repository_ids: List[int] = list(range(self.repositories_per_user[owner.id]))
+            page_ids: List[int] = repository_ids[(page - 1) * per_page:page * per_page]
+            return dict2obj([{
+                'id': owner.id * 1000 + repository_id, 'owner': owner, 'name': f'repo-{repository_id}',
+                'full_name': f'{username}/repo-{repository_id}', 'description': '',
+                'url': f'https://api.github.com/repos/{username}/repo-{repository_id}'
+            } for repository_id in page_ids])
+        finally:
+            with self.lock:
+                self.in_flight -= 1
 
 
 class ScraperPaginationTestCase(TestCase):
@@ -25,6 +94,8 @@ class ScraperPaginationTestCase(TestCase):
         self.assertTupleEqual(self.page_size_20_scraper.calculate_user_paging(364), (18, 4, 20))
         # all users
         self.assertTupleEqual(self.page_size_20_scraper.calculate_user_paging(0), (0, 0, 20))
+        # all users use the users page size, not the repositories page size
+        self.assertTupleEqual(Scraper(users_page_size=7, repositories_page_size=3).calculate_user_paging(0), (0, 0, 7))
 
     def test_calculate_repository_paging(self) -> None:
         # response is ({number of pages}, {page size})
@@ -32,12 +103,22 @@ class ScraperPaginationTestCase(TestCase):
         self.assertTupleEqual(self.page_size_5_scraper.calculate_repository_paging(40), (8, 5))
         # number of repositories less than page size
         self.assertTupleEqual(self.page_size_5_scraper.calculate_repository_paging(1), (1, 1))
-        # normal case with adjusted page size
-        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(50), (2, 25))
-        # all repositories
-        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(0), (0, 20))
+        # the page size is never adjusted down, the extra repositories of the last page are left out
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(50), (3, 20))
+        self.assertTupleEqual(Scraper().calculate_repository_paging(97), (1, 97))
+        # all repositories, the number of pages is not known
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(0), (None, 20))
         # requesting an invalid number of repositories (less than 0)
-        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(-1), (0, 20))
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(-1), (None, 20))
+
+    def test_calculate_repository_paging_with_public_repositories(self) -> None:
+        # all repositories of a user with a known number of repositories
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(0, 40), (2, 20))
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(0, 0), (0, 20))
+        # the user has fewer repositories than requested
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(50, 3), (1, 3))
+        # the user has more repositories than requested
+        self.assertTupleEqual(self.page_size_20_scraper.calculate_repository_paging(30, 100), (2, 20))
 
     def test_page_size_bounds(self) -> None:
         negative_paged_scraper: Scraper = Scraper(users_page_size=-15, repositories_page_size=-10)
@@ -120,3 +201,217 @@ class TestScraper(TestCase):
         self.assertEqual(self.page_size_10_scraper.users_added, 0)
         self.assertEqual(self.page_size_10_scraper.users_processed, 1)
         self.assertEqual(self.page_size_10_scraper.repositories_processed, 2)
+
+
+class ConcurrentScraperTestCase(TestCase):
+    """
+    Tests for the concurrent repository fetching of the Scraper tool, using an in-memory GitHub API.
+    """
+    def setUp(self) -> None:
+        self.repositories_per_user: Dict[int, int] = {1: 3, 2: 0, 3: 5, 4: 1, 5: 2, 6: 4}
+        self.scraper: Scraper = Scraper(users_page_size=3, repositories_page_size=2, concurrency=4)
+
+    def test_concurrency_bounds(self) -> None:
+        self.assertEqual(Scraper(concurrency=-3).concurrency, Scraper.MIN_CONCURRENCY)
+        self.assertEqual(Scraper(concurrency=8).concurrency, 8)
+
+    def test_scraping_users_concurrently(self) -> None:
+        self.scraper.api = FakeGithubApi(self.repositories_per_user, delay=0.05)
+        self.scraper.scrape_users(since=0, number_of_users=6)
+
+        self.assertGreater(self.scraper.api.max_in_flight, 1)
+        self.assertLessEqual(self.scraper.api.max_in_flight, 4)
+        self.assertEqual(GithubUser.objects.count(), 6)
+        self.assertEqual(GithubRepository.objects.count(), 15)
+        self.assertEqual(self.scraper.users_added, 6)
+        self.assertEqual(self.scraper.users_processed, 6)
+        self.assertEqual(self.scraper.repositories_added, 15)
+        self.assertEqual(self.scraper.repositories_processed, 15)
+
+    def test_repository_requests_are_minimized(self) -> None:
+        requests: List[int] = []
+        self.scraper.api = FakeGithubApi({1: 4, 2: 5})
+        list_repositories = self.scraper.api.repos.list_for_user
+        self.scraper.api.repos.list_for_user = lambda *args, **kwargs: requests.append(1) or list_repositories(
+            *args, **kwargs
+        )
+
+        # 4 repositories in pages of 2 need a third (empty) page to know there are no more.
+        self.assertEqual(len(self.scraper.fetch_user_repositories('user-1', number_of_repositories=0)), 4)
+        self.assertEqual(len(requests), 3)
+        # unless the number of repositories of the user is known.
+        self.assertEqual(len(self.scraper.fetch_user_repositories(
+            'user-1', number_of_repositories=0, public_repositories=4
+        )), 4)
+        self.assertEqual(len(requests), 5)
+        # 3 repositories are fetched in 2 full pages, and the extra one is left out.
+        self.assertEqual(len(self.scraper.fetch_user_repositories('user-2', number_of_repositories=3)), 3)
+        self.assertEqual(len(requests), 7)
+
+    def test_scraping_users_until_id(self) -> None:
+        self.scraper.api = FakeGithubApi(self.repositories_per_user)
+        self.scraper.scrape_users(since=1, until=4)
+
+        # the range ends in the middle of the second page.
+        self.assertListEqual(list(GithubUser.objects.values_list('id', flat=True)), [2, 3, 4])
+        self.assertEqual(GithubRepository.objects.count(), 6)
+        self.assertEqual(self.scraper.users_processed, 3)
+
+    def test_repository_owners_are_cached(self) -> None:
+        self.scraper.api = FakeGithubApi(self.repositories_per_user)
+        self.scraper.scrape_users(since=0, number_of_users=6)
+
+        # the test transaction is never committed, so the owners stay staged.
+        self.assertSetEqual(self.scraper.owner_cache.staged, set(range(1, 7)))
+        # the owners of the repositories were written with the users page, so they are never merged again.
+        with self.assertNumQueries(6):
+            self.scraper.parse_repositories_list(self.scraper.api.list_repositories('user-3', per_page=5))
+
+    def test_owners_of_a_rolled_back_write_are_not_cached(self) -> None:
+        users: fastlist = FakeGithubApi(self.repositories_per_user).list_users(0, per_page=2)
+        with mock.patch.object(self.scraper, 'parse_repositories_list', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.scraper.write_users(users, [])
+
+        self.assertFalse(GithubUser.objects.exists())
+        self.assertNotIn(1, self.scraper.owner_cache)
+
+    def test_workers_are_held_back_by_the_consumer(self) -> None:
+        calls: List[int] = []
+        results: Iterator = self.scraper.map_concurrently(calls.append, list(range(20)))
+        next(results)
+        time.sleep(0.1)
+
+        self.assertLessEqual(len(calls), 2 * self.scraper.concurrency + 1)
+        results.close()
+
+    def test_scraping_individual_users_concurrently(self) -> None:
+        self.scraper.api = FakeGithubApi(self.repositories_per_user)
+        self.scraper.scrape_individual_users(['user-3', 'user-1'], number_of_repositories=2)
+
+        self.assertEqual(GithubRepository.objects.filter(owner_id=3).count(), 2)
+        self.assertEqual(GithubRepository.objects.filter(owner_id=1).count(), 2)
+        self.assertEqual(self.scraper.users_added, 2)
+        self.assertEqual(self.scraper.repositories_added, 4)
+
+    def test_missing_individual_users_are_skipped(self) -> None:
+        with GithubStubServer({1: 1, 2: 2}) as stub:
+            scraper: Scraper = Scraper(users_page_size=2, concurrency=2, api_host=stub.api_host)
+            scraper.scrape_individual_users(['user-1', 'missing', 'user-2'])
+
+        # the user that doesn't exist is counted as processed instead of stopping the run.
+        self.assertListEqual(list(GithubUser.objects.values_list('login', flat=True)), ['user-1', 'user-2'])
+        self.assertEqual((scraper.users_processed, scraper.users_added), (3, 2))
+        self.assertEqual(GithubRepository.objects.count(), 3)
+
+    def test_client_errors_are_not_rate_limits(self) -> None:
+        with GithubStubServer({1: 1, 2: 2}, forbidden_login='user-2') as stub:
+            scraper: Scraper = Scraper(users_page_size=2, api_host=stub.api_host)
+            with self.assertRaises(HTTPError) as context:
+                scraper.scrape_individual_users(['user-1', 'user-2'])
+
+        self.assertNotIsInstance(context.exception, RateLimitExceededError)
+        self.assertEqual(context.exception.code, 403)
+        self.assertListEqual(list(GithubUser.objects.values_list('login', flat=True)), ['user-1'])
+
+    def test_rate_limit_keeps_last_completed_user(self) -> None:
+        self.scraper.api = FakeGithubApi(self.repositories_per_user, rate_limited_login='user-5')
+
+        with self.assertRaises(RateLimitExceededError) as context:
+            self.scraper.scrape_users(since=0, number_of_users=6)
+
+        # users after the rate limited one are not written even if their repositories were fetched.
+        self.assertEqual(context.exception.last_id, 4)
+        self.assertEqual(self.scraper.users_processed, 4)
+        self.assertFalse(GithubUser.objects.filter(id=6).exists())
+        self.assertEqual(GithubRepository.objects.count(), 9)
+
+
+class ScraperRefreshTestCase(TestCase):
+    """
+    Tests for refreshing the repositories already scraped, using a local stand-in for the GitHub API.
+    """
+    def setUp(self) -> None:
+        self.repositories_per_user: Dict[int, int] = {1: 3, 2: 0, 3: 5}
+
+    def scrape(self, stub: GithubStubServer, *, refresh: bool) -> Scraper:
+        scraper: Scraper = Scraper(
+            users_page_size=3, repositories_page_size=2, api_host=stub.api_host, refresh=refresh
+        )
+        scraper.scrape_users(since=0, number_of_users=3)
+        return scraper
+
+    def repository_requests(self, stub: GithubStubServer) -> List[str]:
+        return [request for request in stub.requests if '/repos' in request]
+
+    def test_unchanged_repositories_are_not_fetched_again(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            self.scrape(stub, refresh=False)
+            stub.requests.clear()
+            scraper: Scraper = self.scrape(stub, refresh=True)
+
+        # a single page per user and sort, which starts with a repository that didn't change. The listing of user-2
+        # has all of its repositories, so it's not listed again by push.
+        self.assertEqual(len(self.repository_requests(stub)), 5)
+        self.assertEqual(scraper.repositories_processed, 0)
+        self.assertEqual(GithubRepository.objects.count(), 8)
+        self.assertFalse(GithubRepository.objects.filter(updated_at=None).exists())
+
+    def test_changed_repositories_are_written(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            self.scrape(stub, refresh=False)
+            stub.requests.clear()
+            stub.repositories_per_user[1] = 4
+            stub.repository_updates.update({3000: '2021-02-02T00:00:00Z', 3004: '2021-02-01T00:00:00Z'})
+            scraper: Scraper = self.scrape(stub, refresh=True)
+
+        # the most recently updated repositories of user-3 need a second page to find a repository that didn't change.
+        self.assertEqual(len(self.repository_requests(stub)), 6)
+        self.assertEqual((scraper.repositories_added, scraper.repositories_updated), (1, 2))
+        self.assertEqual(GithubRepository.objects.get(id=3000).updated_at.month, 2)
+        self.assertTrue(GithubRepository.objects.filter(id=1003).exists())
+
+    def test_pushed_repositories_are_written(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            self.scrape(stub, refresh=False)
+            stub.requests.clear()
+            # the repository is pushed to without being updated, so it's still listed after unchanged ones by update.
+            stub.repository_pushes[3001] = '2021-03-01T00:00:00Z'
+            scraper: Scraper = self.scrape(stub, refresh=True)
+
+        self.assertEqual(len(self.repository_requests(stub)), 5)
+        self.assertEqual((scraper.repositories_added, scraper.repositories_updated), (0, 1))
+        self.assertEqual(GithubRepository.objects.get(id=3001).pushed_at.month, 3)
+
+    def test_refresh_makes_fewer_requests_than_a_full_scrape(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            self.scrape(stub, refresh=False)
+            scrape_requests: int = len(stub.requests)
+            stub.requests.clear()
+            scraper: Scraper = self.scrape(stub, refresh=True)
+
+        self.assertLess(len(stub.requests), scrape_requests)
+        self.assertEqual((scraper.users_updated, scraper.repositories_processed), (0, 0))
+
+    def test_unchanged_users_are_not_written_again(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            self.scrape(stub, refresh=False)
+            GithubUser.objects.filter(id=1).update(url='https://example.com/user-1')
+            scraped_at: Dict[int, Any] = dict(GithubUser.objects.values_list('id', 'scraped_at'))
+            self.scrape(stub, refresh=True)
+
+        self.assertListEqual(
+            [user_id for user_id, timestamp in GithubUser.objects.values_list('id', 'scraped_at')
+             if timestamp != scraped_at[user_id]], [1]
+        )
+
+    def test_refresh_individual_users(self) -> None:
+        with GithubStubServer(self.repositories_per_user) as stub:
+            Scraper(repositories_page_size=2, api_host=stub.api_host).scrape_individual_users(['user-2', 'user-3'])
+            stub.requests.clear()
+            Scraper(repositories_page_size=2, api_host=stub.api_host, refresh=True).scrape_individual_users(
+                ['user-2', 'user-3']
+            )
+
+        # user-2 has no public repositories, so only the users and the first page of each sort of user-3 are fetched.
+        self.assertEqual(len(stub.requests), 4)
@@ -0,0 +1,33 @@
+from django.test import SimpleTestCase
+
+from github_data.sharding import distribute_tokens, split_id_range
+
+
+class SplitIdRangeTestCase(SimpleTestCase):
+    """
+    Tests for splitting a range of GitHub user ids into shards.
+    """
+    def test_shards_cover_the_range(self) -> None:
+        self.assertListEqual(split_id_range(0, 100, 4), [(0, 25), (25, 50), (50, 75), (75, 100)])
+        self.assertListEqual(split_id_range(10, 20, 3), [(10, 13), (13, 16), (16, 20)])
+
+    def test_small_ranges_get_fewer_shards(self) -> None:
+        self.assertListEqual(split_id_range(0, 2, 4), [(0, 1), (1, 2)])
+        self.assertListEqual(split_id_range(5, 5, 4), [(5, 5)])
+
+    def test_single_shard(self) -> None:
+        self.assertListEqual(split_id_range(0, 100, 0), [(0, 100)])
+
+
+class DistributeTokensTestCase(SimpleTestCase):
+    """
+    Tests for distributing GitHub OAuth tokens between shards.
+    """
+    def test_tokens_are_not_shared_if_there_are_enough(self) -> None:
+        self.assertListEqual(distribute_tokens(['a', 'b', 'c', 'd', 'e'], 2), [['a', 'c', 'e'], ['b', 'd']])
+
+    def test_tokens_are_shared_if_there_are_not_enough(self) -> None:
+        self.assertListEqual(distribute_tokens(['a', 'b'], 3), [['a'], ['b'], ['a']])
+
+    def test_no_tokens(self) -> None:
+        self.assertListEqual(distribute_tokens([], 2), [[], []])
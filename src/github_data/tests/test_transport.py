@@ -0,0 +1,68 @@
+import socket
+import threading
+from typing import Any, List
+
+from django.test import SimpleTestCase
+from fastcore.net import HTTP404NotFoundError
+
+from github_data.github_api import ScraperApi
+from github_data.tests.github_stub import GithubStubServer
+from github_data.transport import ConnectionPool, PoolKey
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """
+    Tests for the pool of keep-alive connections the GitHub API client sends its requests through.
+    """
+    def test_connections_are_reused(self) -> None:
+        with GithubStubServer({1: 3, 2: 0}) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host)
+            users: Any = api.users.list(0, per_page=2)
+            repositories: Any = api.repos.list_for_user('user-1', per_page=5)
+
+        self.assertEqual(len(users), 2)
+        self.assertEqual(len(repositories), 3)
+        self.assertEqual(repositories[0].owner.login, 'user-1')
+        self.assertEqual((api.connection_pool.opened, api.connection_pool.requests, api.connection_pool.reused),
+                         (1, 2, 1))
+
+    def test_connection_closed_by_the_server_is_replaced(self) -> None:
+        with GithubStubServer({1: 3}) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host)
+            api.users.list(0, per_page=1)
+            key: PoolKey = ('http', stub.api_host.replace('http://', ''))
+            api.connection_pool.idle[key][0].sock.shutdown(socket.SHUT_RDWR)
+            users: Any = api.users.list(0, per_page=1)
+
+        self.assertEqual(users[0].login, 'user-1')
+        self.assertEqual((api.connection_pool.opened, api.connection_pool.requests), (2, 2))
+
+    def test_client_errors_keep_the_connection(self) -> None:
+        with GithubStubServer({1: 3}) as stub:
+            api: ScraperApi = ScraperApi(gh_host=stub.api_host)
+            with self.assertRaises(HTTP404NotFoundError):
+                api.users.get_by_username('missing')
+            api.users.get_by_username('user-1')
+
+        self.assertEqual(api.connection_pool.opened, 1)
+
+    def test_idle_connections_are_bounded(self) -> None:
+        pool: ConnectionPool = ConnectionPool(2)
+        with GithubStubServer({1: 3}) as stub:
+            key: PoolKey = ('http', stub.api_host.replace('http://', ''))
+            barrier: threading.Barrier = threading.Barrier(4)
+
+            def request() -> None:
+                connection, _ = pool.acquire(key)
+                # every thread holds its connection until all of them have one.
+                barrier.wait()
+                pool.release(key, connection)
+
+            threads: List[threading.Thread] = [threading.Thread(target=request) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(pool.opened, 4)
+        self.assertEqual(sum(len(idle) for idle in pool.idle.values()), 2)
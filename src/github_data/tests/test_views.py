@@ -1,18 +1,37 @@
+from datetime import datetime, timezone
 from typing import List
+from unittest import mock
 
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
 
-from github_data.models import GithubUser, GithubRepository
+from github_data.cache import CacheStats
+from github_data.metrics import ScraperMetrics
+from github_data.models import DatasetVersion, GithubUser, GithubRepository, ScrapeRun
 
 
-class RootAPITestCase(APITestCase):
+class APIViewTestCase(APITestCase):
+    """
+    Base test case for the API views, which starts every test with an empty response cache.
+    """
+    def setUp(self) -> None:
+        caches[settings.API_CACHE_ALIAS].clear()
+
+
+class RootAPITestCase(APIViewTestCase):
     """
     Tests for the browsable API root view where the endpoints are listed.
     """
     def setUp(self) -> None:
+        super().setUp()
         self.url: str = reverse('api-root')
         self.endpoint_list: List[str] = ['users', 'repos']
 
@@ -22,7 +41,7 @@ class RootAPITestCase(APITestCase):
         self.assertListEqual(list(root_response.data), self.endpoint_list)
 
 
-class UserAPITestCase(APITestCase):
+class UserAPITestCase(APIViewTestCase):
     """
     Tests for the GithubUser model Viewset.
     """
@@ -66,7 +85,7 @@ class UserAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
-class RepositoryAPITestCase(APITestCase):
+class RepositoryAPITestCase(APIViewTestCase):
     """
     Tests for the GithubRepository model Viewset.
     """
@@ -124,3 +143,166 @@ class RepositoryAPITestCase(APITestCase):
         detail_url: str = reverse('repository-detail', kwargs={'owner': 'who-knows', 'name': 'lomelda'})
         response: Response = self.client.get(detail_url, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class KeysetPaginationTestCase(APIViewTestCase):
+    """
+    Tests for the pagination by id of the users and repositories lists.
+    """
+    @classmethod
+    def setUpTestData(cls) -> None:
+        for user_id in range(1, 8):
+            GithubUser.objects.create(id=user_id, login=f'user-{user_id}', url='https://api.github.com/users/_')
+            GithubRepository.objects.create(
+                id=user_id * 10, owner_id=1, name=f'repo-{user_id}', full_name=f'user-1/repo-{user_id}',
+                url='https://api.github.com/repos/_'
+            )
+
+    def follow_pages(self, url: str) -> List[List[int]]:
+        pages: List[List[int]] = []
+        while url:
+            response: Response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([row.get('id') for row in response.data])
+            url = response.get('Link', '').split(';')[0].strip('<>')
+        return pages
+
+    def test_users_pages(self) -> None:
+        pages: List[List[int]] = self.follow_pages(f'{reverse("user-list")}?per_page=3')
+        self.assertListEqual(pages, [[1, 2, 3], [4, 5, 6], [7]])
+
+    def test_repositories_pages_since_id(self) -> None:
+        pages: List[List[int]] = self.follow_pages(f'{reverse("repository-list")}?since=20&per_page=2')
+        self.assertListEqual(pages, [[30, 40], [50, 60], [70]])
+        user_pages: List[List[int]] = self.follow_pages(
+            f'{reverse("user-repository-list", kwargs={"login": "user-1"})}?per_page=4'
+        )
+        self.assertListEqual(user_pages, [[10, 20, 30, 40], [50, 60, 70]])
+
+    @override_settings(API_MAX_PAGE_SIZE=5)
+    def test_page_size_is_bounded(self) -> None:
+        response: Response = self.client.get(f'{reverse("user-list")}?per_page=1000', format='json')
+        self.assertEqual(len(response.data), 5)
+        self.assertIn('since=5', response['Link'])
+
+    def test_tables_are_not_counted(self) -> None:
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(f'{reverse("user-list")}?per_page=2', format='json')
+        self.assertFalse([query for query in context.captured_queries if 'COUNT(' in query['sql']])
+
+    def test_repository_pages_have_constant_queries(self) -> None:
+        # the dataset version of the response cache is queried once and then read from the cache.
+        DatasetVersion.cached()
+        for page_size in (1, 7):
+            with self.assertNumQueries(1):
+                response: Response = self.client.get(f'{reverse("repository-list")}?per_page={page_size}')
+            self.assertEqual(response.data[0].get('owner').get('login'), 'user-1')
+            # the validators of the conditional GET, the user and the page.
+            with self.assertNumQueries(3):
+                self.client.get(f'{reverse("user-repository-list", kwargs={"login": "user-1"})}?per_page={page_size}')
+
+    def test_repository_detail_joins_its_owner(self) -> None:
+        # the validators of the conditional GET, the dataset version and the repository with its owner.
+        with self.assertNumQueries(3):
+            response: Response = self.client.get(
+                reverse('repository-detail', kwargs={'owner': 'user-1', 'name': 'repo-3'}), format='json'
+            )
+        self.assertEqual(response.data.get('owner').get('login'), 'user-1')
+
+    def test_invalid_since(self) -> None:
+        response: Response = self.client.get(f'{reverse("user-list")}?since=abc', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTestCase(APIViewTestCase):
+    """
+    Tests for the ETag and Last-Modified validators of the repository views, and their 304 Not Modified responses.
+    """
+    @classmethod
+    def setUpTestData(cls) -> None:
+        scraped_at: datetime = datetime(2021, 1, 1, tzinfo=timezone.utc)
+        GithubUser.objects.create(id=1, login='user-1', url='https://api.github.com/users/_', scraped_at=scraped_at)
+        for repository_id in range(1, 4):
+            GithubRepository.objects.create(
+                id=repository_id, owner_id=1, name=f'repo-{repository_id}', full_name=f'user-1/repo-{repository_id}',
+                url='https://api.github.com/repos/_', scraped_at=scraped_at
+            )
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.urls: List[str] = [
+            reverse('user-repository-list', kwargs={'login': 'user-1'}),
+            reverse('repository-detail', kwargs={'owner': 'user-1', 'name': 'repo-2'}),
+        ]
+
+    def test_unchanged_data_is_not_modified(self) -> None:
+        for url in self.urls:
+            response: Response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Last-Modified'], 'Fri, 01 Jan 2021 00:00:00 GMT')
+
+            # a single query for the validators, without rendering the response.
+            with self.assertNumQueries(1):
+                not_modified: HttpResponse = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(not_modified.content, b'')
+            since: HttpResponse = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changed_data_is_sent(self) -> None:
+        etags: List[str] = [self.client.get(url, format='json')['ETag'] for url in self.urls]
+        GithubRepository.objects.filter(id=2).update(description='new', scraped_at=datetime.now(timezone.utc))
+
+        for url, etag in zip(self.urls, etags):
+            response: Response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_have_their_own_etag(self) -> None:
+        first: Response = self.client.get(f'{self.urls[0]}?per_page=1', format='json')
+        second: Response = self.client.get(f'{self.urls[0]}?per_page=1&since=1', format='json')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_missing_data_is_not_found(self) -> None:
+        url: str = reverse('user-repository-list', kwargs={'login': 'missing'})
+        response: HttpResponse = self.client.get(url, format='json', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MetricsViewTestCase(APIViewTestCase):
+    """
+    Tests for the Prometheus metrics endpoint of the scrape runs.
+    """
+    def setUp(self) -> None:
+        super().setUp()
+        self.url: str = reverse('metrics')
+        # the response cache counters of this process are left out, since the other tests used the cache.
+        stats_patch = mock.patch('github_data.views.api_cache_stats', CacheStats())
+        stats_patch.start()
+        self.addCleanup(stats_patch.stop)
+        self.metrics: ScraperMetrics = ScraperMetrics()
+        self.metrics.observe_request('GET /users', 0.3)
+
+    def test_metrics_of_running_and_last_runs(self) -> None:
+        ScrapeRun.objects.create(mode=ScrapeRun.RANGE, status=ScrapeRun.FINISHED, metrics=self.metrics.snapshot())
+        last_run: ScrapeRun = ScrapeRun.objects.create(
+            mode=ScrapeRun.RANGE, status=ScrapeRun.STOPPED, metrics=self.metrics.snapshot()
+        )
+        running: ScrapeRun = ScrapeRun.objects.create(
+            mode=ScrapeRun.INDIVIDUAL_USERS, metrics=self.metrics.snapshot()
+        )
+
+        response: HttpResponse = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text: str = response.content.decode()
+        self.assertIn(f'github_scraper_rows_written_total{{run="{running.id}",mode="users",status="running"}} 0', text)
+        self.assertIn(f'github_scraper_rows_written_total{{run="{last_run.id}",mode="range",status="stopped"}} 0', text)
+        self.assertEqual(text.count('github_scraper_rows_written_total{'), 2)
+
+    def test_no_metrics(self) -> None:
+        ScrapeRun.objects.create(mode=ScrapeRun.RANGE)
+
+        response: HttpResponse = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'\n')
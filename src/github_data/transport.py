@@ -0,0 +1,138 @@
+import gzip
+import io
+import json
+import logging
+import threading
+from http.client import BadStatusLine, HTTPConnection, HTTPMessage, HTTPSConnection, responses
+from logging import Logger
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from fastcore.net import ExceptionsHTTP, url_default_headers
+
+logger: Logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE: int = 10
+# the seconds to wait for a connection or a response before giving up on a request.
+DEFAULT_TIMEOUT: float = 60
+MAX_REDIRECTS: int = 5
+REDIRECT_CODES: Tuple[int, ...] = (301, 302, 303, 307, 308)
+
+# the scheme and the host (with the port) of the connections in the pool.
+PoolKey = Tuple[str, str]
+
+
+class ConnectionPool:
+    """
+    Pool of keep-alive HTTP connections shared by the threads of a scraper, so the requests to a host reuse an open
+    connection instead of paying for the TCP and TLS handshakes of a new one every time.
+    Up to `max_size` idle connections are kept for each host. A request that finds no idle connection opens a new one,
+    which is closed after the request if the pool is already full, so the pool never blocks a request.
+    """
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE, *, timeout: float = DEFAULT_TIMEOUT):
+        """
+        :param max_size: The maximum number of idle connections kept for each host. min: 1
+        :param timeout: The seconds to wait for a connection or a response
+        """
+        self.max_size: int = max(max_size, 1)
+        self.timeout: float = timeout
+        self.idle: Dict[PoolKey, List[HTTPConnection]] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.opened: int = 0
+        self.requests: int = 0
+        self.reused: int = 0
+
+    def acquire(self, key: PoolKey) -> Tuple[HTTPConnection, bool]:
+        """
+        Takes the idle connection to a host that was used last, or opens a new one.
+        :param key: The scheme and the host of the connection
+        :return: The connection, and whether or not it was reused
+        """
+        with self.lock:
+            idle: Optional[List[HTTPConnection]] = self.idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.opened += 1
+        scheme, host = key
+        connection_class: type = HTTPSConnection if scheme == 'https' else HTTPConnection
+        return connection_class(host, timeout=self.timeout), False
+
+    def release(self, key: PoolKey, connection: HTTPConnection) -> None:
+        with self.lock:
+            idle: List[HTTPConnection] = self.idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        with self.lock:
+            connections: List[HTTPConnection] = [connection for idle in self.idle.values() for connection in idle]
+            self.idle.clear()
+        for connection in connections:
+            connection.close()
+
+    def request(self, url: str, verb: str, headers: Dict[str, str],
+                body: Optional[bytes] = None) -> Tuple[int, HTTPMessage, bytes]:
+        """
+        Sends a request through a pooled connection and reads the whole response, so the connection can be reused.
+        A reused connection that the server closed while it was idle is discarded, and the request is sent again.
+        :return: The status code, the headers and the body of the response
+        """
+        parts = urlsplit(url)
+        key: PoolKey = (parts.scheme, parts.netloc)
+        target: str = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        while True:
+            connection, reused = self.acquire(key)
+            try:
+                connection.request(verb, target, body=body, headers=headers)
+                response = connection.getresponse()
+                payload: bytes = response.read()
+            except (ConnectionError, BadStatusLine):
+                connection.close()
+                if not reused:
+                    raise
+                logger.debug(f'--- kept-alive connection to {parts.netloc} was closed, reconnecting.')
+                continue
+            except Exception:
+                connection.close()
+                raise
+
+            with self.lock:
+                self.requests += 1
+                self.reused += reused
+            if response.will_close:
+                connection.close()
+            else:
+                self.release(key, connection)
+            return response.status, response.msg, payload
+
+
+def send_json(pool: ConnectionPool, url: str, verb: str, headers: Dict[str, str],
+              body: Optional[bytes] = None) -> Tuple[Any, Dict[str, str]]:
+    """
+    Sends a request through a connection pool and decodes its JSON response, like fastcore's urlsend does with
+    urllib: gzip responses are accepted, redirects are followed, and errors are raised as HTTPError, with the
+    HTTP4xxClientError subclass of each code for client errors.
+    :return: The decoded JSON response and the response headers
+    :raises HTTPError: If the response is not successful, including 304 Not Modified
+    """
+    headers = {**url_default_headers, **headers, 'Accept-Encoding': 'gzip'}
+    for _ in range(MAX_REDIRECTS + 1):
+        status, response_headers, payload = pool.request(url, verb, headers, body)
+        if response_headers.get('Content-Encoding') == 'gzip':
+            payload = gzip.decompress(payload)
+        if status not in REDIRECT_CODES or not response_headers.get('Location'):
+            break
+        url = urljoin(url, response_headers['Location'])
+        if status == 303:
+            verb, body = 'GET', None
+    else:
+        raise HTTPError(url, status, 'Too Many Redirects', response_headers, io.BytesIO(payload))
+
+    if status in ExceptionsHTTP:
+        raise ExceptionsHTTP[status](url, response_headers, io.BytesIO(payload))
+    if not 200 <= status < 300:
+        raise HTTPError(url, status, responses.get(status, ''), response_headers, io.BytesIO(payload))
+    return json.loads(payload.decode()), dict(response_headers)
@@ -1,8 +1,8 @@
 from django.urls import path
 from rest_framework.urlpatterns import format_suffix_patterns
 
-from github_data.views import api_root, user_list, user_detail, \
-    repository_list, repository_detail, user_repository_list
+from github_data.views import api_root, metrics, user_list, user_detail, \
+    repository_list, repository_detail, user_repository_list, export_users, export_repositories
 
 urlpatterns = format_suffix_patterns([
     path('', api_root, name='api-root'),
@@ -14,3 +14,9 @@ urlpatterns = format_suffix_patterns([
     path('repos/', repository_list, name='repository-list'),
     path('repos/<str:owner>/<str:name>/', repository_detail, name='repository-detail'),
 ])
+
+urlpatterns += [
+    path('metrics', metrics, name='metrics'),
+    path('export/users.ndjson', export_users, name='export-users'),
+    path('export/repos.ndjson', export_repositories, name='export-repositories'),
+]
@@ -1,7 +1,10 @@
-from typing import Callable, Any
+from typing import Callable, Any, List, Optional
 
 from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
 
 from rest_framework.decorators import api_view, action
 from rest_framework.request import Request
@@ -10,7 +13,11 @@ from rest_framework.reverse import reverse
 from rest_framework import viewsets
 from rest_framework.serializers import ModelSerializer
 
-from github_data.models import GithubUser, GithubRepository
+from github_data.cache import api_cache_stats, cache_response
+from github_data.conditional import conditional, repository_validators, user_repositories_validators
+from github_data.export import export_ndjson
+from github_data.metrics import render_cache_stats, render_prometheus
+from github_data.models import GithubUser, GithubRepository, ScrapeRun
 from github_data.serializers import GithubUserSerializer, GithubRepositorySerializer
 
 function_view = Callable[[Request, Any], Response]
@@ -24,26 +31,13 @@ class GithubUserViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class: ModelSerializer = GithubUserSerializer
     lookup_field: str = 'login'
 
-    def list(self, request, *args, **kwargs) -> Response:
-        """
-        List a queryset and filter it by id if the `since` parameter is present.
-        :param request: Request object with all the request data.
-        :param args: arguments
-        :param kwargs: keyword arguments
-        :return: A response with a serialized queryset of Github Users.
-        """
-        since = request.query_params.get('since')
-
-        if since:
-            self.queryset = self.get_queryset().filter(pk__gt=since)
-        return super().list(request, *args, **kwargs)
-
 
 class GithubRepositoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Github Repositories scraped from the GitHub API.
+    The owners are joined in the same query, since every repository is serialized with its owner.
     """
-    queryset: QuerySet = GithubRepository.objects.all()
+    queryset: QuerySet = GithubRepository.objects.select_related('owner')
     serializer_class: ModelSerializer = GithubRepositorySerializer
 
     @action(detail=False)
@@ -57,6 +51,7 @@ class GithubRepositoryViewSet(viewsets.ReadOnlyModelViewSet):
         """
         owner_username: str = kwargs.get('login')
         user: GithubUser = get_object_or_404(GithubUser.objects.all(), login=owner_username)
+        # the repositories of the related manager get the user already loaded as their owner, without a join.
         queryset: QuerySet = user.repositories.all()
 
         page = self.paginate_queryset(queryset)
@@ -77,6 +72,7 @@ class GithubRepositoryViewSet(viewsets.ReadOnlyModelViewSet):
         return get_object_or_404(self.get_queryset(), full_name=f'{owner}/{name}')
 
 
+@cache_response
 @api_view(['GET'])
 def api_root(request, format: str =None) -> Response:
     """
@@ -88,8 +84,51 @@ def api_root(request, format: str =None) -> Response:
     })
 
 
-user_list: function_view = GithubUserViewSet.as_view({'get': 'list'})
-user_detail: function_view = GithubUserViewSet.as_view({'get': 'retrieve'})
-repository_list: function_view = GithubRepositoryViewSet.as_view({'get': 'list'})
-user_repository_list: function_view = GithubRepositoryViewSet.as_view({'get': 'user_repositories'})
-repository_detail: function_view = GithubRepositoryViewSet.as_view({'get': 'retrieve'})
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Metrics of the scrape runs in the Prometheus text format: the ones still running and the last one that ended.
+    Each run reports the snapshot of its metrics saved with its last checkpoint.
+    """
+    runs: List[ScrapeRun] = list(ScrapeRun.objects.filter(status=ScrapeRun.RUNNING))
+    last_run: Optional[ScrapeRun] = ScrapeRun.objects.exclude(status=ScrapeRun.RUNNING).order_by('-updated_at').first()
+    if last_run is not None:
+        runs.append(last_run)
+    # the parent run of the shards has no metrics of its own, each shard reports its own.
+    text: str = render_prometheus(
+        ({'run': run.id, 'mode': run.mode, 'status': run.status}, run.metrics) for run in runs if run.metrics
+    ) + render_cache_stats(api_cache_stats.snapshot())
+    return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def export_view(model: str) -> Callable[[HttpRequest], StreamingHttpResponse]:
+    """
+    Builds the view that streams every user or repository as newline-delimited JSON, one row per line in order of id,
+    in constant memory. The stream is gzip compressed for clients that accept it.
+    :param model: `users` or `repositories`
+    :return: The view function
+    """
+    @require_GET
+    def export(request: HttpRequest) -> StreamingHttpResponse:
+        compress: bool = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response: StreamingHttpResponse = StreamingHttpResponse(
+            export_ndjson(model, compress=compress), content_type='application/x-ndjson'
+        )
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    return export
+
+
+user_list: function_view = cache_response(GithubUserViewSet.as_view({'get': 'list'}))
+user_detail: function_view = cache_response(GithubUserViewSet.as_view({'get': 'retrieve'}))
+repository_list: function_view = cache_response(GithubRepositoryViewSet.as_view({'get': 'list'}))
+user_repository_list: function_view = conditional(user_repositories_validators)(
+    cache_response(GithubRepositoryViewSet.as_view({'get': 'user_repositories'}))
+)
+repository_detail: function_view = conditional(repository_validators)(
+    cache_response(GithubRepositoryViewSet.as_view({'get': 'retrieve'}))
+)
+export_users: function_view = export_view('users')
+export_repositories: function_view = export_view('repositories')
@@ -14,7 +14,7 @@ import json
 import sys
 from pathlib import Path
 
-from typing import Dict, Any, TextIO, List, Union
+from typing import Dict, Any, TextIO, List, Optional, Union
 
 # Define Config type for the configuration pulled from `config.json`
 Config = Dict[str, Any]
@@ -102,6 +102,47 @@ for database in config.get('databases', []):
     }
 
 
+# Rest Framework
+# lists are paginated by id with the `since` and `per_page` query parameters.
+REST_FRAMEWORK: Dict[str, Any] = {
+    'DEFAULT_PAGINATION_CLASS': 'github_data.pagination.KeysetPagination',
+    'PAGE_SIZE': config.get('api_page_size', 100),
+}
+API_MAX_PAGE_SIZE: int = config.get('api_max_page_size', 1000)
+
+
+# Caches
+# the API responses are cached in the `api` cache, keyed on the version of the scraped data.
+API_CACHE_ALIAS: str = 'api'
+API_CACHE_BACKENDS: Dict[str, str] = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+    # shared by every process and server, they need python-memcached and django-redis installed.
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+# the backends that evict the oldest entries after MAX_ENTRIES, the servers of the shared ones evict on their own.
+API_CACHE_MAX_ENTRIES_BACKENDS: List[str] = ['locmem', 'file']
+api_cache_config: Dict = config.get('api_cache', {})
+api_cache_backend: str = api_cache_config.get('backend', 'locmem')
+api_cache_options: Dict = {'MAX_ENTRIES': api_cache_config.get('max_entries', 10000)} \
+    if api_cache_backend in API_CACHE_MAX_ENTRIES_BACKENDS else {}
+CACHES: Dict[str, Dict[str, Any]] = {
+    'default': {
+        'BACKEND': API_CACHE_BACKENDS['locmem'],
+    },
+    API_CACHE_ALIAS: {
+        'BACKEND': API_CACHE_BACKENDS.get(api_cache_backend, api_cache_backend),
+        'LOCATION': api_cache_config.get('location', 'github-scraper-api'),
+        'TIMEOUT': api_cache_config.get('timeout', 3600),
+        'OPTIONS': api_cache_config.get('options', api_cache_options),
+    },
+}
+# the seconds the dataset version is read from the `api` cache instead of the database.
+API_CACHE_VERSION_TIMEOUT: int = api_cache_config.get('version_timeout', 5)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -166,3 +207,8 @@ STATIC_URL: str = static_config.get('url', '/static/')
 
 # GhApi
 GITHUB_TOKEN: str = config.get('github_oauth_token')
+GITHUB_TOKENS: List[str] = config.get('github_oauth_tokens', [])
+GITHUB_API_HOST: Optional[str] = config.get('github_api_host')
+GITHUB_RESPONSE_CACHE: Optional[str] = config.get('github_response_cache')
+GITHUB_RESPONSE_ARCHIVE: Optional[str] = config.get('github_response_archive')
+GITHUB_CONNECTION_POOL_SIZE: Optional[int] = config.get('github_connection_pool_size')